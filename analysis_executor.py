@@ -0,0 +1,107 @@
+"""
+移动端分析任务执行器
+单个工作线程依次执行分析，每次提交一个新的“代”（generation）:
+  - 排队中还没开始的旧请求直接被新请求替换，不再执行
+  - 正在执行的旧请求在下一个检查点（request.check()）处停止，下载等无法中断的步骤完成后结果被丢弃
+  - 界面更新经 request.post 交给主线程，执行前再确认一次仍是最新的代，过期的更新不会到达界面
+  - 进度更新按时间间隔节流
+连续点击分析时同一时刻最多只有一个分析在占用CPU和网络
+"""
+
+import threading
+import time
+
+
+class AnalysisCancelled(Exception):
+    """请求已被更新的请求取代"""
+
+
+class AnalysisRequest:
+    """一次分析请求，传给任务函数的第一个参数"""
+
+    def __init__(self, executor, generation):
+        self.executor = executor
+        self.generation = generation
+        self._last_progress = None
+
+    @property
+    def cancelled(self):
+        return self.generation != self.executor.generation
+
+    def check(self):
+        """已被取代时抛出 AnalysisCancelled，在各阶段之间调用"""
+        if self.cancelled:
+            raise AnalysisCancelled()
+
+    def post(self, func, *args):
+        """在主线程中执行 func(*args)；执行时请求已被取代则丢弃"""
+        if self.cancelled:
+            return
+
+        def run():
+            if not self.cancelled:
+                func(*args)
+        self.executor.dispatch(run)
+
+    def progress(self, func, value):
+        """节流的进度更新：距上次不足 progress_interval 秒的中间进度直接丢弃，100 总是发送"""
+        now = time.monotonic()
+        if (value < 100 and self._last_progress is not None
+                and now - self._last_progress < self.executor.progress_interval):
+            return
+        self._last_progress = now
+        self.post(func, value)
+
+
+class AnalysisExecutor:
+    """
+    单工作线程的分析执行器
+    dispatch(fn) 负责把无参函数交给界面主线程执行（Kivy 中为 Clock.schedule_once）
+    """
+
+    def __init__(self, dispatch, progress_interval=0.1, name='analysis'):
+        self.dispatch = dispatch
+        self.progress_interval = progress_interval
+        self.name = name
+        self.generation = 0
+        self._pending = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, func, *args):
+        """
+        提交 func(request, *args)，取代之前所有的请求；返回新的 AnalysisRequest
+        """
+        with self._cond:
+            self.generation += 1
+            request = AnalysisRequest(self, self.generation)
+            # 排队中的旧请求直接替换
+            self._pending = (request, func, args)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return request
+
+    def cancel(self):
+        """取消当前和排队中的请求"""
+        with self._cond:
+            self.generation += 1
+            self._pending = None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                request, func, args = self._pending
+                self._pending = None
+            if request.cancelled:
+                continue
+            try:
+                func(request, *args)
+            except AnalysisCancelled:
+                pass
+            except Exception as e:
+                # 任务函数应自行向界面报告错误，这里只避免工作线程退出
+                print(f"分析任务出错: {e}")
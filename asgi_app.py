@@ -0,0 +1,187 @@
+"""
+股票价格聚类分析Web应用（异步 ASGI 版本）
+接口与 web_app.py 相同（/、/analyze、/analyze_batch、/chart/<key>.png、/stats/...），
+基于 Quart 运行在 hypercorn / uvicorn 等 ASGI 服务器上。
+
+akshare 是同步接口，行情下载放在有上限的IO线程池中执行，等待上游时请求只占用一个协程；
+聚类和绘图放在单独的计算线程池中，不阻塞事件循环。
+几百个慢请求同时到达时，线程数仍只有两个线程池的上限之和。
+
+运行:
+    hypercorn asgi_app:app --bind 0.0.0.0:5000
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, render_template_string, request, jsonify, Response, abort
+
+from stock_data import normalize_code
+from source_registry import REGISTRY
+from singleflight import AsyncSingleFlight
+import metrics
+from metrics import timed
+from web_app import (
+    HTML_TEMPLATE, CHART_MODES, DEFAULT_CHART_POINTS, DEFAULT_START_DATE, DEFAULT_END_DATE,
+    ANALYSIS_PERIODS, N_LEVELS, parse_n_levels, get_analysis_data, build_analysis, analysis_key,
+    fetch_flight,
+    chart_cache, is_valid_chart_key,
+    get_batch_pool, _analyze_batch_item, parse_batch_request, batch_response, screener_response,
+    start_preload,
+)
+
+app = Quart(__name__)
+metrics.set_frontend('asgi')
+
+# 同时进行的上游下载数上限（超出的请求在事件循环中排队，不占用线程）
+IO_WORKERS = int(os.environ.get('STOCK_ASYNC_IO_WORKERS', '32'))
+# 聚类和绘图的线程数
+CPU_WORKERS = int(os.environ.get('STOCK_ASYNC_CPU_WORKERS', str(os.cpu_count() or 2)))
+
+io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='fetch')
+cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix='compute')
+
+# 同一股票、同一参数的并发分析在事件循环中合并，等待的请求不占用线程
+analysis_flight = AsyncSingleFlight()
+
+
+async def analyze_code_async(code, chart_mode='server', points=DEFAULT_CHART_POINTS,
+                             start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE,
+                             period='daily', n_levels=N_LEVELS):
+    """异步分析一只股票：下载在IO线程池中执行，聚类和绘图在计算线程池中执行"""
+    key = analysis_key(code, chart_mode, points, start_date, end_date, period, n_levels)
+    return await analysis_flight.do(key, _analyze_code_async, code, chart_mode, points,
+                                    start_date, end_date, period, n_levels)
+
+
+async def _analyze_code_async(code, chart_mode, points, start_date, end_date, period, n_levels):
+    loop = asyncio.get_running_loop()
+    # 分钟线的流式聚类与分块下载交替进行，一并在IO线程池中完成
+    df = await loop.run_in_executor(io_pool, get_analysis_data,
+                                    code, start_date, end_date, period, n_levels)
+    return await loop.run_in_executor(cpu_pool, build_analysis,
+                                      code, df, chart_mode, points, n_levels)
+
+
+@app.before_serving
+async def _start_preload():
+    start_preload()
+
+
+@app.route('/')
+async def index():
+    """主页"""
+    return await render_template_string(HTML_TEMPLATE)
+
+
+@app.route('/analyze', methods=['POST'])
+async def analyze():
+    """分析股票"""
+    try:
+        data = await request.get_json()
+        code = data.get('code', '').strip()
+
+        if not code:
+            return jsonify({'success': False, 'error': '请输入股票代码'})
+
+        chart_mode = data.get('chart_mode', 'server')
+        if chart_mode not in CHART_MODES:
+            return jsonify({'success': False, 'error': f'未知的图表模式: {chart_mode}'})
+        period = str(data.get('period', 'daily'))
+        if period not in ANALYSIS_PERIODS:
+            return jsonify({'success': False, 'error': f'不支持的周期: {period}'})
+        try:
+            n_levels = parse_n_levels(data.get('k'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+
+        with timed('request'):
+            result = await analyze_code_async(normalize_code(code), chart_mode=chart_mode,
+                                              points=data.get('points', DEFAULT_CHART_POINTS),
+                                              period=period, n_levels=n_levels)
+            with timed('serialize'):
+                return jsonify(result)
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
+@app.route('/analyze_batch', methods=['POST'])
+async def analyze_batch():
+    """批量分析股票（请求与返回格式同 web_app.py），任务在进程池中执行"""
+    try:
+        codes, chart_mode, error = parse_batch_request(await request.get_json() or {})
+        if error:
+            return jsonify({'success': False, 'error': error})
+
+        pool = get_batch_pool()
+        futures = [asyncio.wrap_future(pool.submit(_analyze_batch_item, code, chart_mode))
+                   for code in codes]
+        outcomes = await asyncio.gather(*futures, return_exceptions=True)
+        results = [
+            {'success': False, 'code': code, 'error': str(outcome)}
+            if isinstance(outcome, Exception) else outcome
+            for code, outcome in zip(codes, outcomes)
+        ]
+        return jsonify(batch_response(results))
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
+@app.route('/screener')
+async def screener():
+    """按全市场扫描结果选股（参数同 web_app.py）"""
+    try:
+        # 价位文件更新后首次查询需要读取文件，放到IO线程池
+        result = await asyncio.get_running_loop().run_in_executor(
+            io_pool, screener_response, request.args.to_dict())
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
+@app.route('/chart/<key>.png')
+async def chart(key):
+    """按内容哈希返回缓存的图表，支持 ETag / If-None-Match"""
+    if not is_valid_chart_key(key):
+        abort(404)
+    headers = {'ETag': f'"{key}"', 'Cache-Control': 'public, max-age=31536000, immutable'}
+    if key in request.if_none_match:
+        return Response(b'', status=304, headers=headers)
+    # 可能需要读磁盘缓存，放到IO线程池
+    png = await asyncio.get_running_loop().run_in_executor(io_pool, chart_cache.get, key)
+    if png is None:
+        abort(404)
+    return Response(png, mimetype='image/png', headers=headers)
+
+
+@app.route('/stats/sources')
+async def source_stats():
+    """数据源统计（成功率、延迟、熔断状态及跳过原因）"""
+    return jsonify(REGISTRY.snapshot())
+
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    """Prometheus 格式的各阶段耗时与数据源结果统计"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/stats/singleflight')
+async def singleflight_stats():
+    """请求合并统计（每个键的执行次数、共享次数、当前等待数）"""
+    return jsonify({'fetch': fetch_flight.snapshot(), 'analyze': analysis_flight.snapshot()})
+
+
+if __name__ == '__main__':
+    print("="*60)
+    print("股票价格聚类分析Web服务器（ASGI）")
+    print("="*60)
+    print("访问地址: http://localhost:5000")
+    print(f"IO线程: {IO_WORKERS}  计算线程: {CPU_WORKERS}")
+    print("生产环境建议: hypercorn asgi_app:app --bind 0.0.0.0:5000")
+    print("="*60)
+    app.run(host='0.0.0.0', port=5000)
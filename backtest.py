@@ -0,0 +1,278 @@
+"""
+支撑/压力位回测
+检验价格是否"尊重"聚类得到的价位：对每根K线判断是否触及前一交易日已知的价位，
+按收盘价分为反弹（守住）和突破（跌破/升破），统计之后 h 根K线的胜率和收益。
+规则全部写成 (K线数, 价位数) 矩阵上的 NumPy 运算，没有逐根K线的 Python 循环；
+多只股票在进程池中并行，每只股票只返回计数和收益之和，主进程汇总
+
+用法:
+    python backtest.py 000001 600000                   # 指定股票
+    python backtest.py --codes-file codes.txt --workers 8
+    python backtest.py --universe --output backtest.parquet --horizons 1 5 20
+
+规则（L 为前一根K线收盘时的价位，带宽 tol 默认 0.5%）:
+    支撑位: 前一根K线最低价在 L*(1+tol) 之上，本根最低价进入 L*(1+tol) 以下即为触及；
+            收盘 >= L 为 support_bounce（预期上涨），收盘 < L*(1-tol) 为 support_break（预期下跌）
+    压力位: 前一根K线最高价在 L*(1-tol) 之下，本根最高价进入 L*(1-tol) 以上即为触及；
+            收盘 <= L 为 resistance_bounce（预期下跌），收盘 > L*(1+tol) 为 resistance_break（预期上涨）
+    以触发当根收盘价入场，第 h 根K线收盘价出场；收益按预期方向计正负，收益 > 0 即为命中
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from stock_data import fetch_stock_data, normalize_code
+from cluster_levels import rolling_levels
+from market_scan import N_LEVELS, _init_worker, load_codes_file, load_universe
+
+SIGNALS = ('support_bounce', 'support_break', 'resistance_bounce', 'resistance_break')
+# 各信号的预期方向：1 看涨，-1 看跌
+DIRECTION = {
+    'support_bounce': 1,
+    'support_break': -1,
+    'resistance_bounce': -1,
+    'resistance_break': 1,
+}
+TOLERANCE = 0.005
+HORIZONS = (1, 5, 10)
+WINDOW = 250
+# 滚动价位的精确重算间隔（与 rolling_levels 的默认值相同）：热启动约快3倍，
+# 各信号的触发次数和胜率与逐日精确计算相差1%左右（误差见 benchmarks/bench_rolling.py）；
+# 需要与逐日精确计算完全一致时用 1
+REFIT_EVERY = 20
+
+
+def lagged_levels(levels, n):
+    """
+    把价位时间序列滞后一根K线：第 t 行为第 t-1 根K线收盘时已知的价位，避免使用未来数据
+    levels 可以是 (n, k) 的时间序列（如 rolling_levels 的结果），也可以是 (k,) 的固定价位（不滞后）
+    """
+    levels = np.asarray(levels, dtype=float)
+    if levels.ndim == 1:
+        return np.broadcast_to(levels, (n, len(levels)))
+    if len(levels) != n:
+        raise ValueError(f"价位序列长度 {len(levels)} 与K线数 {n} 不一致")
+    lagged = np.full(levels.shape, np.nan)
+    lagged[1:] = levels[:-1]
+    return lagged
+
+
+def level_signals(bars, levels, tolerance=TOLERANCE):
+    """
+    bars: get_stock_data_multi_source 返回的日线（high / low / close 列，按日期升序）
+    levels: 与 bars 逐行对齐的价位序列，见 lagged_levels
+    返回 {信号名: (n, k) 布尔矩阵}，第 t 行第 j 列表示第 t 根K线对第 j 个价位触发了该信号
+    """
+    high = bars['high'].to_numpy(dtype=float)
+    low = bars['low'].to_numpy(dtype=float)
+    close = bars['close'].to_numpy(dtype=float)[:, None]
+    n = len(close)
+    levels = lagged_levels(levels, n)
+    upper = levels * (1 + tolerance)
+    lower = levels * (1 - tolerance)
+
+    prev_low = np.full(n, np.nan)
+    prev_high = np.full(n, np.nan)
+    prev_low[1:] = low[:-1]
+    prev_high[1:] = high[:-1]
+    # 与 NaN 比较恒为 False：第一根K线和缺失的价位不会触发信号
+    support_touch = (prev_low[:, None] > upper) & (low[:, None] <= upper)
+    resistance_touch = (prev_high[:, None] < lower) & (high[:, None] >= lower)
+    return {
+        'support_bounce': support_touch & (close >= levels),
+        'support_break': support_touch & (close < lower),
+        'resistance_bounce': resistance_touch & (close <= levels),
+        'resistance_break': resistance_touch & (close > upper),
+    }
+
+
+def forward_returns(close, horizons=HORIZONS):
+    """(n, len(horizons)) 收盘价之后 h 根K线的收益率，末尾不足 h 根的为 NaN"""
+    close = np.asarray(close, dtype=float)
+    result = np.full((len(close), len(horizons)), np.nan)
+    for j, h in enumerate(horizons):
+        if h < len(close):
+            result[:-h, j] = close[h:] / close[:-h] - 1
+    return result
+
+
+def evaluate_levels(bars, levels, tolerance=TOLERANCE, horizons=HORIZONS):
+    """
+    统计一只股票的信号，返回计数字典（可直接相加，用 summarize 汇总为胜率和平均收益）:
+        bars, <信号>_count 触发次数（同一根K线触发多个价位时分别计数）,
+        <信号>_n<h> 有 h 根后续K线的次数, <信号>_hit<h> 命中次数, <信号>_ret<h> 按方向计的收益之和
+    """
+    signals = level_signals(bars, levels, tolerance)
+    forward = forward_returns(bars['close'].to_numpy(dtype=float), horizons)
+    valid = np.isfinite(forward)
+    forward = np.where(valid, forward, 0.0)
+
+    row = {'bars': int(len(bars))}
+    for name in SIGNALS:
+        events = signals[name].sum(axis=1).astype(float)      # 每根K线的触发次数
+        signed = DIRECTION[name] * forward
+        row[f'{name}_count'] = int(events.sum())
+        n = events @ valid
+        hits = events @ (valid & (signed > 0))
+        returns = events @ signed
+        for j, h in enumerate(horizons):
+            row[f'{name}_n{h}'] = int(n[j])
+            row[f'{name}_hit{h}'] = int(hits[j])
+            row[f'{name}_ret{h}'] = float(returns[j])
+    return row
+
+
+def summarize(rows, horizons=HORIZONS):
+    """
+    把一只或多只股票的计数汇总为每个信号一行:
+    count 触发次数, hit_rate_<h> 胜率(%), avg_return_<h> 按方向计的平均收益(%)
+    """
+    totals = pd.DataFrame(rows).sum(numeric_only=True) if len(rows) else pd.Series(dtype=float)
+    table = []
+    for name in SIGNALS:
+        record = {'signal': name, 'count': int(totals.get(f'{name}_count', 0))}
+        for h in horizons:
+            n = totals.get(f'{name}_n{h}', 0)
+            record[f'hit_rate_{h}'] = totals[f'{name}_hit{h}'] / n * 100 if n else np.nan
+            record[f'avg_return_{h}'] = totals[f'{name}_ret{h}'] / n * 100 if n else np.nan
+        table.append(record)
+    return pd.DataFrame(table).set_index('signal')
+
+
+def backtest_frame(bars, window=WINDOW, n_levels=N_LEVELS, refit_every=REFIT_EVERY,
+                   tolerance=TOLERANCE, horizons=HORIZONS):
+    """用滚动窗口价位（rolling_levels，截至每个交易日的最近 window 根收盘价）回测一只股票"""
+    levels = rolling_levels(bars['close'].to_numpy(dtype=float), window, n_levels,
+                            refit_every=refit_every)
+    return evaluate_levels(bars, levels, tolerance, horizons)
+
+
+def backtest_symbol(code, start_date, end_date, window=WINDOW, n_levels=N_LEVELS,
+                    refit_every=REFIT_EVERY, tolerance=TOLERANCE, horizons=HORIZONS):
+    """回测单只股票（在工作进程中执行），失败时返回带 error 的记录"""
+    try:
+        df = fetch_stock_data(code, start_date, end_date)
+    except Exception as e:
+        return {'symbol': code, 'error': str(e)}
+    if df is None or df.empty:
+        return {'symbol': code, 'error': '无法获取股票数据'}
+    if len(df) <= window:
+        return {'symbol': code, 'error': f'K线数 {len(df)} 不足一个窗口（{window}）'}
+    row = {'symbol': code, 'source': df.attrs.get('source', '')}
+    row.update(backtest_frame(df, window, n_levels, refit_every, tolerance, horizons))
+    return row
+
+
+def run_backtest(codes, workers=None, start_date='20200101', end_date=None, window=WINDOW,
+                 n_levels=N_LEVELS, refit_every=REFIT_EVERY, tolerance=TOLERANCE, horizons=HORIZONS,
+                 verbose=False):
+    """回测 codes，返回 (每只股票的计数DataFrame, 汇总DataFrame, 失败列表)"""
+    end_date = end_date or datetime.now().strftime('%Y%m%d')
+    horizons = tuple(horizons)
+    todo = list(dict.fromkeys(codes))
+    print(f"回测 {len(todo)} 只股票，窗口 {window}，带宽 {tolerance * 100:g}%，"
+          f"持有 {'/'.join(str(h) for h in horizons)} 根K线")
+
+    rows = []
+    failures = []
+    started = time.perf_counter()
+    last_report = started
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(verbose,)) as pool:
+        futures = [pool.submit(backtest_symbol, code, start_date, end_date, window, n_levels,
+                               refit_every, tolerance, horizons) for code in todo]
+        try:
+            for future in as_completed(futures):
+                row = future.result()
+                if 'error' in row:
+                    failures.append((row['symbol'], row['error']))
+                else:
+                    rows.append(row)
+
+                completed = len(rows) + len(failures)
+                now = time.perf_counter()
+                if now - last_report >= 5 or completed == len(todo):
+                    rate = completed / (now - started)
+                    print(f"进度 {completed}/{len(todo)}  {rate:.1f} 只/秒  失败 {len(failures)}")
+                    last_report = now
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            raise
+
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        df = df.sort_values('symbol').reset_index(drop=True)
+    summary = summarize(rows, horizons)
+    elapsed = time.perf_counter() - started
+    print(f"回测完成: {len(rows)} 只股票，用时 {elapsed:.1f} 秒")
+    if failures:
+        print(f"失败 {len(failures)} 只:")
+        for code, error in failures[:20]:
+            print(f"  {code}: {error}")
+    return df, summary, failures
+
+
+def format_summary(summary, horizons=HORIZONS):
+    lines = [f"{'信号':<18}{'次数':>8}" + ''.join(f"{f'胜率{h}':>10}{f'收益{h}%':>10}" for h in horizons)]
+    for name, record in summary.iterrows():
+        line = f"{name:<18}{int(record['count']):>8}"
+        for h in horizons:
+            line += f"{record[f'hit_rate_{h}']:>9.1f}%{record[f'avg_return_{h}']:>+10.2f}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='支撑/压力位回测')
+    parser.add_argument('codes', nargs='*', help='股票代码')
+    parser.add_argument('--codes-file', help='股票列表文件（每行一个代码）')
+    parser.add_argument('--universe', action='store_true', help='回测全部A股')
+    parser.add_argument('--output', help='每只股票的计数写入该文件（.parquet 或 .csv）')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认CPU核数')
+    parser.add_argument('--start', default='20200101', help='数据起始日期')
+    parser.add_argument('--end', default=None, help='数据截止日期，默认今天')
+    parser.add_argument('--window', type=int, default=WINDOW, help='计算价位的滚动窗口（K线数）')
+    parser.add_argument('--levels', type=int, default=N_LEVELS, help='每只股票的价位数')
+    parser.add_argument('--refit-every', type=int, default=REFIT_EVERY,
+                        help='滚动价位最多每隔多少个窗口精确重算（1 为逐日精确计算）')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE * 100, help='触及带宽（%%）')
+    parser.add_argument('--horizons', type=int, nargs='+', default=list(HORIZONS),
+                        help='持有的K线数')
+    parser.add_argument('--verbose', action='store_true', help='显示每只股票的获取日志')
+    args = parser.parse_args()
+
+    if args.universe:
+        codes = load_universe()
+    elif args.codes_file:
+        codes = load_codes_file(args.codes_file)
+    else:
+        codes = [normalize_code(code) for code in args.codes]
+    if not codes:
+        parser.error('请指定股票代码、--codes-file 或 --universe')
+
+    try:
+        df, summary, _ = run_backtest(codes, workers=args.workers, start_date=args.start,
+                                      end_date=args.end, window=args.window,
+                                      n_levels=args.levels, refit_every=args.refit_every,
+                                      tolerance=args.tolerance / 100, horizons=args.horizons,
+                                      verbose=args.verbose)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    print(format_summary(summary, args.horizons))
+    if args.output:
+        if args.output.endswith('.csv'):
+            df.to_csv(args.output, index=False)
+        else:
+            df.to_parquet(args.output, index=False)
+        print(f"已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
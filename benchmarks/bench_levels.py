@@ -0,0 +1,129 @@
+"""
+聚类引擎基准测试：一维动态规划 (cluster_levels) 对比 sklearn KMeans
+
+用法:
+    python benchmarks/bench_levels.py
+    python benchmarks/bench_levels.py --sizes 250 1000 5000 --repeat 20
+    python benchmarks/bench_levels.py --incremental 250
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cluster_levels import kmeans_1d, update_levels  # noqa: E402
+
+
+def make_prices(n, seed=0):
+    """生成保留两位小数的随机游走收盘价"""
+    rng = np.random.default_rng(seed)
+    prices = 10 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, n)))
+    return np.round(prices, 2)
+
+
+def time_call(fn, repeat):
+    """返回多次调用的耗时中位数（秒）"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def sklearn_sse(prices, k, n_init='auto'):
+    """原实现: KMeans(n_clusters=5, random_state=42)；scikit-learn 1.4 之前默认 n_init=10"""
+    from sklearn.cluster import KMeans
+    kmeans = KMeans(n_clusters=k, random_state=42, n_init=n_init)
+    kmeans.fit(prices.reshape(-1, 1))
+    return float(kmeans.inertia_)
+
+
+def run(sizes, k, repeat):
+    rows = []
+    for n in sizes:
+        prices = make_prices(n)
+        dp_time = time_call(lambda: kmeans_1d(prices, k), repeat)
+        dp_sse = kmeans_1d(prices, k).sse
+        sk_time = time_call(lambda: sklearn_sse(prices, k), repeat)
+        sk_sse = sklearn_sse(prices, k)
+        sk10_time = time_call(lambda: sklearn_sse(prices, k, n_init=10), repeat)
+        rows.append({
+            'n': n,
+            'unique': int(len(np.unique(prices))),
+            'dp_ms': dp_time * 1000,
+            'sklearn_ms': sk_time * 1000,
+            'sklearn_n10_ms': sk10_time * 1000,
+            'speedup': sk_time / dp_time,
+            'speedup_n10': sk10_time / dp_time,
+            'dp_sse': dp_sse,
+            'sklearn_sse': sk_sse,
+        })
+    return rows
+
+
+def run_incremental(n, steps, k):
+    """逐根追加新K线：增量更新对比每次全量重算"""
+    prices = make_prices(n + steps, seed=1)
+    exact_sse = []
+    started = time.perf_counter()
+    for t in range(n, n + steps):
+        exact_sse.append(kmeans_1d(prices[:t + 1], k).sse)
+    full_time = time.perf_counter() - started
+
+    fit = kmeans_1d(prices[:n], k)
+    modes = {}
+    sse = []
+    started = time.perf_counter()
+    for t in range(n, n + steps):
+        fit, mode = update_levels(fit, prices[t:t + 1])
+        modes[mode] = modes.get(mode, 0) + 1
+        sse.append(fit.sse)
+    inc_time = time.perf_counter() - started
+
+    gaps = np.array(sse) / np.array(exact_sse) - 1
+    return {
+        'full_us_per_bar': full_time / steps * 1e6,
+        'incremental_us_per_bar': inc_time / steps * 1e6,
+        'speedup': full_time / inc_time,
+        'modes': modes,
+        'sse_gap_pct': gaps[-1] * 100,
+        'max_gap_pct': gaps.max() * 100,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[250, 500, 1000, 5000, 20000])
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--incremental', type=int, metavar='STEPS',
+                        help='测试逐根追加 STEPS 根K线时的增量更新')
+    args = parser.parse_args()
+
+    if args.incremental:
+        for n in args.sizes:
+            row = run_incremental(n, args.incremental, args.k)
+            print(f"初始 {n} 点，追加 {args.incremental} 根: 全量 {row['full_us_per_bar']:.0f}us/根, "
+                  f"增量 {row['incremental_us_per_bar']:.0f}us/根, 加速 {row['speedup']:.1f}x, "
+                  f"模式 {row['modes']}, 平方和差距 {row['sse_gap_pct']:.3f}% (最大 {row['max_gap_pct']:.3f}%)")
+            # update_levels 保证每一步的差距不超过 sse_tolerance（默认1%）
+            if row['max_gap_pct'] > 1.0 + 1e-6:
+                raise SystemExit(f"增量更新的平方和差距超出界限: {row['max_gap_pct']:.3f}%")
+        return
+
+    print(f"{'点数':>7} {'唯一值':>7} {'DP(ms)':>8} {'sk-auto(ms)':>12} {'sk-n10(ms)':>11} "
+          f"{'加速比':>7} {'加速比n10':>9} {'DP平方和':>14} {'sklearn平方和':>14}")
+    for row in run(args.sizes, args.k, args.repeat):
+        print(f"{row['n']:>7} {row['unique']:>7} {row['dp_ms']:>8.2f} {row['sklearn_ms']:>12.2f} "
+              f"{row['sklearn_n10_ms']:>11.2f} {row['speedup']:>7.1f} {row['speedup_n10']:>9.1f} "
+              f"{row['dp_sse']:>14.6g} {row['sklearn_sse']:>14.6g}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+图表渲染基准测试：并发请求下每秒渲染次数
+对比原先基于 pyplot 全局状态的渲染（只能串行）与 chart_render 的每线程模板图
+
+用法:
+    python benchmarks/bench_render.py
+    python benchmarks/bench_render.py --renders 200 --threads 1 2 4 8
+"""
+
+import argparse
+import io
+import os
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chart_render import render_levels_png  # noqa: E402
+
+
+def make_series(n=480, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2025-01-02', periods=n)
+    close = 10 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, n)))
+    centers = list(np.quantile(close, [0.1, 0.3, 0.5, 0.7, 0.9]))
+    return index, close, centers
+
+
+_pyplot_lock = threading.Lock()
+
+
+def render_pyplot(index, close, centers, title):
+    """原实现：pyplot 全局状态，多线程下必须加锁串行执行"""
+    import matplotlib.pyplot as plt
+    with _pyplot_lock:
+        plt.figure(figsize=(12, 6))
+        plt.plot(index, close, label="收盘价", color="blue", linewidth=1.5)
+        colors = ['red', 'green', 'orange', 'purple', 'brown']
+        for i, c in enumerate(centers):
+            plt.axhline(c, color=colors[i % len(colors)], linestyle="--", alpha=0.7,
+                        label=f'Level {i+1}: {c:.2f}')
+        plt.title(title, fontsize=14)
+        plt.xlabel("日期", fontsize=12)
+        plt.ylabel("价格", fontsize=12)
+        plt.legend()
+        plt.grid(True, alpha=0.3)
+        plt.tight_layout()
+        buffer = io.BytesIO()
+        plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+        plt.close()
+        return buffer.getvalue()
+
+
+def render_template(index, close, centers, title):
+    return render_levels_png(index, close, centers, title, style='web')
+
+
+def measure(render, renders, threads, series):
+    """返回 (每秒渲染次数, 单次渲染 p50 毫秒, p99 毫秒)"""
+    latencies = []
+
+    def task(i):
+        index, close, centers = series[i % len(series)]
+        started = time.perf_counter()
+        render(index, close, centers, f"股价聚类分析 - {i}")
+        latencies.append(time.perf_counter() - started)
+
+    # 预热：让每个线程先创建好模板图
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(task, range(threads)))
+    latencies.clear()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(task, range(renders)))
+    elapsed = time.perf_counter() - started
+    return (renders / elapsed,
+            float(np.percentile(latencies, 50) * 1000),
+            float(np.percentile(latencies, 99) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--renders', type=int, default=100)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    # 缺少中文字体时 matplotlib 会对每次渲染发出警告，这里忽略
+    warnings.filterwarnings('ignore')
+
+    series = [make_series(seed=s) for s in range(8)]
+    print(f"{'方式':<10} {'线程':>4} {'渲染/秒':>8} {'p50(ms)':>9} {'p99(ms)':>9}")
+    for name, render in (('pyplot', render_pyplot), ('template', render_template)):
+        for threads in args.threads:
+            rate, p50, p99 = measure(render, args.renders, threads, series)
+            print(f"{name:<10} {threads:>4} {rate:>8.1f} {p50:>9.1f} {p99:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+滚动窗口支撑/压力位基准测试：rolling_levels（滑动窗口 + 热启动）对比逐日全量重算
+
+用法:
+    python benchmarks/bench_rolling.py
+    python benchmarks/bench_rolling.py --bars 2500 --window 250 --refit-every 1 10 20 40
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+from bench_levels import make_prices  # noqa: E402
+from cluster_levels import kmeans_1d, rolling_levels  # noqa: E402
+
+
+def refit_every_day(prices, window, k):
+    """逐日对最近 window 根K线做一次完整的一维最优聚类"""
+    result = np.full((len(prices), k), np.nan)
+    for t in range(window - 1, len(prices)):
+        centers = kmeans_1d(prices[t - window + 1:t + 1], k).centers
+        result[t, :len(centers)] = centers
+    return result
+
+
+def window_sse(prices, window, levels):
+    """每个窗口内各价格到最近价位的平方和"""
+    sse = np.full(len(prices), np.nan)
+    for t in range(window - 1, len(prices)):
+        x = prices[t - window + 1:t + 1]
+        sse[t] = np.min((x[:, None] - levels[t][None, :]) ** 2, axis=1).sum()
+    return sse
+
+
+def compare(prices, window, exact, levels):
+    """与精确结果的差距：平方和多出的比例（平均、p99、最大）、完全一致的窗口占比、
+    价位最大相对偏差，以及有价位偏差超过1%的窗口占比"""
+    rows = slice(window - 1, None)
+    gap = window_sse(prices, window, levels)[rows] / window_sse(prices, window, exact)[rows] - 1
+    deviation = np.max(np.abs(levels[rows] - exact[rows]) / exact[rows], axis=1)
+    return {
+        'sse_gap_mean_pct': float(gap.mean() * 100),
+        'sse_gap_p99_pct': float(np.percentile(gap, 99) * 100),
+        'sse_gap_max_pct': float(gap.max() * 100),
+        'identical_pct': float(np.mean(np.all(np.isclose(levels[rows], exact[rows]), axis=1)) * 100),
+        'deviation_p50_pct': float(np.median(deviation) * 100),
+        'deviation_p95_pct': float(np.percentile(deviation, 95) * 100),
+        'off_1pct': float(np.mean(deviation > 0.01) * 100),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bars', type=int, default=1500)
+    parser.add_argument('--window', type=int, default=250)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--symbols', type=int, default=4, help='不同随机种子的模拟股票数')
+    parser.add_argument('--refit-every', type=int, nargs='+', default=[1, 10, 20, 40])
+    args = parser.parse_args()
+
+    series = [make_prices(args.bars, seed=seed) for seed in range(args.symbols)]
+    started = time.perf_counter()
+    exact = [refit_every_day(prices, args.window, args.k) for prices in series]
+    baseline = time.perf_counter() - started
+    windows = args.symbols * (args.bars - args.window + 1)
+    print(f"{args.symbols} 只股票 x {args.bars} 根K线，窗口 {args.window}，共 {windows} 个窗口")
+    print(f"逐日全量重算: {baseline:.2f} 秒（{baseline / windows * 1e6:.0f}us/窗口）\n")
+
+    print(f"{'refit_every':>11} {'耗时(s)':>8} {'加速比':>7} {'精确占比':>8} {'平方和差距':>10} "
+          f"{'p99差距':>8} {'最大差距':>8} {'完全一致':>8} {'偏差p50':>8} {'偏差p95':>8} {'偏差>1%':>8}")
+    for refit_every in args.refit_every:
+        started = time.perf_counter()
+        results = [rolling_levels(prices, args.window, args.k, refit_every=refit_every,
+                                  return_stats=True) for prices in series]
+        elapsed = time.perf_counter() - started
+        refits = sum(stats['refit'] for _, stats in results)
+        metrics = [compare(prices, args.window, e, levels)
+                   for prices, e, (levels, _) in zip(series, exact, results)]
+        avg = {key: float(np.mean([m[key] for m in metrics])) for key in metrics[0]}
+        print(f"{refit_every:>11} {elapsed:>8.2f} {baseline / elapsed:>7.1f} {refits / windows:>7.0%} "
+              f"{avg['sse_gap_mean_pct']:>9.2f}% {avg['sse_gap_p99_pct']:>7.1f}% "
+              f"{max(m['sse_gap_max_pct'] for m in metrics):>7.1f}% "
+              f"{avg['identical_pct']:>7.1f}% {avg['deviation_p50_pct']:>7.2f}% "
+              f"{avg['deviation_p95_pct']:>7.2f}% {avg['off_1pct']:>7.1f}%")
+
+    print("\n精确计算一个窗口的耗时与逐日重算相当，加速比取决于需要精确计算的窗口占比。")
+    print("热启动没有误差上界，中心偏移或平方和超限时仍要精确重算（默认参数下约20%~25%的窗口），")
+    print("所以加速比只有约3倍，达不到10倍；回测默认 refit_every=20，需要与逐日重算完全一致时用 1。")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+冷启动基准测试：首帧时间与首次分析时间
+每次测量启动一个新的 Python 进程（模块缓存为空），akshare 由 fake_akshare 替代（按需导入，可注入网络延迟）:
+  - web:    导入 web_app 并响应首页 GET / 的时间为首帧；之后等待 --think 秒（用户输入代码），
+            再 POST /analyze（服务端绘图）完成的时间为首次分析
+  - mobile: Kivy 窗口画出第一帧为首帧；之后输入代码、点击分析，结果显示出来为首次分析（需要安装 kivy 和图形环境）
+对比 STOCK_PRELOAD=off（首次分析时才导入）与 idle（首帧后后台预加载）/ input（开始输入时预加载，仅移动端）
+
+用法:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --targets web --modes off idle --repeat 5 --think 0.5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# 子进程中 import akshare 时执行的替身：把 sys.modules['akshare'] 换成 fake_akshare，
+# 保持 akshare 的“首次使用时才导入”，不提前拉起 pandas
+AKSHARE_SHIM = '''
+import os, sys
+import fake_akshare
+latency = float(os.environ.get('BENCH_LATENCY', '0'))
+fake_akshare.configure(latency={name: (latency, 0.0) for name in fake_akshare.FUNCTIONS})
+sys.modules['akshare'] = fake_akshare
+'''
+
+
+def _since(t0):
+    return (time.time() - t0) * 1000
+
+
+def child_web(t0, think, code):
+    import preload
+    import web_app
+    client = web_app.app.test_client()
+    client.get('/')
+    result = {'first_frame': _since(t0)}
+    web_app.start_preload()
+
+    time.sleep(think)
+    result['press'] = _since(t0)
+    data = client.post('/analyze', json={'code': code, 'chart_mode': 'server'}).get_json()
+    if not data.get('success'):
+        raise RuntimeError(data.get('error'))
+    result['first_analysis'] = _since(t0)
+    result['preloaded'] = {k: round(v * 1000, 1) for k, v in preload.timings.items()}
+    return result
+
+
+def child_mobile(t0, think, code):
+    from kivy.clock import Clock
+    from kivy.core.window import Window
+    import preload
+    import main
+
+    result = {}
+
+    class BenchApp(main.StockAnalyzerApp):
+        def on_start(self):
+            super().on_start()
+            Window.bind(on_flip=self._first_frame)
+
+        def _first_frame(self, *args):
+            Window.unbind(on_flip=self._first_frame)
+            result['first_frame'] = _since(t0)
+            Clock.schedule_once(self._press, think)
+
+        def _press(self, dt):
+            root = self.root
+            show_results = root.show_results
+
+            def shown(*args, **kwargs):
+                show_results(*args, **kwargs)
+                result['first_analysis'] = _since(t0)
+                self.stop()
+            root.show_results = shown
+            root.stock_input.text = code
+            result['press'] = _since(t0)
+            root.start_analysis(None)
+
+    BenchApp().run()
+    result['preloaded'] = {k: round(v * 1000, 1) for k, v in preload.timings.items()}
+    return result
+
+
+def run_child(target, mode, think, code, latency, shim_dir):
+    """在新进程中测量一次，返回各时间点（毫秒，从启动进程算起）"""
+    work = tempfile.mkdtemp(prefix='bench_startup_')
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': os.pathsep.join([shim_dir, HERE, ROOT]),
+        'STOCK_PRELOAD': mode,
+        'STOCK_HISTORY_DB': os.path.join(work, 'history.sqlite3'),
+        'STOCK_CHART_CACHE_DIR': os.path.join(work, 'charts'),
+        'BENCH_LATENCY': str(latency),
+        'HOME': work,           # 移动端的应用目录（结果缓存、本地存储）也在临时目录中，保证冷启动
+        'KIVY_NO_ARGS': '1',
+    })
+    t0 = time.time()
+    env['BENCH_T0'] = repr(t0)
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', target,
+                           '--think', str(think), '--code', code],
+                          env=env, cwd=work, capture_output=True, text=True)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError(f"{target}/{mode} 测量失败:\n{proc.stderr[-2000:]}")
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description='冷启动基准测试')
+    parser.add_argument('--targets', nargs='+', default=['web', 'mobile'], choices=['web', 'mobile'])
+    parser.add_argument('--modes', nargs='+', default=['off', 'idle', 'input'],
+                        choices=['off', 'idle', 'input'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--think', type=float, default=1.0, help='首帧后到点击分析的间隔（秒）')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟的行情接口延迟（秒）')
+    parser.add_argument('--code', default='000001')
+    parser.add_argument('--output', help='结果另存为 JSON')
+    parser.add_argument('--child', choices=['web', 'mobile'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        t0 = float(os.environ['BENCH_T0'])
+        run = child_web if args.child == 'web' else child_mobile
+        print(json.dumps(run(t0, args.think, args.code)))
+        return
+
+    shim_dir = tempfile.mkdtemp(prefix='bench_shim_')
+    with open(os.path.join(shim_dir, 'akshare.py'), 'w', encoding='utf-8') as f:
+        f.write(AKSHARE_SHIM)
+
+    rows = []
+    print(f"{'目标':<8}{'预加载':<8}{'首帧ms':>10}{'首次分析ms':>12}{'点击后ms':>10}  预加载耗时")
+    for target in args.targets:
+        if target == 'mobile':
+            try:
+                import kivy  # noqa: F401
+            except ImportError:
+                print("mobile  跳过: 未安装 kivy")
+                continue
+        for mode in args.modes:
+            if target == 'web' and mode == 'input':
+                continue        # 服务端没有“开始输入”事件
+            runs = [run_child(target, mode, args.think, args.code, args.latency, shim_dir)
+                    for _ in range(args.repeat)]
+            row = {
+                'target': target,
+                'mode': mode,
+                'first_frame_ms': median([r['first_frame'] for r in runs]),
+                'first_analysis_ms': median([r['first_analysis'] for r in runs]),
+                'after_press_ms': median([r['first_analysis'] - r['press'] for r in runs]),
+                'preloaded_ms': runs[-1]['preloaded'],
+            }
+            rows.append(row)
+            preloaded = ' '.join(f"{k}={v:.0f}" for k, v in row['preloaded_ms'].items()) or '-'
+            print(f"{target:<8}{mode:<8}{row['first_frame_ms']:>10.0f}{row['first_analysis_ms']:>12.0f}"
+                  f"{row['after_press_ms']:>10.0f}  {preloaded}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'think': args.think, 'latency': args.latency, 'results': rows}, f,
+                      ensure_ascii=False, indent=2)
+        print(f"已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
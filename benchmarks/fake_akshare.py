@@ -0,0 +1,181 @@
+"""
+离线 akshare 替身（仅供基准测试使用）
+提供 stock_zh_a_hist_tx / stock_zh_a_daily / stock_zh_a_hist 三个接口，
+数据来自 record_fixtures.py 录制的夹具文件，没有夹具的股票按代码生成确定的模拟行情；
+可为每个数据源配置延迟和失败率，模拟上游变慢或限流
+
+用法:
+    import fake_akshare
+    fake_akshare.install(latency={'tencent': (0.2, 0.05)}, failure_rate={'sina': 0.3})
+    import stock_data   # 之后导入的 akshare 即为本模块
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# 数据源名称与 akshare 函数的对应关系（与 stock_data.SOURCES 一致）
+FUNCTIONS = {
+    'tencent': 'stock_zh_a_hist_tx',
+    'sina': 'stock_zh_a_daily',
+    'eastmoney': 'stock_zh_a_hist',
+}
+
+# 模拟行情的起始日期（截止到今天，和真实接口一样没有未来数据）
+SYNTHETIC_START = '2023-01-02'
+
+_config = {
+    'fixture_dir': FIXTURE_DIR,
+    'latency': {},          # 数据源 -> (平均延迟秒, 抖动秒)
+    'failure_rate': {},     # 数据源 -> 失败概率
+    'synthetic': True,      # 没有夹具时是否生成模拟行情
+}
+_cache = {}
+_cache_lock = threading.Lock()
+_rng = random.Random(0)
+_rng_lock = threading.Lock()
+calls = {name: 0 for name in FUNCTIONS}
+
+
+class UpstreamError(RuntimeError):
+    """注入的上游失败"""
+
+
+def configure(latency=None, failure_rate=None, fixture_dir=None, synthetic=None, seed=None):
+    """修改延迟、失败率等配置，未传入的参数保持不变"""
+    if latency is not None:
+        _config['latency'] = dict(latency)
+    if failure_rate is not None:
+        _config['failure_rate'] = dict(failure_rate)
+    if fixture_dir is not None:
+        _config['fixture_dir'] = fixture_dir
+        with _cache_lock:
+            _cache.clear()
+    if synthetic is not None:
+        _config['synthetic'] = synthetic
+    if seed is not None:
+        with _rng_lock:
+            _rng.seed(seed)
+
+
+def install(**kwargs):
+    """替换 sys.modules 中的 akshare，需在导入 stock_data 之前调用"""
+    configure(**kwargs)
+    sys.modules['akshare'] = sys.modules[__name__]
+    return sys.modules[__name__]
+
+
+def reset_calls():
+    for name in calls:
+        calls[name] = 0
+
+
+def plain_code(symbol):
+    """sz000001 / 000001 -> 000001"""
+    return symbol[-6:]
+
+
+def fixture_path(source, code, fixture_dir=None):
+    return os.path.join(fixture_dir or _config['fixture_dir'], source, f"{code}.csv.gz")
+
+
+def synthetic_bars(code):
+    """按代码生成确定的日线（几何随机游走，价格保留两位小数）"""
+    seed = int(code) if code.isdigit() else abs(hash(code)) % (2 ** 32)
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(SYNTHETIC_START, pd.Timestamp.today().normalize())
+    start = rng.uniform(5, 50)
+    close = np.round(start * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates)))), 2)
+    open_ = np.round(close * (1 + rng.normal(0, 0.005, len(dates))), 2)
+    high = np.round(np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, len(dates)))), 2)
+    low = np.round(np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, len(dates)))), 2)
+    volume = rng.integers(1_000_000, 50_000_000, len(dates)).astype(float)
+    return pd.DataFrame({
+        'date': dates, 'open': open_, 'high': high, 'low': low, 'close': close,
+        'volume': volume, 'amount': np.round(volume * close, 2),
+    })
+
+
+def to_source_format(bars, source):
+    """把标准日线转换为各 akshare 接口原始返回的字段格式"""
+    if source == 'tencent':
+        # 腾讯接口的 amount 为成交量（手）
+        return pd.DataFrame({
+            'date': bars['date'].dt.date, 'open': bars['open'], 'close': bars['close'],
+            'high': bars['high'], 'low': bars['low'], 'amount': bars['volume'] / 100,
+        })
+    if source == 'sina':
+        return pd.DataFrame({
+            'date': bars['date'].dt.date, 'open': bars['open'], 'high': bars['high'],
+            'low': bars['low'], 'close': bars['close'], 'volume': bars['volume'],
+            'amount': bars['amount'],
+        })
+    return pd.DataFrame({
+        '日期': bars['date'].dt.date, '开盘': bars['open'], '收盘': bars['close'],
+        '最高': bars['high'], '最低': bars['low'], '成交量': bars['volume'] / 100,
+        '成交额': bars['amount'],
+    })
+
+
+def _load(source, code):
+    key = (source, code)
+    with _cache_lock:
+        df = _cache.get(key)
+    if df is not None:
+        return df
+    path = fixture_path(source, code)
+    if os.path.exists(path):
+        df = pd.read_csv(path)
+        date_col = 'date' if 'date' in df.columns else '日期'
+        df[date_col] = pd.to_datetime(df[date_col]).dt.date
+    elif _config['synthetic']:
+        df = to_source_format(synthetic_bars(code), source)
+    else:
+        df = pd.DataFrame()
+    with _cache_lock:
+        _cache[key] = df
+    return df
+
+
+def _simulate(source):
+    """按配置注入延迟和失败"""
+    calls[source] += 1
+    mean, jitter = _config['latency'].get(source, (0.0, 0.0))
+    with _rng_lock:
+        delay = max(0.0, _rng.gauss(mean, jitter)) if mean or jitter else 0.0
+        failed = _rng.random() < _config['failure_rate'].get(source, 0.0)
+    if delay:
+        time.sleep(delay)
+    if failed:
+        raise UpstreamError(f"{FUNCTIONS[source]}: 注入的上游失败")
+
+
+def _query(source, symbol, start_date, end_date):
+    _simulate(source)
+    df = _load(source, plain_code(symbol))
+    if df.empty:
+        return df.copy()
+    date_col = 'date' if 'date' in df.columns else '日期'
+    dates = pd.to_datetime(df[date_col])
+    mask = (dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))
+    return df[mask.values].reset_index(drop=True)
+
+
+def stock_zh_a_hist_tx(symbol, start_date='19000101', end_date='20500101', adjust='', timeout=None):
+    return _query('tencent', symbol, start_date, end_date)
+
+
+def stock_zh_a_daily(symbol, start_date='19900101', end_date='21000118', adjust=''):
+    return _query('sina', symbol, start_date, end_date)
+
+
+def stock_zh_a_hist(symbol, period='daily', start_date='19700101', end_date='20500101',
+                    adjust='', timeout=None):
+    return _query('eastmoney', symbol, start_date, end_date)
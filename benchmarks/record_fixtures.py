@@ -0,0 +1,88 @@
+"""
+录制基准测试用的上游夹具
+从真实的腾讯/新浪/东方财富接口下载原始返回数据，保存到 benchmarks/fixtures/<数据源>/<代码>.csv.gz，
+之后 fake_akshare 会原样回放；没有网络时可用 --synthetic 生成同样格式的模拟夹具
+
+用法:
+    python benchmarks/record_fixtures.py 000001 600000 600519
+    python benchmarks/record_fixtures.py --synthetic --count 200
+"""
+
+import argparse
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import fake_akshare  # noqa: E402
+
+
+def record_live(codes, start_date, end_date, fixture_dir):
+    """调用真实 akshare 录制（不复权，与回放时的 adjust 参数无关）"""
+    import akshare as ak
+    for code in codes:
+        market = ('sh' if code.startswith('6') else 'sz') + code
+        requests = {
+            'tencent': lambda: ak.stock_zh_a_hist_tx(symbol=market, start_date=start_date,
+                                                     end_date=end_date, adjust='qfq'),
+            'sina': lambda: ak.stock_zh_a_daily(symbol=market, start_date=start_date,
+                                                end_date=end_date, adjust='qfq'),
+            'eastmoney': lambda: ak.stock_zh_a_hist(symbol=code, period='daily', start_date=start_date,
+                                                    end_date=end_date, adjust='qfq'),
+        }
+        for source, request in requests.items():
+            try:
+                df = request()
+            except Exception as e:
+                print(f"{code} {source} 失败: {e}")
+                continue
+            if df is None or df.empty:
+                print(f"{code} {source} 返回数据为空")
+                continue
+            save(df, source, code, fixture_dir)
+            print(f"{code} {source}: {len(df)} 条")
+
+
+def record_synthetic(codes, fixture_dir):
+    for code in codes:
+        bars = fake_akshare.synthetic_bars(code)
+        for source in fake_akshare.FUNCTIONS:
+            save(fake_akshare.to_source_format(bars, source), source, code, fixture_dir)
+    print(f"已生成 {len(codes)} 只股票的模拟夹具")
+
+
+def save(df, source, code, fixture_dir):
+    path = fake_akshare.fixture_path(source, code, fixture_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, index=False, compression='gzip')
+
+
+def synthetic_codes(count):
+    """深市和沪市各一半的代码"""
+    half = count // 2
+    return [f"{i:06d}" for i in range(1, half + 1)] + \
+           [f"{600000 + i:06d}" for i in range(count - half)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('codes', nargs='*', help='股票代码（6位数字）')
+    parser.add_argument('--synthetic', action='store_true', help='不联网，生成模拟夹具')
+    parser.add_argument('--count', type=int, default=50, help='--synthetic 且未指定代码时生成的股票数')
+    parser.add_argument('--start', default='20230101')
+    parser.add_argument('--end', default='20261231')
+    parser.add_argument('--dir', default=fake_akshare.FIXTURE_DIR, help='夹具目录')
+    args = parser.parse_args()
+
+    codes = [c.split('.')[0] for c in args.codes]
+    if args.synthetic:
+        record_synthetic(codes or synthetic_codes(args.count), args.dir)
+    elif codes:
+        record_live(codes, args.start, args.end, args.dir)
+    else:
+        parser.error('请指定股票代码，或使用 --synthetic')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+离线基准测试套件
+用 fake_akshare 回放夹具（可注入延迟和失败），测量：
+  - 端到端 /analyze 吞吐量与 p50/p95/p99 延迟（Flask 测试客户端，多线程并发）
+  - 聚类、绘图、序列编码的微基准
+结果写入 JSON（默认 benchmarks/results/<提交>.json），可用 --compare 与另一次结果对比
+
+用法:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --requests 400 --concurrency 16 --latency tencent=0.2,0.05
+    python benchmarks/run_benchmarks.py --failure tencent=0.3 --compare benchmarks/results/abc1234.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+sys.path.insert(0, ROOT)
+
+import fake_akshare  # noqa: E402
+from record_fixtures import synthetic_codes  # noqa: E402
+
+
+def parse_source_values(items, n_values):
+    """解析 tencent=0.2,0.05 形式的参数"""
+    result = {}
+    for item in items or []:
+        name, _, value = item.partition('=')
+        values = [float(v) for v in value.split(',')]
+        values += [0.0] * (n_values - len(values))
+        result[name] = tuple(values[:n_values]) if n_values > 1 else values[0]
+    return result
+
+
+def git_revision():
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return rev + ('-dirty' if dirty else '')
+    except Exception:
+        return 'unknown'
+
+
+def summarize(latencies):
+    ms = np.asarray(latencies) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+        'mean_ms': round(float(ms.mean()), 2),
+    }
+
+
+def time_repeat(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+
+def bench_analyze(web_app, codes, requests, concurrency, chart_mode):
+    """
+    端到端 /analyze：每个请求轮流选择一只股票
+    返回模拟数据（synthetic）的请求记为失败；statuses 统计各数据状态的请求数，
+    其中 offline 为数据源失败后由本地存储兜底的请求
+    """
+    client = web_app.app.test_client()
+    latencies = []
+    failures = 0
+    statuses = {}
+
+    def one(i):
+        started = time.perf_counter()
+        response = client.post('/analyze', json={'code': codes[i % len(codes)],
+                                                 'chart_mode': chart_mode})
+        data = response.get_json() if response.status_code == 200 else {}
+        status = data.get('data_status', 'error') if data.get('success') else 'error'
+        return time.perf_counter() - started, status
+
+    fake_akshare.reset_calls()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, status in pool.map(one, range(requests)):
+            latencies.append(latency)
+            statuses[status] = statuses.get(status, 0) + 1
+            failures += status in ('error', 'synthetic')
+    elapsed = time.perf_counter() - started
+    result = {
+        'requests': requests,
+        'concurrency': concurrency,
+        'chart_mode': chart_mode,
+        'throughput_rps': round(requests / elapsed, 2),
+        'failures': failures,
+        'statuses': statuses,
+        'upstream_calls': dict(fake_akshare.calls),
+    }
+    result.update(summarize(latencies))
+    return result
+
+
+def bench_micro(sizes, repeat):
+    import pandas as pd
+    from cluster_levels import find_levels
+    from chart_render import render_levels_png
+    import web_app
+
+    results = {}
+    for n in sizes:
+        bars = fake_akshare.synthetic_bars('000001').iloc[:n]
+        index = pd.DatetimeIndex(bars['date'])
+        close = bars['close'].values
+        centers = find_levels(close, 5)
+        df = pd.DataFrame({'close': close}, index=index)
+        results[f'cluster_n{n}'] = time_repeat(lambda: find_levels(close, 5), repeat)
+        results[f'render_n{n}'] = time_repeat(
+            lambda: render_levels_png(index, close, centers, '000001'), max(1, repeat // 5))
+        results[f'encode_series_n{n}'] = time_repeat(lambda: web_app.encode_series(df), repeat)
+    return results
+
+
+def compare(current, baseline_path):
+    """打印与基准结果的对比（比值 >1 表示变慢）"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\n对比 {baseline.get('revision')} -> {current['revision']}")
+    print(f"{'项目':<36} {'基准':>10} {'当前':>10} {'比值':>7}")
+    pairs = [(f"analyze.{k}", baseline['analyze'].get(k), current['analyze'].get(k))
+             for k in ('throughput_rps', 'p50_ms', 'p99_ms')]
+    for name, stats in current['micro'].items():
+        pairs.append((f"{name}.p50_ms", baseline['micro'].get(name, {}).get('p50_ms'), stats['p50_ms']))
+    for name, old, new in pairs:
+        if old is None or not old:
+            continue
+        print(f"{name:<36} {old:>10.2f} {new:>10.2f} {new / old:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--symbols', type=int, default=50, help='请求轮流使用的股票数')
+    parser.add_argument('--chart-mode', default='server', choices=['server', 'client', 'none'])
+    parser.add_argument('--latency', action='append', metavar='源=平均,抖动',
+                        help='注入延迟（秒），如 tencent=0.2,0.05，可重复')
+    parser.add_argument('--failure', action='append', metavar='源=概率',
+                        help='注入失败率，如 tencent=0.3，可重复')
+    parser.add_argument('--fresh-seconds', default='0',
+                        help='本地存储新鲜期（秒），默认0即每次都向上游增量检查')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[250, 1000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--fixtures', default=fake_akshare.FIXTURE_DIR)
+    parser.add_argument('--output', help='结果文件，默认 benchmarks/results/<提交>.json')
+    parser.add_argument('--compare', help='与之前的结果文件对比')
+    parser.add_argument('--verbose', action='store_true', help='显示应用自身的日志输出')
+    args = parser.parse_args()
+
+    latency = parse_source_values(args.latency, 2)
+    failure_rate = parse_source_values(args.failure, 1)
+    fake_akshare.install(latency=latency, failure_rate=failure_rate,
+                         fixture_dir=args.fixtures, seed=0)
+
+    # 每次运行使用独立的本地存储和图表缓存，结果不受之前运行的影响
+    workdir = tempfile.mkdtemp(prefix='stock-bench-')
+    os.environ['STOCK_HISTORY_DB'] = os.path.join(workdir, 'history.sqlite3')
+    os.environ['STOCK_CHART_CACHE_DIR'] = os.path.join(workdir, 'charts')
+    os.environ['STOCK_STORE_FRESH_SECONDS'] = args.fresh_seconds
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        import web_app
+        import metrics
+        codes = synthetic_codes(args.symbols)
+        analyze_cold = bench_analyze(web_app, codes, len(codes), args.concurrency, args.chart_mode)
+        metrics.REGISTRY.reset()
+        analyze = bench_analyze(web_app, codes, args.requests, args.concurrency, args.chart_mode)
+        stages = {
+            f"{stage}[{source}]/{outcome}" if source else f"{stage}/{outcome}":
+                {'count': count, 'mean_ms': round(total / count * 1000, 3)}
+            for (_, stage, source, outcome), (count, total) in sorted(metrics.STAGE_SECONDS.stats().items())
+        }
+        micro = bench_micro(args.sizes, args.repeat)
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'latency': latency, 'failure_rate': failure_rate,
+            'fresh_seconds': float(args.fresh_seconds), 'symbols': args.symbols,
+        },
+        'analyze_cold': analyze_cold,
+        'analyze': analyze,
+        'stages': stages,
+        'micro': micro,
+    }
+
+    print(f"/analyze 首次请求: {analyze_cold['throughput_rps']} req/s, "
+          f"p50 {analyze_cold['p50_ms']}ms, p99 {analyze_cold['p99_ms']}ms")
+    print(f"/analyze 稳态:     {analyze['throughput_rps']} req/s, "
+          f"p50 {analyze['p50_ms']}ms, p99 {analyze['p99_ms']}ms, 失败 {analyze['failures']}"
+          f"（模拟数据 {analyze['statuses'].get('synthetic', 0)}，"
+          f"本地存储兜底 {analyze['statuses'].get('offline', 0)}）")
+    for name, stats in micro.items():
+        print(f"{name:<24} p50 {stats['p50_ms']:>8.2f}ms  p99 {stats['p99_ms']:>8.2f}ms")
+
+    output = args.output or os.path.join(HERE, 'results', f"{report['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -23,6 +23,7 @@ source.include_exts = py,png,jpg,kv,atlas,ttf
 
 # (list) List of directory to exclude (let empty to not exclude anything)
 #source.exclude_dirs = tests, bin, venv
+source.exclude_dirs = benchmarks
 
 # (list) List of exclusions using pattern matching
 # Do not prefix with './'
@@ -37,7 +38,7 @@ version = 1.0.0
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3,kivy,pandas,numpy,matplotlib,scikit-learn,akshare,requests,urllib3,lxml,beautifulsoup4,openpyxl
+requirements = python3,sqlite3,kivy,pandas,numpy,matplotlib,akshare,requests,urllib3,lxml,beautifulsoup4,openpyxl
 
 # (str) Custom source folders for requirements
 # Sets custom source for any requirements with recipes
@@ -0,0 +1,119 @@
+"""
+图表缓存
+按 (价格序列, 聚类中心, 绘图参数) 的哈希缓存已渲染的PNG，内存 + 磁盘两级，均按最近使用淘汰
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_KEY_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def default_cache_dir():
+    """默认磁盘缓存目录，可通过环境变量 STOCK_CHART_CACHE_DIR 覆盖"""
+    path = os.environ.get('STOCK_CHART_CACHE_DIR')
+    if path:
+        return path
+    return os.path.join(os.path.expanduser('~'), '.stock_analyzer', 'charts')
+
+
+def make_key(index, close, centers, **params):
+    """由价格序列、聚类中心和绘图参数计算内容哈希（32位十六进制）"""
+    digest = hashlib.sha256()
+    digest.update(np.asarray(index).astype('datetime64[ns]').view(np.int64).tobytes())
+    digest.update(np.ascontiguousarray(close, dtype=np.float64).tobytes())
+    digest.update(np.round(np.asarray(centers, dtype=np.float64), 6).tobytes())
+    digest.update(repr(sorted(params.items())).encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+def is_valid_key(key):
+    return bool(_KEY_RE.match(key or ''))
+
+
+class ChartCache:
+    """两级LRU图表缓存（线程安全；多进程共享磁盘目录）"""
+
+    def __init__(self, directory=None, max_memory_items=64, max_disk_items=2000):
+        self.directory = directory or default_cache_dir()
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.png')
+
+    def get(self, key):
+        """读取缓存的PNG，不存在时返回None"""
+        if not is_valid_key(key):
+            return None
+        with self._lock:
+            png = self._memory.get(key)
+            if png is not None:
+                self._memory.move_to_end(key)
+                return png
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+            os.utime(path)      # 更新访问时间，供磁盘LRU淘汰使用
+        except OSError:
+            return None
+        self._remember(key, png)
+        return png
+
+    def put(self, key, png):
+        self._remember(key, png)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"图表缓存写入失败: {e}")
+            return
+        with self._lock:
+            self._disk_writes += 1
+            should_evict = self._disk_writes % 50 == 0
+        if should_evict:
+            self._evict_disk()
+
+    def get_or_render(self, key, render):
+        """命中缓存直接返回，否则调用 render() 生成PNG并写入缓存"""
+        png = self.get(key)
+        if png is None:
+            png = render()
+            self.put(key, png)
+        return png
+
+    def _remember(self, key, png):
+        with self._lock:
+            self._memory[key] = png
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """磁盘文件数超过上限时删除最久未使用的文件"""
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith('.png')]
+        except OSError:
+            return
+        excess = len(entries) - self.max_disk_items
+        if excess <= 0:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:excess]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
@@ -0,0 +1,140 @@
+"""
+图表渲染
+基于 matplotlib.figure.Figure + Agg 画布，不使用 pyplot 的全局状态。
+每个线程持有一个预先设置好样式的模板图，每次渲染只更新价格线和水平线的数据
+"""
+
+import io
+import threading
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.dates as mdates
+
+from metrics import timed
+
+# 各前端的图表样式
+STYLES = {
+    'web': {
+        'figsize': (12, 6),
+        'dpi': 150,
+        'line_color': 'blue',
+        'level_colors': ['red', 'green', 'orange', 'purple', 'brown'],
+        'title_size': 14,
+        'label_size': 12,
+        'rotate_dates': 0,
+    },
+    'mobile': {
+        'figsize': (10, 6),
+        'dpi': 150,
+        'line_color': 'blue',
+        'level_colors': ['red', 'green', 'orange', 'purple', 'brown'],
+        'title_size': 14,
+        'label_size': 12,
+        'rotate_dates': 0,
+    },
+    'streamlit': {
+        'figsize': (10, 6),
+        'dpi': 100,
+        'line_color': '#00d4ff',
+        'level_colors': ['#ff4444', '#44ff44', '#ffaa00', '#aa44ff', '#ff44aa'],
+        'title_size': 14,
+        'label_size': 10,
+        'rotate_dates': 45,
+    },
+}
+
+
+class LevelChartRenderer:
+    """
+    股价与支撑/压力位图表的模板图
+    坐标轴、网格、标签只在创建时设置一次；每次 update 只修改数据和文字，
+    水平线按需增加，多余的隐藏。实例不是线程安全的，请通过 get_renderer 按线程获取
+    """
+
+    def __init__(self, style='web'):
+        self.style = dict(STYLES[style]) if isinstance(style, str) else dict(style)
+        self.figure = Figure(figsize=self.style['figsize'], dpi=self.style['dpi'])
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.ax.xaxis_date()
+        self.ax.grid(True, alpha=0.3)
+        self.ax.set_xlabel("日期", fontsize=self.style['label_size'])
+        self.ax.set_ylabel("价格", fontsize=self.style['label_size'])
+        if self.style['rotate_dates']:
+            self.ax.tick_params(axis='x', labelrotation=self.style['rotate_dates'])
+        self.title = self.ax.set_title('', fontsize=self.style['title_size'])
+        self.price_line, = self.ax.plot([], [], label="收盘价",
+                                        color=self.style['line_color'], linewidth=1.5)
+        self.level_lines = []
+        self.legend = None
+        # 固定边距，避免每次渲染都做 tight_layout 的额外布局计算
+        self.figure.subplots_adjust(left=0.07, right=0.98, top=0.93,
+                                    bottom=0.16 if self.style['rotate_dates'] else 0.1)
+
+    def _level_line(self, i):
+        while len(self.level_lines) <= i:
+            colors = self.style['level_colors']
+            n = len(self.level_lines)
+            self.level_lines.append(self.ax.axhline(0, color=colors[n % len(colors)],
+                                                    linestyle="--", alpha=0.7))
+        return self.level_lines[i]
+
+    def update(self, index, close, centers, title):
+        """用新数据更新模板图"""
+        x = mdates.date2num(np.asarray(index, dtype='datetime64[ns]'))
+        y = np.asarray(close, dtype=float)
+        self.price_line.set_data(x, y)
+
+        labels = ["收盘价"]
+        for i, c in enumerate(centers):
+            line = self._level_line(i)
+            line.set_ydata([c, c])
+            line.set_visible(True)
+            labels.append(f'Level {i+1}: {c:.2f}')
+        for line in self.level_lines[len(centers):]:
+            line.set_visible(False)
+
+        self.title.set_text(title)
+        lo = min(np.nanmin(y), min(centers, default=np.nanmin(y)))
+        hi = max(np.nanmax(y), max(centers, default=np.nanmax(y)))
+        margin = (hi - lo) * 0.05 or 1.0
+        self.ax.set_xlim(x[0], x[-1] if x[-1] > x[0] else x[0] + 1)
+        self.ax.set_ylim(lo - margin, hi + margin)
+
+        # 图例条目数不变时只改文字，否则重建
+        if self.legend is not None and len(self.legend.get_texts()) == len(labels):
+            for text, label in zip(self.legend.get_texts(), labels):
+                text.set_text(label)
+        else:
+            handles = [self.price_line] + self.level_lines[:len(centers)]
+            self.legend = self.ax.legend(handles, labels)
+        return self.figure
+
+    def render_png(self, index, close, centers, title):
+        """更新并渲染为PNG字节"""
+        with timed('render'):
+            self.update(index, close, centers, title)
+            buffer = io.BytesIO()
+            self.canvas.print_png(buffer)
+        return buffer.getvalue()
+
+
+_local = threading.local()
+
+
+def get_renderer(style='web'):
+    """获取当前线程的模板图（每个线程、每种样式各一个）"""
+    renderers = getattr(_local, 'renderers', None)
+    if renderers is None:
+        renderers = _local.renderers = {}
+    renderer = renderers.get(style)
+    if renderer is None:
+        renderer = renderers[style] = LevelChartRenderer(style)
+    return renderer
+
+
+def render_levels_png(index, close, centers, title, style='web'):
+    """线程安全的渲染入口"""
+    return get_renderer(style).render_png(index, close, centers, title)
@@ -0,0 +1,544 @@
+"""
+一维最优聚类（支撑/压力位计算）
+收盘价是一维数据，按 Ckmeans.1d.dp 的思路对排序后的价格做前缀和 + 动态规划，
+得到全局最优、结果确定的聚类中心，替代 sklearn KMeans 的随机初始化迭代
+"""
+
+import numpy as np
+
+from metrics import timed
+
+
+class LevelFit:
+    """
+    聚类结果: centers 升序中心, labels 每个原始点所属簇（增量更新后为 None，可用 assign 计算），
+    sse 簇内平方和, counts 每簇点数；
+    values/weights 为排序去重后的数据及权重，starts 为各簇在 values 中的起点，供增量更新使用；
+    anchor / bound 为最近一次精确计算的中心和平方和（追加数据只会使最优平方和变大，bound 即当前最优解的下界），
+    updates 为此后增量更新的次数；不传时表示本身就是精确解
+    """
+
+    def __init__(self, centers, labels, sse, counts, values=None, weights=None, starts=None,
+                 anchor=None, bound=None, updates=0):
+        self.centers = centers
+        self.labels = labels
+        self.sse = sse
+        self.counts = counts
+        self.values = values
+        self.weights = weights
+        self.starts = starts
+        self.anchor = centers if anchor is None else anchor
+        self.bound = sse if bound is None else bound
+        self.updates = updates
+
+    @property
+    def gap_bound(self):
+        """平方和相对最优解差距的上界: sse / bound - 1"""
+        return self.sse / self.bound - 1 if self.bound > 0 else (0.0 if self.sse <= 0 else np.inf)
+
+    @property
+    def edges(self):
+        """相邻两簇之间的分界价格（一维聚类的每个簇都是一个价格区间）"""
+        lower = self.values[self.starts[1:] - 1]
+        upper = self.values[self.starts[1:]]
+        return (lower + upper) / 2
+
+    def ranges(self):
+        """各簇的 (最低值, 最高值)"""
+        ends = np.append(self.starts[1:], len(self.values)) - 1
+        return self.values[self.starts], self.values[ends]
+
+    def assign(self, values):
+        """计算任意价格所属的簇"""
+        return np.searchsorted(self.edges, np.asarray(values, dtype=float), side='right')
+
+    def __repr__(self):
+        return f"LevelFit(centers={np.round(self.centers, 4).tolist()}, sse={self.sse:.6g})"
+
+
+class _Prefix:
+    """排序去重后的加权前缀和，用于 O(1) 计算任意区间的簇内平方和"""
+
+    def __init__(self, values, weights):
+        # 平移到均值附近，减少平方和相减时的精度损失
+        self.values = values
+        self.shift = float(np.average(values, weights=weights))
+        x = values - self.shift
+        self.s0 = np.concatenate(([0.0], np.cumsum(weights)))
+        self.s1 = np.concatenate(([0.0], np.cumsum(weights * x)))
+        self.s2 = np.concatenate(([0.0], np.cumsum(weights * x * x)))
+
+    def cost(self, j, i):
+        """区间 [j, i]（含两端，可为数组）的簇内平方和"""
+        w = self.s0[i + 1] - self.s0[j]
+        s = self.s1[i + 1] - self.s1[j]
+        return np.maximum(self.s2[i + 1] - self.s2[j] - s * s / w, 0.0)
+
+    def mean(self, j, i):
+        return (self.s1[i + 1] - self.s1[j]) / (self.s0[i + 1] - self.s0[j]) + self.shift
+
+    def add(self, i, w):
+        """第 i 个值的权重增加 w（可为负），前缀和原地更新"""
+        x = self.values[i] - self.shift
+        self.s0[i + 1:] += w
+        self.s1[i + 1:] += w * x
+        self.s2[i + 1:] += w * x * x
+
+
+def _compress(values, weights=None):
+    """排序去重，返回 (唯一值, 权重, 原始点到唯一值的下标)"""
+    x = np.asarray(values, dtype=float).ravel()
+    if weights is None:
+        uniq, inverse, counts = np.unique(x, return_inverse=True, return_counts=True)
+        return uniq, counts.astype(float), inverse
+    uniq, inverse = np.unique(x, return_inverse=True)
+    w = np.bincount(inverse, weights=np.asarray(weights, dtype=float).ravel(),
+                    minlength=len(uniq))
+    return uniq, w, inverse
+
+
+# 去重后的值不超过该个数时直接构造完整的区间代价矩阵，否则用分治法
+DENSE_LIMIT = 200
+
+
+def _dp_tables(prefix, m, k_max, full_last=False):
+    """
+    逐层动态规划: D[q][i] 为前 i+1 个唯一值分成 q+1 簇的最小平方和，
+    B[q][i] 为最后一簇的起点；每层同时给出 k=q+1 的最优解。
+    full_last=False 时最后一层只计算 i=m-1（单个 k 的回溯只需要这一点）
+    """
+    D = np.full((k_max, m), np.inf)
+    B = np.zeros((k_max, m), dtype=np.int64)
+    idx = np.arange(m)
+    D[0] = prefix.cost(np.zeros(m, dtype=np.int64), idx)
+    if k_max == 1:
+        return D, B
+
+    if m <= DENSE_LIMIT:
+        fill = _dense_layers(prefix, m)
+    else:
+        fill = _tree_layers(prefix, m)
+    for q in range(1, k_max):
+        if q == k_max - 1 and not full_last:
+            j = np.arange(q, m)
+            vals = D[q - 1][j - 1] + prefix.cost(j, np.full(len(j), m - 1))
+            best = int(np.argmin(vals))
+            D[q][m - 1] = vals[best]
+            B[q][m - 1] = j[best]
+        else:
+            fill(D, B, q)
+    return D, B
+
+
+def _dense_layers(prefix, m):
+    """构造完整的区间代价矩阵 cost[j, i]（j > i 为无穷大），每层一次矩阵运算"""
+    w = prefix.s0[None, 1:] - prefix.s0[:-1, None]
+    s = prefix.s1[None, 1:] - prefix.s1[:-1, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cost = prefix.s2[None, 1:] - prefix.s2[:-1, None] - s * s / w
+    cost = np.where(w > 0, np.maximum(cost, 0.0), np.inf)
+    cols = np.arange(m)
+
+    def fill(D, B, q):
+        prev = np.full(m, np.inf)
+        prev[q:] = D[q - 1][q - 1:-1]       # 起点 j 之前的部分为 D[q-1][j-1]
+        total = prev[:, None] + cost
+        B[q] = np.argmin(total, axis=0)
+        D[q] = total[B[q], cols]
+        D[q][:q] = np.inf
+    return fill
+
+
+def _tree_layers(prefix, m):
+    """
+    分治法：最优起点随 i 单调不减，先二分 i 再在父节点给出的起点范围内搜索。
+    区间的二分结构与层无关，预先按递归深度展开，每个深度的所有中点用一次向量运算求解
+    """
+    levels = []
+    lo = np.array([1])
+    hi = np.array([m - 1])
+    while len(lo):
+        mid = (lo + hi) // 2
+        # 区间外侧的点（lo-1、hi+1）在更浅的深度已求出，给出起点的上下界
+        levels.append((mid, lo - 1, hi + 1))
+        left = mid - 1 >= lo
+        right = mid + 1 <= hi
+        lo, hi = (np.concatenate((lo[left], mid[right] + 1)),
+                  np.concatenate((mid[left] - 1, hi[right])))
+
+    def fill(D, B, q):
+        prev = D[q - 1]
+        bound = np.empty(m + 1, dtype=np.int64)
+        bound[0] = 0
+        bound[m] = m - 1
+        for mid, before, after in levels:
+            start = np.maximum(bound[before], q)
+            stop = np.minimum(mid, bound[after])
+            # i < q 时不存在合法起点，取 j=i 仅作为右侧节点的下界
+            empty = stop < start
+            start[empty] = mid[empty]
+            stop[empty] = mid[empty]
+            best_vals, best = _segment_argmin(prev, prefix, mid, start, stop - start + 1)
+            D[q][mid] = best_vals
+            bound[mid] = best
+        B[q] = bound[:m]
+        D[q][:q] = np.inf
+    return fill
+
+
+def _segment_argmin(prev, prefix, points, start, lengths):
+    """对每个点 i 在候选起点 [start, start+length) 中求 D[q-1][j-1] + cost(j, i) 的最小值"""
+    offsets = np.cumsum(lengths) - lengths
+    seg = np.repeat(np.arange(len(points)), lengths)
+    # 把各点的候选起点拼成一个扁平数组
+    j = np.arange(offsets[-1] + lengths[-1]) - offsets[seg] + start[seg]
+    vals = prev[j - 1] + prefix.cost(j, points[seg])
+    best_vals = np.minimum.reduceat(vals, offsets)
+    first = np.flatnonzero(vals == best_vals[seg])
+    return best_vals, j[first[np.searchsorted(first, offsets)]]
+
+
+def _backtrack(B, k, m):
+    """回溯得到各簇在唯一值中的 [起点, 终点]"""
+    bounds = []
+    end = m - 1
+    for q in range(k - 1, -1, -1):
+        start = int(B[q][end]) if q > 0 else 0
+        bounds.append((start, end))
+        end = start - 1
+    bounds.reverse()
+    return bounds
+
+
+def _fit_from_tables(prefix, D, B, k, uniq_weights, inverse, m):
+    bounds = _backtrack(B, k, m)
+    centers = np.array([prefix.mean(j, i) for j, i in bounds])
+    uniq_labels = np.empty(m, dtype=np.int64)
+    for c, (j, i) in enumerate(bounds):
+        uniq_labels[j:i + 1] = c
+    counts = np.bincount(uniq_labels, weights=uniq_weights, minlength=k)
+    starts = np.array([j for j, _ in bounds], dtype=np.int64)
+    return LevelFit(centers, uniq_labels[inverse], float(D[k - 1][m - 1]), counts,
+                    prefix.values, uniq_weights, starts)
+
+
+def kmeans_1d(values, k, weights=None):
+    """
+    一维 k-means 的全局最优解
+    values: 一维数据；weights: 可选的每点权重；去重后的值少于 k 个时簇数相应减少
+    """
+    uniq, w, inverse = _compress(values, weights)
+    m = len(uniq)
+    if m == 0:
+        raise ValueError("没有可用于聚类的数据")
+    k = max(1, min(int(k), m))
+    prefix = _Prefix(uniq, w)
+    D, B = _dp_tables(prefix, m, k)
+    return _fit_from_tables(prefix, D, B, k, w, inverse, m)
+
+
+# 自动选择簇数时的候选范围
+K_MIN = 2
+K_MAX = 10
+
+
+def _bic(prefix, D, B, m, k, scale=1.0):
+    """
+    等方差一维高斯混合的 BIC（X-means 的打分方式，越大越好）:
+    对数似然 - 参数个数 / 2 * ln n，参数为 k-1 个混合比例、k 个均值和 1 个方差；
+    scale 把权重换算为样本数
+    """
+    n = prefix.s0[-1] * scale
+    sse = D[k - 1][m - 1] * scale
+    if sse <= 0:
+        return np.inf       # 完全拟合（每簇只有一种价格）
+    if n <= k:
+        return -np.inf
+    starts = np.array([j for j, _ in _backtrack(B, k, m)], dtype=np.int64)
+    sizes = (prefix.s0[np.append(starts[1:], m)] - prefix.s0[starts]) * scale
+    variance = sse / (n - k)
+    loglik = (np.sum(sizes * np.log(sizes)) - n * np.log(n)
+              - n / 2 * np.log(2 * np.pi * variance) - (n - k) / 2)
+    return float(loglik - k * np.log(n))
+
+
+def kmeans_1d_auto(values, k_min=K_MIN, k_max=K_MAX, weights=None, n_obs=None):
+    """
+    在 k_min..k_max 中按 BIC 自动选择簇数的一维最优聚类
+    动态规划的第 q 层就是 k=q+1 的最优解，完整计算到 k_max 层（full_last=True）即得到每个 k 的
+    最优平方和，各 k 只需回溯打分，不必分别聚类，总开销与单独计算一次 k=k_max 相当
+    n_obs: 有效样本数，权重不是点数（如成交量）时用它代替权重之和计算 BIC
+    返回 (所选 k 的 LevelFit, {k: BIC})；去重后的值少于 k_min 个时直接取全部值
+    """
+    uniq, w, inverse = _compress(values, weights)
+    m = len(uniq)
+    if m == 0:
+        raise ValueError("没有可用于聚类的数据")
+    k_max = max(1, min(int(k_max), m))
+    k_min = max(1, min(int(k_min), k_max))
+    prefix = _Prefix(uniq, w)
+    D, B = _dp_tables(prefix, m, k_max, full_last=True)
+    scale = 1.0 if n_obs is None else float(n_obs) / prefix.s0[-1]
+    scores = {k: _bic(prefix, D, B, m, k, scale) for k in range(k_min, k_max + 1)}
+    best = max(scores, key=scores.get)
+    return _fit_from_tables(prefix, D, B, best, w, inverse, m), scores
+
+
+def select_levels(prices, n_levels=5, weights=None, n_obs=None):
+    """
+    计算支撑/压力位，n_levels 为 'auto' 时在 K_MIN..K_MAX 中按 BIC 自动选择价位数
+    返回 {'centers': 升序价位列表, 'k': 价位数, 'score': 所选 k 的 BIC, 'scores': {k: BIC}}，
+    固定价位数时 score 为 None、scores 为空
+    """
+    with timed('cluster'):
+        prices = np.asarray(prices, dtype=float).ravel()
+        keep = np.isfinite(prices)
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float).ravel()[keep]
+        prices = prices[keep]
+        if n_levels == 'auto':
+            fit, scores = kmeans_1d_auto(prices, weights=weights, n_obs=n_obs)
+            score = scores[len(fit.centers)]
+        else:
+            fit, scores, score = kmeans_1d(prices, n_levels, weights=weights), {}, None
+    return {
+        'centers': [float(c) for c in fit.centers],
+        'k': len(fit.centers),
+        'score': score,
+        'scores': scores,
+    }
+
+
+def find_levels(prices, n_levels=5):
+    """计算支撑/压力位：返回升序排列的聚类中心列表（n_levels='auto' 时自动选择个数）"""
+    if n_levels == 'auto':
+        return select_levels(prices, n_levels)['centers']
+    with timed('cluster'):
+        prices = np.asarray(prices, dtype=float).ravel()
+        prices = prices[np.isfinite(prices)]
+        fit = kmeans_1d(prices, n_levels)
+    return [float(c) for c in fit.centers]
+
+
+def locate_levels(prices, levels):
+    """
+    向量化计算价格相对各价位的位置
+    prices: 一维价格数组（或单个价格）；
+    levels: (n, k) 每行升序的价位，不足 k 个用 NaN 补齐；也可传一维 (k,) 表示所有价格共用一组价位
+    返回字典（均为长度 n 的数组）:
+      lower / upper / nearest: 下方最近价位（支撑）、上方最近价位（压力）、最近价位的下标，没有时为 -1
+      lower_level / upper_level / nearest_level: 对应价位，没有时为 NaN
+      lower_pct / upper_pct / nearest_pct: (价格 - 价位) / 价位 * 100
+    """
+    prices = np.atleast_1d(np.asarray(prices, dtype=float))
+    levels = np.asarray(levels, dtype=float)
+    if levels.ndim == 1:
+        levels = np.broadcast_to(levels, (len(prices), len(levels)))
+    n = len(prices)
+    rows = np.arange(n)
+    valid = np.isfinite(levels)
+    n_valid = valid.sum(axis=1)
+
+    # 每行价位升序，不高于价格的价位个数即为上方最近价位的下标
+    lower = (valid & (levels <= prices[:, None])).sum(axis=1) - 1
+    upper = np.where(lower + 1 < n_valid, lower + 1, -1)
+    distance = np.where(valid, np.abs(levels - prices[:, None]), np.inf)
+    nearest = np.argmin(distance, axis=1) if levels.shape[1] else np.zeros(n, dtype=int)
+    nearest = np.where(n_valid > 0, nearest, -1)
+
+    result = {}
+    for name, index in (('lower', lower), ('upper', upper), ('nearest', nearest)):
+        if levels.shape[1]:
+            level = np.where(index >= 0, levels[rows, np.maximum(index, 0)], np.nan)
+        else:
+            level = np.full(n, np.nan)
+        result[name] = index
+        result[f'{name}_level'] = level
+        result[f'{name}_pct'] = (prices - level) / level * 100
+    return result
+
+
+def _lloyd_sorted(prefix, centers, max_iter=50):
+    """
+    在排序数据上从给定中心出发做 Lloyd 迭代：簇边界为相邻中心的中点，
+    借助前缀和每轮只需 O(k log m)；返回 (中心, 各簇起点)，空簇会被去掉
+    """
+    values = prefix.values
+    m = len(values)
+    centers = np.sort(np.asarray(centers, dtype=float))
+    for _ in range(max_iter):
+        cuts = np.searchsorted(values, (centers[:-1] + centers[1:]) / 2, side='right')
+        starts = np.concatenate(([0], cuts))
+        ends = np.append(cuts, m) - 1
+        keep = ends >= starts
+        starts, ends = starts[keep], ends[keep]
+        new_centers = prefix.mean(starts, ends)
+        if len(new_centers) == len(centers) and np.array_equal(new_centers, centers):
+            break
+        centers = new_centers
+    return centers, starts
+
+
+def _fit_from_starts(prefix, weights, centers, starts, base):
+    ends = np.append(starts[1:], len(prefix.values)) - 1
+    counts = prefix.s0[ends + 1] - prefix.s0[starts]
+    sse = float(prefix.cost(starts, ends).sum())
+    return LevelFit(centers, None, sse, counts, prefix.values, weights, starts,
+                    base.anchor, base.bound, base.updates + 1)
+
+
+def _merge_sorted(values, weights, new_values):
+    """把新点并入排序去重后的数据（已有的价格只增加权重）"""
+    new_uniq, new_counts = np.unique(new_values, return_counts=True)
+    pos = np.searchsorted(values, new_uniq)
+    exists = pos < len(values)
+    exists[exists] = values[pos[exists]] == new_uniq[exists]
+    weights = weights.astype(float).copy()
+    weights[pos[exists]] += new_counts[exists]
+    insert = ~exists
+    if insert.any():
+        values = np.insert(values, pos[insert], new_uniq[insert])
+        weights = np.insert(weights, pos[insert], new_counts[insert])
+    return values, weights
+
+
+def update_levels(fit, new_values, drift_threshold=0.01, sse_tolerance=0.01, max_updates=50):
+    """
+    追加新数据后增量更新聚类
+    fit: 上一次的 LevelFit；new_values: 新增的价格
+    - 新价格都落在已有簇的价格区间内: 划分不变，只按新点更新簇均值（mode='skip'）
+    - 否则以原中心为起点做 Lloyd 热启动迭代（mode='warm'）
+    - 以下任一情况用动态规划全量重算（mode='refit'）:
+      中心相对最近一次精确计算的中心变化超过 drift_threshold；
+      平方和超过最近一次精确计算的平方和的 (1 + sse_tolerance) 倍；
+      距最近一次精确计算已增量更新 max_updates 次
+    最近一次精确计算的平方和是当前最优平方和的下界，所以返回结果的平方和
+    至多比精确解多 sse_tolerance（相对值），差距不会随更新次数累积
+    返回 (新的 LevelFit, mode)
+    """
+    new_values = np.asarray(new_values, dtype=float).ravel()
+    new_values = new_values[np.isfinite(new_values)]
+    if len(new_values) == 0:
+        return fit, 'skip'
+
+    values, weights = _merge_sorted(fit.values, fit.weights, new_values)
+    k = len(fit.centers)
+
+    labels = fit.assign(new_values)
+    lows, highs = fit.ranges()
+    if np.all((new_values >= lows[labels]) & (new_values <= highs[labels])):
+        counts = fit.counts.astype(float).copy()
+        sums = fit.centers * counts
+        sse = fit.sse
+        for v, c in zip(new_values, labels):
+            # Welford 公式更新簇内平方和
+            sse += counts[c] / (counts[c] + 1) * (v - sums[c] / counts[c]) ** 2
+            counts[c] += 1
+            sums[c] += v
+        starts = np.searchsorted(values, lows)
+        candidate = LevelFit(sums / counts, None, sse, counts, values, weights, starts,
+                             fit.anchor, fit.bound, fit.updates + 1)
+        mode = 'skip'
+    else:
+        prefix = _Prefix(values, weights)
+        centers, starts = _lloyd_sorted(prefix, fit.centers)
+        candidate = None
+        if len(centers) == k:
+            candidate = _fit_from_starts(prefix, weights, centers, starts, fit)
+        mode = 'warm'
+
+    if candidate is not None and candidate.updates < max_updates:
+        drift = np.max(np.abs(candidate.centers - candidate.anchor) / np.abs(candidate.anchor))
+        if drift <= drift_threshold and candidate.gap_bound <= sse_tolerance:
+            return candidate, mode
+
+    return kmeans_1d(values, k, weights=weights), 'refit'
+
+
+def rolling_levels(prices, window=250, n_levels=5, refit_every=20, min_periods=None,
+                   max_iter=50, return_stats=False, drift_threshold=0.005, sse_tolerance=0.02):
+    """
+    滚动窗口支撑/压力位：第 t 行为截至第 t 根K线（含）最近 window 根收盘价的聚类中心
+    全部价格预先排序去重成一张价格表，窗口滑动只是增减一个价格的权重（前缀和原地更新）。
+    每个窗口以上一个窗口的中心为起点做 Lloyd 热启动迭代（簇边界为相邻中心的中点，
+    借助前缀和每轮只需 O(k log m)）；以下情况用动态规划精确重算，避免长期停留在局部最优:
+    有簇被移空；中心相对上次精确计算的中心变化超过 drift_threshold；
+    窗口平方和超过上次精确计算时的 (1 + sse_tolerance) 倍；距上次精确计算已满 refit_every 个窗口。
+    这些条件不能保证热启动结果的误差上界（窗口会移出旧数据，最优解可能跳变），
+    需要精确结果时用 refit_every=1，即每个窗口都精确计算。
+    prices: 一维价格序列；min_periods: 开始输出所需的最少K线数，默认等于 window
+    返回 (n, n_levels) 数组，每行升序，数据不足或去重后价格少于 n_levels 的位置为 NaN；
+    return_stats=True 时另返回 {'warm': 热启动的窗口数, 'refit': 精确计算的窗口数, 'skip': 窗口内容未变的窗口数}
+    """
+    prices = np.asarray(prices, dtype=float).ravel()
+    n = len(prices)
+    k = int(n_levels)
+    min_periods = window if min_periods is None else max(1, min(int(min_periods), window))
+    result = np.full((n, k), np.nan)
+    stats = {'warm': 0, 'refit': 0, 'skip': 0}
+
+    finite = np.isfinite(prices)
+    if not finite.any():
+        return (result, stats) if return_stats else result
+    grid, codes = np.unique(prices[finite], return_inverse=True)
+    m = len(grid)
+    index = np.full(n, -1, dtype=np.int64)
+    index[finite] = codes
+    index = index.tolist()
+    counts = np.zeros(m)
+    prefix = None
+    bounds = np.zeros(k + 1, dtype=np.int64)
+    bounds[k] = m
+
+    centers = None          # 上一个窗口的中心（不足 k 个时为 None）
+    since_exact = 0
+    for t in range(n):
+        added = index[t]
+        removed = index[t - window] if t >= window else -1
+        if added != removed:
+            for i, w in ((added, 1.0), (removed, -1.0)):
+                if i >= 0:
+                    counts[i] += w
+                    if prefix is not None:
+                        prefix.add(i, w)
+        if t + 1 < min_periods:
+            continue
+        if added == removed and centers is not None:
+            result[t] = centers
+            stats['skip'] += 1
+            continue
+
+        if centers is not None and since_exact < refit_every - 1:
+            # 簇边界 bounds[c]..bounds[c+1]（价格表下标，左闭右开），边界不再变化即收敛
+            cuts = None
+            for _ in range(max_iter):
+                new_cuts = grid.searchsorted((centers[:-1] + centers[1:]) / 2, side='right')
+                if cuts is not None and (new_cuts == cuts).all():
+                    break
+                cuts = bounds[1:k] = new_cuts
+                w = prefix.s0[bounds[1:]] - prefix.s0[bounds[:-1]]
+                if w.min() <= 0:
+                    break
+                centers = (prefix.s1[bounds[1:]] - prefix.s1[bounds[:-1]]) / w + prefix.shift
+            if w.min() > 0:
+                sse = float(prefix.cost(bounds[:-1], bounds[1:] - 1).sum())
+                drift = np.max(np.abs(centers - anchor) / np.abs(anchor))
+                if drift <= drift_threshold and sse <= anchor_sse * (1 + sse_tolerance):
+                    result[t] = centers
+                    stats['warm'] += 1
+                    since_exact += 1
+                    continue
+
+        present = np.flatnonzero(counts)
+        if len(present) == 0:
+            centers = None
+            continue
+        fit = kmeans_1d(grid[present], k, weights=counts[present])
+        result[t, :len(fit.centers)] = fit.centers
+        centers = fit.centers if len(fit.centers) == k else None
+        anchor, anchor_sse = fit.centers, fit.sse
+        # 从计数重建前缀和，清除原地更新累积的舍入误差
+        prefix = _Prefix(grid, counts.copy())
+        stats['refit'] += 1
+        since_exact = 0
+    return (result, stats) if return_stats else result
@@ -0,0 +1,42 @@
+"""
+序列降采样
+LTTB (Largest-Triangle-Three-Buckets) 在保留价格走势形状的前提下把长序列压缩到指定点数，
+用于浏览器端绘图和移动端按像素宽度绘图
+"""
+
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    """
+    返回保留点的下标（升序，包含首尾两点）
+    x, y: 等长一维数组（x 需单调递增）；n_out: 目标点数，不小于3，原序列更短时全部保留
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # 除首尾两点外，其余点均分为 n_out-2 个桶
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # 每个桶的平均点，作为三角形的第三个顶点
+    csum_x = np.concatenate(([0.0], np.cumsum(x)))
+    csum_y = np.concatenate(([0.0], np.cumsum(y)))
+    next_lo = np.append(edges[1:-1], n - 1)
+    next_hi = np.append(edges[2:], n)
+    avg_x = (csum_x[next_hi] - csum_x[next_lo]) / (next_hi - next_lo)
+    avg_y = (csum_y[next_hi] - csum_y[next_lo]) / (next_hi - next_lo)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        bx = x[lo:hi]
+        by = y[lo:hi]
+        area = np.abs((x[a] - avg_x[b]) * (by - y[a]) - (x[a] - bx) * (avg_y[b] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[b + 1] = a
+    return selected
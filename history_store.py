@@ -0,0 +1,177 @@
+"""
+本地行情历史存储
+以 (股票代码, 数据源, 复权方式) 为键把日线数据保存到SQLite，
+再次分析同一只股票时只需下载最后一个已存交易日之后的数据
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+# 统一保存的行情字段
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'amount']
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL,
+    source TEXT NOT NULL,
+    adjust TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL, amount REAL,
+    PRIMARY KEY (symbol, source, adjust, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS series (
+    symbol TEXT NOT NULL,
+    source TEXT NOT NULL,
+    adjust TEXT NOT NULL,
+    first_date TEXT NOT NULL,
+    last_date TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    checked_end TEXT,
+    PRIMARY KEY (symbol, source, adjust)
+);
+'''
+
+
+def default_store_path():
+    """默认数据库路径，可通过环境变量 STOCK_HISTORY_DB 覆盖"""
+    path = os.environ.get('STOCK_HISTORY_DB')
+    if path:
+        return path
+    return os.path.join(os.path.expanduser('~'), '.stock_analyzer', 'history.sqlite3')
+
+
+class HistoryStore:
+    """基于SQLite的日线历史存储（线程/进程安全，每次操作单独连接）"""
+
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        folder = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            # 旧版本数据库没有 checked_end 列
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(series)')]
+            if 'checked_end' not in columns:
+                conn.execute('ALTER TABLE series ADD COLUMN checked_end TEXT')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_meta(self, symbol, source, adjust):
+        """
+        返回已存序列的元信息，不存在时返回None
+        first_date/last_date 为已覆盖的日期范围，checked_at/checked_end 为最近一次
+        向上游查询最新数据的时间和查询的截止日期
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT first_date, last_date, checked_at, checked_end FROM series '
+                'WHERE symbol=? AND source=? AND adjust=?',
+                (symbol, source, adjust)).fetchone()
+        if row is None:
+            return None
+        return {'first_date': row[0], 'last_date': row[1], 'checked_at': row[2],
+                'checked_end': row[3] or row[1]}
+
+    def load(self, symbol, source, adjust, start_date=None, end_date=None):
+        """读取已存行情，返回以日期为索引的DataFrame（可能为空）"""
+        sql = ('SELECT date, open, high, low, close, volume, amount FROM bars '
+               'WHERE symbol=? AND source=? AND adjust=?')
+        params = [symbol, source, adjust]
+        if start_date:
+            sql += ' AND date>=?'
+            params.append(_to_iso(start_date))
+        if end_date:
+            sql += ' AND date<=?'
+            params.append(_to_iso(end_date))
+        sql += ' ORDER BY date'
+        with self._connect() as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+        df['date'] = pd.to_datetime(df['date'])
+        df.set_index('date', inplace=True)
+        return df.dropna(axis=1, how='all')
+
+    def save(self, symbol, source, adjust, df, first_date=None, checked_end=None, replace=False):
+        """
+        写入行情（按日期合并到已存数据）；replace=True 时先清空该序列（复权因子变化后整段重写）
+        first_date 为本次下载覆盖的起始日期（默认第一根K线），
+        checked_end 为本次向上游查询的截止日期，给出时同时更新检查时间
+        """
+        if df is None or df.empty:
+            return
+        rows = []
+        frame = df.reindex(columns=BAR_COLUMNS)
+        for date, values in zip(frame.index, frame.itertuples(index=False, name=None)):
+            rows.append((symbol, source, adjust, _to_iso(date)) +
+                        tuple(None if pd.isna(v) else float(v) for v in values))
+        new_first = _to_iso(first_date) if first_date else rows[0][3]
+        new_last = rows[-1][3]
+
+        with self._connect() as conn:
+            if replace:
+                conn.execute('DELETE FROM bars WHERE symbol=? AND source=? AND adjust=?',
+                             (symbol, source, adjust))
+                conn.execute('DELETE FROM series WHERE symbol=? AND source=? AND adjust=?',
+                             (symbol, source, adjust))
+            conn.executemany(
+                'INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            old = conn.execute(
+                'SELECT first_date, last_date, checked_at, checked_end FROM series '
+                'WHERE symbol=? AND source=? AND adjust=?',
+                (symbol, source, adjust)).fetchone()
+            checked_at = time.time()
+            if old is not None:
+                new_first = min(new_first, old[0])
+                new_last = max(new_last, old[1])
+                if not checked_end:
+                    # 只补了前面一段，没有查询最新数据，保留原来的检查记录
+                    checked_at, checked_end = old[2], old[3] or old[1]
+            checked_end = _to_iso(checked_end) if checked_end else new_last
+            conn.execute('INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (symbol, source, adjust, new_first, new_last, checked_at, checked_end))
+
+    def touch(self, symbol, source, adjust, checked_end=None):
+        """记录一次“上游无新数据”的检查时间，checked_end 为该次查询的截止日期"""
+        with self._connect() as conn:
+            if checked_end:
+                conn.execute('UPDATE series SET checked_at=?, checked_end=? '
+                             'WHERE symbol=? AND source=? AND adjust=?',
+                             (time.time(), _to_iso(checked_end), symbol, source, adjust))
+            else:
+                conn.execute('UPDATE series SET checked_at=? '
+                             'WHERE symbol=? AND source=? AND adjust=?',
+                             (time.time(), symbol, source, adjust))
+
+    def clear(self, symbol=None):
+        """清除指定股票（或全部）的存储"""
+        with self._connect() as conn:
+            if symbol is None:
+                conn.execute('DELETE FROM bars')
+                conn.execute('DELETE FROM series')
+            else:
+                conn.execute('DELETE FROM bars WHERE symbol=?', (symbol,))
+                conn.execute('DELETE FROM series WHERE symbol=?', (symbol,))
+
+
+def _to_iso(value):
+    """把 '20250101' / Timestamp 等日期统一为 'YYYY-MM-DD'"""
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_store():
+    """进程内共享的默认存储实例"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = HistoryStore()
+        return _default_store
@@ -0,0 +1,246 @@
+"""
+分钟线（日内）支撑/压力位
+按时间段分块下载 1/5/15/30/60 分钟K线，每块转换为 float32 紧凑数组后立即并入价格直方图，
+不保留完整历史：聚类在直方图上做加权一维最优聚类，内存只与分箱数上限有关，与历史长度无关。
+图表只保留最近一段K线（固定容量的环形缓冲）
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from stock_data import normalize_code, to_market_symbol, to_plain_code
+from cluster_levels import select_levels
+from metrics import timed
+
+PERIODS = ('1', '5', '15', '30', '60')
+# 默认下载的天数（东方财富1分钟线只提供最近几个交易日）
+DEFAULT_DAYS = {'1': 5, '5': 30, '15': 60, '30': 120, '60': 240}
+# 每次请求的自然日跨度
+CHUNK_DAYS = {'1': 2, '5': 10, '15': 20, '30': 40, '60': 80}
+# 价格直方图的初始分箱宽度（A股最小报价单位）和分箱数上限
+TICK = 0.01
+MAX_BINS = 4096
+# 图表保留的最近K线数
+KEEP_BARS = 2000
+
+
+class MinuteChunk:
+    """一块分钟线：times 为距1970-01-01的分钟数 (int32)，close / volume 为 float32"""
+
+    __slots__ = ('times', 'close', 'volume')
+
+    def __init__(self, times, close, volume):
+        self.times = times
+        self.close = close
+        self.volume = volume
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def from_frame(cls, df, time_col, close_col, volume_col):
+        times = pd.to_datetime(df[time_col]).values.astype('datetime64[m]').astype(np.int64)
+        close = pd.to_numeric(df[close_col], errors='coerce').to_numpy(dtype=np.float32)
+        volume = pd.to_numeric(df[volume_col], errors='coerce').to_numpy(dtype=np.float32)
+        keep = np.isfinite(close) & (close > 0)
+        return cls(times[keep].astype(np.int32), close[keep], volume[keep])
+
+
+def _fetch_eastmoney_minutes(code, period, start, end, adjust):
+    """东方财富: stock_zh_a_hist_min_em（支持按时间段请求）"""
+    import akshare as ak      # 首次获取行情时才导入
+    df = ak.stock_zh_a_hist_min_em(symbol=to_plain_code(code), period=period, adjust=adjust,
+                                   start_date=start.strftime('%Y-%m-%d %H:%M:%S'),
+                                   end_date=end.strftime('%Y-%m-%d %H:%M:%S'))
+    if df is None or df.empty:
+        return None
+    return MinuteChunk.from_frame(df, '时间', '收盘', '成交量')
+
+
+def _fetch_sina_minutes(code, period, adjust):
+    """新浪财经: stock_zh_a_minute（只返回最近一段，不支持时间段）"""
+    import akshare as ak
+    df = ak.stock_zh_a_minute(symbol=to_market_symbol(code), period=period, adjust=adjust)
+    if df is None or df.empty:
+        return None
+    return MinuteChunk.from_frame(df, 'day', 'close', 'volume')
+
+
+def iter_minute_chunks(code, period='5', start_date=None, end_date=None, adjust='',
+                       chunk_days=None):
+    """
+    按时间顺序逐块产出 MinuteChunk
+    优先按时间段分块请求东方财富；第一块就失败时退回新浪（整段返回后按块切分）
+    """
+    if period not in PERIODS:
+        raise ValueError(f"不支持的分钟周期: {period}")
+    code = normalize_code(code)
+    end = pd.Timestamp(end_date) if end_date else pd.Timestamp(datetime.now())
+    start = pd.Timestamp(start_date) if start_date else end - timedelta(days=DEFAULT_DAYS[period])
+    step = timedelta(days=chunk_days or CHUNK_DAYS[period])
+
+    chunk_start = start
+    yielded = False
+    last_time = None
+    while chunk_start < end:
+        chunk_end = min(chunk_start + step, end)
+        try:
+            with timed('fetch', source='eastmoney_minute'):
+                chunk = _fetch_eastmoney_minutes(code, period, chunk_start, chunk_end, adjust)
+        except Exception as e:
+            if yielded:
+                raise
+            print(f"东方财富分钟线失败: {e}，尝试新浪财经...")
+            break
+        if chunk is not None and len(chunk):
+            # 相邻时间段的边界K线可能重复
+            if last_time is not None:
+                keep = chunk.times > last_time
+                chunk = MinuteChunk(chunk.times[keep], chunk.close[keep], chunk.volume[keep])
+            if len(chunk):
+                last_time = chunk.times[-1]
+                yielded = True
+                yield chunk
+        chunk_start = chunk_end
+    if yielded:
+        return
+
+    with timed('fetch', source='sina_minute'):
+        whole = _fetch_sina_minutes(code, period, adjust)
+    if whole is None:
+        return
+    start_min = int(start.value // 60_000_000_000)
+    keep = whole.times >= start_min
+    whole = MinuteChunk(whole.times[keep], whole.close[keep], whole.volume[keep])
+    size = 10_000
+    for i in range(0, len(whole), size):
+        yield MinuteChunk(whole.times[i:i + size], whole.close[i:i + size], whole.volume[i:i + size])
+
+
+class StreamingLevels:
+    """
+    流式价格直方图
+    以 TICK 为宽度分箱，记录每箱的权重和与价格加权和（箱内均值即为该箱代表价格）；
+    分箱数超过 max_bins 时把分箱宽度加倍、相邻两箱合并，内存上限为 O(max_bins)
+    """
+
+    def __init__(self, bin_width=TICK, max_bins=MAX_BINS):
+        self.bin_width = bin_width
+        self.max_bins = max_bins
+        self.keys = np.empty(0, dtype=np.int64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.sums = np.empty(0, dtype=np.float64)
+        self.count = 0
+
+    def update(self, prices, weights=None):
+        """并入一块价格（可选权重，如成交量）"""
+        prices = np.asarray(prices, dtype=np.float64)
+        if weights is None:
+            weights = np.ones(len(prices))
+        weights = np.asarray(weights, dtype=np.float64)
+        keep = np.isfinite(prices) & np.isfinite(weights) & (weights > 0)
+        prices, weights = prices[keep], weights[keep]
+        if len(prices) == 0:
+            return
+        self.count += len(prices)
+
+        # 加一个小量，避免 float32 的 10.03 (=10.0299997) 落入前一个箱
+        keys = np.floor(prices / self.bin_width + 1e-4).astype(np.int64)
+        self._merge(keys, weights, prices * weights)
+        while len(self.keys) > self.max_bins:
+            self._coarsen()
+
+    def _merge(self, keys, weights, sums):
+        all_keys = np.concatenate((self.keys, keys))
+        uniq, inverse = np.unique(all_keys, return_inverse=True)
+        self.weights = np.bincount(inverse, weights=np.concatenate((self.weights, weights)),
+                                   minlength=len(uniq))
+        self.sums = np.bincount(inverse, weights=np.concatenate((self.sums, sums)),
+                                minlength=len(uniq))
+        self.keys = uniq
+
+    def _coarsen(self):
+        self.bin_width *= 2
+        keys, weights, sums = self.keys // 2, self.weights, self.sums
+        self.keys = np.empty(0, dtype=np.int64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.sums = np.empty(0, dtype=np.float64)
+        self._merge(keys, weights, sums)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.weights.nbytes + self.sums.nbytes
+
+    def select(self, n_levels=5):
+        """
+        在直方图上做加权一维最优聚类，返回 select_levels 格式的结果
+        （n_levels='auto' 时按K线根数计算 BIC，与是否按成交量加权无关）
+        """
+        if len(self.keys) == 0:
+            raise ValueError("没有可用于聚类的数据")
+        return select_levels(self.sums / self.weights, n_levels, weights=self.weights,
+                             n_obs=self.count)
+
+    def levels(self, n_levels=5):
+        """升序的价位列表"""
+        return self.select(n_levels)['centers']
+
+
+class RecentBars:
+    """最近 capacity 根K线的环形缓冲（float32），用于绘图"""
+
+    def __init__(self, capacity=KEEP_BARS):
+        self.capacity = capacity
+        self.times = np.empty(capacity, dtype=np.int32)
+        self.close = np.empty(capacity, dtype=np.float32)
+        self.size = 0
+        self.head = 0     # 下一个写入位置
+
+    def extend(self, chunk):
+        times, close = chunk.times[-self.capacity:], chunk.close[-self.capacity:]
+        n = len(times)
+        idx = (self.head + np.arange(n)) % self.capacity
+        self.times[idx] = times
+        self.close[idx] = close
+        self.head = (self.head + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def frame(self):
+        """按时间顺序返回以时间为索引的 DataFrame（close 列）"""
+        order = (self.head - self.size + np.arange(self.size)) % self.capacity
+        index = pd.DatetimeIndex(self.times[order].astype('datetime64[m]'), name='time')
+        return pd.DataFrame({'close': self.close[order].astype(float)}, index=index)
+
+
+class IntradayResult:
+    def __init__(self, selection, bars, count, bins, bin_width):
+        self.selection = selection  # select_levels 的结果（价位数与得分）
+        self.levels = selection['centers']
+        self.bars = bars            # 最近的K线（绘图用）
+        self.count = count          # 参与聚类的K线总数
+        self.bins = bins
+        self.bin_width = bin_width
+
+
+def intraday_levels(code, period='5', start_date=None, end_date=None, n_levels=5,
+                    weight='count', adjust='', keep_bars=KEEP_BARS, chunks=None):
+    """
+    计算分钟线支撑/压力位
+    n_levels: 价位数，'auto' 为自动选择
+    weight: count 每根K线权重相同；volume 按成交量加权
+    chunks: 可选的 MinuteChunk 迭代器（默认按 code 下载）
+    获取不到数据时返回 None
+    """
+    if chunks is None:
+        chunks = iter_minute_chunks(code, period, start_date, end_date, adjust)
+    histogram = StreamingLevels()
+    recent = RecentBars(keep_bars)
+    for chunk in chunks:
+        histogram.update(chunk.close, chunk.volume if weight == 'volume' else None)
+        recent.extend(chunk)
+    if histogram.count == 0:
+        return None
+    return IntradayResult(histogram.select(n_levels), recent.frame(), histogram.count,
+                          len(histogram.keys), histogram.bin_width)
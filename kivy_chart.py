@@ -0,0 +1,163 @@
+"""
+移动端原生图表
+用 Kivy 画布指令（Color / Line / Rectangle）直接绘制收盘价和支撑/压力位，不经过 matplotlib 和 PNG 文件。
+价格序列按控件像素宽度用 LTTB 降采样，新结果和尺寸变化时原地更新已有的绘图指令。
+numpy 在第一次设置数据时才导入，创建空图表不会拖慢首帧
+"""
+
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, Line, Rectangle
+from kivy.metrics import dp
+from kivy.uix.widget import Widget
+
+# 与 chart_render 的 mobile 样式一致（RGBA）
+LINE_COLOR = (0.0, 0.0, 1.0, 1)
+LEVEL_COLORS = [
+    (1.0, 0.0, 0.0, 1),         # red
+    (0.0, 0.5, 0.0, 1),         # green
+    (1.0, 0.65, 0.0, 1),        # orange
+    (0.5, 0.0, 0.5, 1),         # purple
+    (0.65, 0.16, 0.16, 1),      # brown
+]
+BACKGROUND = (1, 1, 1, 1)
+GRID_COLOR = (0.85, 0.85, 0.85, 1)
+TEXT_COLOR = (0.2, 0.2, 0.2, 1)
+
+
+class LevelChart(Widget):
+    """
+    收盘价折线 + 水平价位线
+    set_data 设置数据；控件大小或位置变化时按新的像素宽度重新降采样。
+    水平线和价位标签按需增加，多余的隐藏，每次更新只修改已有指令的坐标和文字
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.times = ()
+        self.closes = ()
+        self.centers = []
+        self.title = ''
+        self.padding = dp(8)
+        self.label_width = dp(56)       # 右侧价位标签的宽度
+        self.title_height = dp(22)
+
+        with self.canvas:
+            Color(*BACKGROUND)
+            self.background = Rectangle(pos=self.pos, size=self.size)
+            Color(*GRID_COLOR)
+            self.frame = Line(rectangle=(0, 0, 0, 0), width=1)
+            self.grid = Line(points=[], width=1)
+            Color(*LINE_COLOR)
+            self.price_line = Line(points=[], width=dp(1.2))
+            Color(1, 1, 1, 1)
+            self.title_rect = Rectangle(size=(0, 0))
+        self.level_lines = []       # [Color, Line, 标签 Rectangle, 标签文字]
+        self.bind(pos=self._redraw, size=self._redraw)
+
+    def set_data(self, index, closes, centers, title=''):
+        """设置要显示的序列（index 为日期索引或时间戳数组）和价位，立即重绘"""
+        import numpy as np
+        times = np.asarray(index)
+        if np.issubdtype(times.dtype, np.datetime64):
+            times = times.astype('datetime64[s]').astype(np.int64)
+        self.times = times.astype(float)
+        self.closes = np.asarray(closes, dtype=float)
+        self.centers = [float(c) for c in centers]
+        self.title = title
+        self._set_title(title)
+        self._redraw()
+
+    def clear(self):
+        self.times = ()
+        self.closes = ()
+        self.centers = []
+        self._set_title('')
+        self._redraw()
+
+    def _level_line(self, i):
+        while len(self.level_lines) <= i:
+            color = LEVEL_COLORS[len(self.level_lines) % len(LEVEL_COLORS)]
+            with self.canvas:
+                c = Color(*color)
+                line = Line(points=[], width=1, dash_length=dp(6), dash_offset=dp(4))
+                Color(1, 1, 1, 1)
+                label = Rectangle(size=(0, 0))
+            self.level_lines.append([c, line, label, None])
+        return self.level_lines[i]
+
+    def _set_title(self, text):
+        texture = self._text_texture(text, TEXT_COLOR, bold=True) if text else None
+        self.title_rect.texture = texture
+        self.title_rect.size = texture.size if texture else (0, 0)
+
+    @staticmethod
+    def _text_texture(text, color, bold=False):
+        label = CoreLabel(text=text, font_size=dp(11), color=color, bold=bold)
+        label.refresh()
+        return label.texture
+
+    def _plot_area(self):
+        x0 = self.x + self.padding
+        y0 = self.y + self.padding
+        width = max(1.0, self.width - 2 * self.padding - self.label_width)
+        height = max(1.0, self.height - 2 * self.padding - self.title_height)
+        return x0, y0, width, height
+
+    def _redraw(self, *args):
+        self.background.pos = self.pos
+        self.background.size = self.size
+        x0, y0, width, height = self._plot_area()
+        self.frame.rectangle = (x0, y0, width, height)
+        self.title_rect.pos = (x0, y0 + height + (self.title_height - self.title_rect.size[1]) / 2)
+
+        # 横向网格线（4等分），一条折线来回连接
+        grid = []
+        for i in range(1, 4):
+            y = y0 + height * i / 4
+            grid += [x0, y, x0 + width, y] if i % 2 else [x0 + width, y, x0, y]
+        self.grid.points = grid
+
+        n = len(self.closes)
+        if n == 0:
+            self.price_line.points = []
+            for _, line, label, _ in self.level_lines:
+                line.points = []
+                label.size = (0, 0)
+            return
+
+        import numpy as np
+        from downsample import lttb
+
+        # 纵轴范围同时包含价格和全部价位，上下留 5%
+        lo = min(np.nanmin(self.closes), min(self.centers, default=np.inf))
+        hi = max(np.nanmax(self.closes), max(self.centers, default=-np.inf))
+        margin = (hi - lo) * 0.05 or abs(hi) * 0.01 or 1.0
+        lo, hi = lo - margin, hi + margin
+
+        def to_y(values):
+            return y0 + (np.asarray(values) - lo) / (hi - lo) * height
+
+        # 每个像素最多一个点
+        keep = lttb(self.times, self.closes, max(3, int(width)))
+        t = self.times[keep]
+        span = t[-1] - t[0] if len(t) > 1 else 1.0
+        xs = x0 + (t - t[0]) / (span or 1.0) * width
+        points = np.empty(2 * len(keep))
+        points[0::2] = xs
+        points[1::2] = to_y(self.closes[keep])
+        self.price_line.points = points.tolist()
+
+        for i, center in enumerate(self.centers):
+            entry = self._level_line(i)
+            _, line, label, text = entry
+            y = float(to_y(center))
+            line.points = [x0, y, x0 + width, y]
+            # 价位文字不变时复用纹理
+            if text != f"{center:.2f}":
+                entry[3] = f"{center:.2f}"
+                label.texture = self._text_texture(entry[3], LEVEL_COLORS[i % len(LEVEL_COLORS)])
+            label.size = label.texture.size
+            label.pos = (x0 + width + dp(4), y - label.size[1] / 2)
+        for _, line, label, _ in self.level_lines[len(self.centers):]:
+            line.points = []
+            label.size = (0, 0)
@@ -3,13 +3,12 @@
 使用Kivy框架开发，支持华为鸿蒙手机
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # 使用非交互式后端
-import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
-import akshare as ak
+# pandas / akshare 等分析模块较重，界面显示后由 preload 在后台导入，或在第一次分析时导入
+from kivy_chart import LevelChart
+import preload
+import metrics
+from analysis_executor import AnalysisExecutor, AnalysisCancelled
+from metrics import timed
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -19,8 +18,8 @@ from kivy.uix.gridlayout import GridLayout
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
+from kivy.uix.spinner import Spinner
 from kivy.uix.label import Label
-from kivy.uix.image import Image
 from kivy.uix.popup import Popup
 from kivy.uix.progressbar import ProgressBar
 from kivy.clock import Clock
@@ -33,9 +32,51 @@ import threading
 import os
 from datetime import datetime
 
+metrics.set_frontend('kivy')
+
+# 后台预加载的分析模块（按使用顺序）
+PRELOAD_MODULES = ('numpy', 'pandas', 'history_store', 'result_cache', 'akshare',
+                   'stock_data', 'cluster_levels')
+
 # 设置窗口背景色
 Window.clearcolor = (0.95, 0.95, 0.97, 1)
 
+# 数据状态: fresh 刚从网络获取; cached 本地缓存（网络不可用或正在后台刷新）; synthetic 模拟数据
+STATUS_COLORS = {
+    'fresh': (0.2, 0.8, 0.4, 1),
+    'cached': (0.95, 0.6, 0.1, 1),
+    'synthetic': (1, 0.3, 0.3, 1),
+}
+# 价位数选项；“自动”为按 BIC 在 2~10 中选择（与 Web、Streamlit 一致）
+LEVEL_CHOICES = ('自动', '3', '4', '5', '6', '7', '8')
+DEFAULT_LEVELS = '5'
+
+STATUS_LABELS = {
+    'fresh': '最新数据',
+    'cached': '缓存数据',
+    'synthetic': '模拟数据（仅供演示）',
+}
+
+
+def format_age(seconds):
+    """把秒数转换为“x分钟前”等描述"""
+    if seconds < 60:
+        return '刚刚'
+    if seconds < 3600:
+        return f'{int(seconds // 60)}分钟前'
+    if seconds < 86400:
+        return f'{int(seconds // 3600)}小时前'
+    return f'{int(seconds // 86400)}天前'
+
+
+def data_status(df):
+    """由获取到的行情判断数据状态"""
+    if df.attrs.get('source') == 'synthetic':
+        return 'synthetic'
+    if df.attrs.get('offline'):
+        return 'cached'
+    return 'fresh'
+
 
 class StockAnalyzerApp(App):
     """股票分析应用主类"""
@@ -43,6 +84,14 @@ class StockAnalyzerApp(App):
     def build(self):
         self.title = '股票价格聚类分析'
         return MainLayout()
+    
+    def on_start(self):
+        # 第一帧画出后再开始预加载，避免与首帧争抢CPU
+        Window.bind(on_flip=self._on_first_frame)
+    
+    def _on_first_frame(self, *args):
+        Window.unbind(on_flip=self._on_first_frame)
+        preload.start_for('idle', PRELOAD_MODULES)
 
 
 class MainLayout(BoxLayout):
@@ -87,17 +136,27 @@ class MainLayout(BoxLayout):
             hint_text='输入股票代码 (如: 000001 或 600000)',
             font_size='16sp',
             multiline=False,
-            size_hint_x=0.7,
+            size_hint_x=0.55,
             background_color=(1, 1, 1, 1),
             foreground_color=(0, 0, 0, 1),
             padding=[15, 15]
         )
+        self.stock_input.bind(text=self.on_code_input)
         input_layout.add_widget(self.stock_input)
         
+        # 价位数
+        self.levels_spinner = Spinner(
+            text=DEFAULT_LEVELS,
+            values=LEVEL_CHOICES,
+            font_size='16sp',
+            size_hint_x=0.17
+        )
+        input_layout.add_widget(self.levels_spinner)
+        
         analyze_btn = Button(
             text='开始分析',
             font_size='16sp',
-            size_hint_x=0.3,
+            size_hint_x=0.28,
             background_color=(0.2, 0.6, 1, 1),
             color=(1, 1, 1, 1),
             bold=True
@@ -138,14 +197,28 @@ class MainLayout(BoxLayout):
         scroll_view.add_widget(self.result_layout)
         self.add_widget(scroll_view)
         
-        # 图表显示区域
-        self.chart_image = Image(
+        # 图表显示区域（Kivy 画布直接绘制）
+        self.chart = LevelChart(
             size_hint_y=None,
-            height=400,
-            allow_stretch=True,
-            keep_ratio=True
+            height=400
         )
-        self.result_layout.add_widget(self.chart_image)
+        self.result_layout.add_widget(self.chart)
+        self._chart_data = None
+        
+        # 分析在单个工作线程中执行，新的分析取代旧的（见 analysis_executor.py）
+        self.executor = AnalysisExecutor(lambda fn: Clock.schedule_once(lambda dt: fn(), 0))
+        
+        # 导出图片（matplotlib 只在导出时使用）
+        export_btn = Button(
+            text='导出图片',
+            font_size='14sp',
+            size_hint_y=None,
+            height=44,
+            background_color=(0.6, 0.6, 0.6, 1),
+            color=(1, 1, 1, 1)
+        )
+        export_btn.bind(on_press=self.export_chart)
+        self.result_layout.add_widget(export_btn)
         
         # 分析结果文本
         self.result_text = Label(
@@ -174,45 +247,93 @@ class MainLayout(BoxLayout):
             else:
                 code = code + '.SZ'
         
-        self.status_label.text = f'正在分析股票: {code}...'
+        if preload.is_loaded():
+            self.status_label.text = f'正在分析股票: {code}...'
+        else:
+            self.status_label.text = f'正在加载分析模块，随后分析: {code}...'
         self.status_label.color = (0.2, 0.6, 1, 1)
         self.progress.value = 10
         
-        # 在后台线程中执行分析
-        thread = threading.Thread(target=self.analyze_stock, args=(code,))
-        thread.daemon = True
-        thread.start()
+        # 提交到分析执行器；仍在进行的上一次分析被取代，其结果不会再显示
+        text = self.levels_spinner.text
+        n_levels = 'auto' if text == '自动' else int(text)
+        self.executor.submit(self.analyze_stock, code, n_levels)
     
-    def analyze_stock(self, code):
-        """执行股票分析"""
+    def analyze_stock(self, request, code, n_levels=5):
+        """
+        执行股票分析（在分析执行器的工作线程中）：有缓存时先立即显示缓存的结果，再联网刷新；
+        刷新失败时保留缓存的结果，没有缓存时才退回模拟数据。
+        request 被新的分析取代后，在下一个 request.check() 处停止
+        """
+        cached = None
         try:
-            # 更新进度
-            Clock.schedule_once(lambda dt: self.update_progress(20), 0)
-            
-            # 获取股票数据
-            df = self.get_stock_data_multi_source(code)
-            
-            if df is None or df.empty:
-                Clock.schedule_once(lambda dt: self.show_error('无法获取股票数据'), 0)
-                return
-            
-            Clock.schedule_once(lambda dt: self.update_progress(50), 0)
-            
-            # 执行聚类分析
-            centers = self.analyze_clusters(df, code)
+            with timed('request') as timer:
+                try:
+                    cached = self.load_cached_result(code)
+                    request.check()
+                    if cached is not None:
+                        # 缓存的价位数与当前选择不同时用缓存的日线重新聚类
+                        cached_selection = cached.select(n_levels)
+                        cached_centers = cached_selection['centers']
+                        result = self.generate_result_text(cached.bars, code, cached_centers,
+                                                           status='cached', age=cached.age,
+                                                           selection=cached_selection)
+                        request.post(self.show_results, result, 'cached',
+                                     f'缓存数据（{format_age(cached.age)}），正在后台刷新...',
+                                     (cached.bars, code, cached_centers))
+                    
+                    # 更新进度
+                    request.progress(self.update_progress, 20)
+                    
+                    # 获取股票数据
+                    df = self.get_stock_data_multi_source(code)
+                    request.check()
+                    
+                    if df is None or df.empty:
+                        if cached is None:
+                            request.post(self.show_error, '无法获取股票数据')
+                        return
+                    
+                    status = data_status(df)
+                    if status != 'fresh' and cached is not None:
+                        # 刷新失败：继续显示缓存的结果
+                        request.post(self.show_status, 'cached',
+                                     f'网络不可用，显示{format_age(cached.age)}的缓存数据')
+                        return
+                    
+                    request.progress(self.update_progress, 50)
+                    
+                    # 执行聚类分析
+                    selection = self.analyze_clusters(df, code, n_levels)
+                    centers = selection['centers']
+                    if status == 'fresh':
+                        # 已被取代也保存，下次打开这只股票时可直接显示
+                        self.save_cached_result(code, df, centers)
+                    request.check()
+                    
+                    request.progress(self.update_progress, 80)
+                    
+                    # 生成结果文本
+                    result = self.generate_result_text(df, code, centers, status=status,
+                                                       selection=selection)
+                except AnalysisCancelled:
+                    timer.outcome = 'cancelled'
+                    return
             
-            Clock.schedule_once(lambda dt: self.update_progress(80), 0)
-            
-            # 生成结果文本
-            result = self.generate_result_text(df, code, centers)
-            
-            Clock.schedule_once(lambda dt: self.update_progress(100), 0)
+            request.progress(self.update_progress, 100)
             
             # 更新UI
-            Clock.schedule_once(lambda dt: self.show_results(result), 0)
+            request.post(self.show_results, result, status, None, (df, code, centers))
             
         except Exception as e:
-            Clock.schedule_once(lambda dt: self.show_error(f'分析出错: {str(e)}'), 0)
+            if cached is not None:
+                request.post(self.show_status, 'cached',
+                             f'刷新出错（{e}），显示{format_age(cached.age)}的缓存数据')
+            else:
+                request.post(self.show_error, f'分析出错: {str(e)}')
+        finally:
+            # 各阶段耗时输出到日志（adb logcat 中可见）
+            print("各阶段耗时:\n" + metrics.format_summary())
     
     def update_progress(self, value):
         """更新进度条"""
@@ -224,125 +345,118 @@ class MainLayout(BoxLayout):
         self.status_label.color = (1, 0.3, 0.3, 1)
         self.progress.value = 0
     
-    def show_results(self, result_text):
-        """显示分析结果"""
-        self.status_label.text = '分析完成！'
-        self.status_label.color = (0.2, 0.8, 0.4, 1)
+    def show_status(self, status, message):
+        """按数据状态显示状态栏"""
+        self.status_label.text = message
+        self.status_label.color = STATUS_COLORS[status]
+        self.progress.value = 0
+    
+    def show_results(self, result_text, status='fresh', message=None, chart_data=None):
+        """显示分析结果；chart_data 为 (行情, 股票代码, 价位)，原地更新图表"""
+        self.status_label.text = message or f'分析完成！（{STATUS_LABELS[status]}）'
+        self.status_label.color = STATUS_COLORS[status]
         self.result_text.text = result_text
         self.result_text.texture_update()
         self.result_text.height = self.result_text.texture_size[1]
         
-        # 加载图表
-        chart_path = result_text.split('chart_path:')[1].split('\n')[0] if 'chart_path:' in result_text else None
-        if chart_path and os.path.exists(chart_path):
-            self.chart_image.source = chart_path
-            self.chart_image.reload()
+        if chart_data is not None:
+            df, code, centers = chart_data
+            with timed('render'):
+                self.chart.set_data(df.index.values, df['close'].values, centers, code)
+            self._chart_data = chart_data
+    
+    def export_chart(self, instance):
+        """用 matplotlib 把当前图表导出为PNG，保存到应用目录"""
+        if self._chart_data is None:
+            self.show_popup('提示', '请先分析一只股票')
+            return
+        df, code, centers = self._chart_data
+        
+        def export():
+            try:
+                from chart_render import render_levels_png
+                png = render_levels_png(df.index, df['close'].values, centers,
+                                        f"股价聚类分析 - {code}", style='mobile')
+                chart_filename = f"stock_analysis_{code.replace('.', '_')}.png"
+                chart_path = os.path.join(self.get_app_path(), chart_filename)
+                with open(chart_path, 'wb') as f:
+                    f.write(png)
+                print(f"分析图表已保存为: {chart_path}")
+                Clock.schedule_once(lambda dt: self.show_popup('导出完成', chart_path), 0)
+            except Exception as e:
+                message = str(e)
+                Clock.schedule_once(lambda dt: self.show_popup('导出失败', message), 0)
+        
+        thread = threading.Thread(target=export)
+        thread.daemon = True
+        thread.start()
+    
+    def on_code_input(self, instance, text):
+        """用户开始输入股票代码时预加载分析模块（STOCK_PRELOAD=input）"""
+        if text:
+            preload.start_for('input', PRELOAD_MODULES)
     
     def get_stock_data_multi_source(self, code, start_date='20250101', end_date='20261231'):
-        """多数据源获取股票数据"""
-        print(f"正在获取股票 {code} 的数据...")
+        """多数据源获取股票数据（本地存储增量更新）"""
+        from stock_data import fetch_stock_data
+        df = fetch_stock_data(code, start_date, end_date, store=self.get_history_store())
+        if df is not None and not df.empty:
+            return df
         
-        # 方法1: 尝试 stock_zh_a_hist_tx (腾讯证券)
+        # 所有数据源均失败: 生成模拟数据
+        print("所有数据源均失败，使用模拟数据...")
+        df = self.generate_sample_data(code)
+        df.attrs['source'] = 'synthetic'
+        return df
+    
+    def get_history_store(self):
+        """获取应用目录下的本地行情存储"""
+        if getattr(self, '_history_store', None) is None:
+            from history_store import HistoryStore
+            try:
+                self._history_store = HistoryStore(os.path.join(self.get_app_path(), 'history.sqlite3'))
+            except Exception as e:
+                print(f"本地存储不可用: {e}")
+                return False
+        return self._history_store
+    
+    def get_result_cache(self):
+        """获取应用目录下的分析结果缓存，不可用时返回None"""
+        if getattr(self, '_result_cache', None) is None:
+            from result_cache import ResultCache
+            try:
+                self._result_cache = ResultCache(os.path.join(self.get_app_path(), 'results.sqlite3'))
+            except Exception as e:
+                print(f"结果缓存不可用: {e}")
+                return None
+        return self._result_cache
+    
+    def load_cached_result(self, code):
+        """读取缓存的分析结果，没有时返回None"""
+        cache = self.get_result_cache()
+        if cache is None:
+            return None
         try:
-            print("尝试方法1: stock_zh_a_hist_tx (腾讯证券)...")
-            if code.endswith('.SZ'):
-                symbol_tx = "sz" + code.replace('.SZ', '')
-            elif code.endswith('.SH'):
-                symbol_tx = "sh" + code.replace('.SH', '')
-            else:
-                if code.startswith('6'):
-                    symbol_tx = "sh" + code
-                else:
-                    symbol_tx = "sz" + code
-            
-            print(f"腾讯接口使用代码: {symbol_tx}")
-            
-            df = ak.stock_zh_a_hist_tx(symbol=symbol_tx, start_date=start_date, 
-                                      end_date=end_date, adjust="qfq", timeout=10)
-            
-            if df is not None and not df.empty:
-                print(f"方法1成功: 获取 {len(df)} 条数据")
-                if 'amount' in df.columns:
-                    df['volume'] = df['amount'] * 100
-                if 'date' in df.columns:
-                    df['date'] = pd.to_datetime(df['date'])
-                    df.set_index('date', inplace=True)
-                return df
-            else:
-                print("方法1: 返回数据为空")
+            return cache.load(code)
         except Exception as e:
-            print(f"方法1失败: {e}")
-        
-        # 方法2: 尝试 stock_zh_a_daily (新浪财经)
-        try:
-            print("尝试方法2: stock_zh_a_daily (新浪财经)...")
-            if code.endswith('.SZ'):
-                symbol_sina = "sz" + code.replace('.SZ', '')
-            elif code.endswith('.SH'):
-                symbol_sina = "sh" + code.replace('.SH', '')
-            else:
-                if code.startswith('6'):
-                    symbol_sina = "sh" + code
-                else:
-                    symbol_sina = "sz" + code
-            
-            print(f"新浪接口使用代码: {symbol_sina}")
-            
-            df = ak.stock_zh_a_daily(symbol=symbol_sina, 
-                                    start_date=start_date, end_date=end_date, adjust="qfq")
-            if df is not None and not df.empty:
-                print(f"方法2成功: 获取 {len(df)} 条数据")
-                if isinstance(df.index, pd.RangeIndex) and 'date' in df.columns:
-                    df['date'] = pd.to_datetime(df['date'])
-                    df.set_index('date', inplace=True)
-                elif not isinstance(df.index, pd.DatetimeIndex):
-                    try:
-                        df.index = pd.to_datetime(df.index)
-                    except:
-                        if 'date' in df.columns:
-                            df['date'] = pd.to_datetime(df['date'])
-                            df.set_index('date', inplace=True)
-                return df
-            else:
-                print("方法2: 返回数据为空")
-        except Exception as e:
-            print(f"方法2失败: {e}")
-        
-        # 方法3: 尝试 stock_zh_a_hist (东方财富)
+            print(f"读取结果缓存失败: {e}")
+            return None
+    
+    def save_cached_result(self, code, df, centers):
+        """保存联网获取的行情和算出的价位（模拟数据不保存）"""
+        cache = self.get_result_cache()
+        if cache is None:
+            return
         try:
-            print("尝试方法3: stock_zh_a_hist (东方财富)...")
-            clean_code = code.replace('.SZ', '').replace('.SH', '')
-            print(f"东方财富接口使用代码: {clean_code}")
-            
-            df = ak.stock_zh_a_hist(symbol=clean_code, period="daily", 
-                                   start_date=start_date, end_date=end_date, 
-                                   adjust="qfq")
-            if df is not None and not df.empty:
-                print(f"方法3成功: 获取 {len(df)} 条数据")
-                df.rename(columns={
-                    '日期': 'date',
-                    '开盘': 'open',
-                    '最高': 'high', 
-                    '最低': 'low',
-                    '收盘': 'close',
-                    '成交量': 'volume',
-                    '成交额': 'amount'
-                }, inplace=True)
-                df['date'] = pd.to_datetime(df['date'])
-                df.set_index('date', inplace=True)
-                return df
-            else:
-                print("方法3: 返回数据为空")
+            cache.save(code, df, centers, df.attrs.get('source', ''))
         except Exception as e:
-            print(f"方法3失败: {e}")
-        
-        # 方法4: 生成模拟数据
-        print("所有数据源均失败，使用模拟数据...")
-        return self.generate_sample_data(code)
+            print(f"保存结果缓存失败: {e}")
     
     def generate_sample_data(self, code, days=180):
         """生成模拟股票数据"""
         print(f"为 {code} 生成模拟数据...")
+        import numpy as np
+        import pandas as pd
         
         if '600' in code or '688' in code:
             start_price = np.random.uniform(5, 15)
@@ -373,51 +487,36 @@ class MainLayout(BoxLayout):
         print(f"生成 {len(df)} 条模拟数据")
         return df
     
-    def analyze_clusters(self, df, code):
-        """执行聚类分析"""
-        prices = df['close'].values.reshape(-1, 1)
-        
+    def analyze_clusters(self, df, code, n_levels=5):
+        """执行聚类分析（n_levels='auto' 时自动选择价位数），返回 select_levels 的结果"""
         print("正在进行聚类分析...")
-        kmeans = KMeans(n_clusters=5, random_state=42)
-        kmeans.fit(prices)
-        centers = sorted(kmeans.cluster_centers_.flatten())
-        
-        # 创建图形
-        plt.figure(figsize=(10, 6))
-        plt.plot(df.index, df['close'], label="收盘价", color="blue", linewidth=1.5)
-        
-        colors = ['red', 'green', 'orange', 'purple', 'brown']
-        for i, c in enumerate(centers):
-            plt.axhline(c, color=colors[i % len(colors)], linestyle="--", alpha=0.7, 
-                       label=f'Level {i+1}: {c:.2f}')
-        
-        plt.title(f"股价聚类分析 - {code}", fontsize=14)
-        plt.xlabel("日期", fontsize=12)
-        plt.ylabel("价格", fontsize=12)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        
-        # 保存图片到应用目录
-        chart_filename = f"stock_analysis_{code.replace('.', '_')}.png"
-        chart_path = os.path.join(self.get_app_path(), chart_filename)
-        plt.savefig(chart_path, dpi=150, bbox_inches='tight')
-        plt.close()
-        
-        print(f"分析图表已保存为: {chart_path}")
-        return centers
+        from cluster_levels import select_levels
+        return select_levels(df['close'].values, n_levels)
     
-    def generate_result_text(self, df, code, centers):
-        """生成分析结果文本"""
+    def generate_result_text(self, df, code, centers, status='fresh', age=None, selection=None):
+        """
+        生成分析结果文本（status 为数据状态，缓存数据附带保存时间；
+        selection 为 select_levels 的结果，自动选择时显示所选价位数的 BIC）
+        """
+        from cluster_levels import locate_levels
         result = []
         result.append(f"[b]分析结果汇总[/b]\n")
         result.append(f"{'='*40}\n")
         result.append(f"[b]股票代码:[/b] {code}\n")
+        label = STATUS_LABELS[status]
+        if age is not None:
+            label += f"（{format_age(age)}更新）"
+        color = {'fresh': '2ecc71', 'cached': 'f39c12', 'synthetic': 'e74c3c'}[status]
+        result.append(f"[b]数据状态:[/b] [color={color}]{label}[/color]\n")
         
         start_date_str = df.index[0].strftime('%Y-%m-%d') if hasattr(df.index[0], 'strftime') else str(df.index[0])
         end_date_str = df.index[-1].strftime('%Y-%m-%d') if hasattr(df.index[-1], 'strftime') else str(df.index[-1])
         result.append(f"[b]数据期间:[/b] {start_date_str} 至 {end_date_str}\n")
-        result.append(f"[b]数据条数:[/b] {len(df)}\n\n")
+        result.append(f"[b]数据条数:[/b] {len(df)}\n")
+        if selection is not None and selection['score'] is not None:
+            result.append(f"[b]价位数:[/b] {selection['k']}（自动选择，BIC {selection['score']:.1f}）\n\n")
+        else:
+            result.append(f"[b]价位数:[/b] {len(centers)}\n\n")
         
         result.append(f"[b]聚类中心（支撑/压力位）:[/b]\n")
         for i, center in enumerate(centers, 1):
@@ -427,37 +526,28 @@ class MainLayout(BoxLayout):
         result.append(f"\n[b]当前价格:[/b] [color=4ecdc4]{current_price:.2f}[/color]\n")
         result.append(f"[b]相对于支撑/压力位的位置:[/b]\n")
         
-        nearest_level = None
-        min_distance = float('inf')
-        
         for i, center in enumerate(centers, 1):
             diff = current_price - center
-            distance = abs(diff)
             percent = (diff / center) * 100
             
-            if distance < min_distance:
-                min_distance = distance
-                nearest_level = (i, center, diff, percent)
-            
             if diff > 0:
                 position = f"上方 {diff:.2f} ([color=2ecc71]+{percent:.1f}%[/color])"
             else:
                 position = f"下方 {-diff:.2f} ([color=e74c3c]{percent:+.1f}%[/color])"
             result.append(f"  Level {i} ({center:.2f}): {position}\n")
         
-        if nearest_level:
-            i, center, diff, percent = nearest_level
+        located = locate_levels(current_price, centers)
+        if located['nearest'][0] >= 0:
+            i = int(located['nearest'][0]) + 1
+            center = float(located['nearest_level'][0])
+            diff = current_price - center
+            percent = float(located['nearest_pct'][0])
             result.append(f"\n[b]最接近的支撑/压力位:[/b] Level {i} ({center:.2f})\n")
             if diff > 0:
                 result.append(f"当前位于该位上方 [color=2ecc71]{diff:.2f} ({percent:+.1f}%)[/color]\n")
             else:
                 result.append(f"当前位于该位下方 [color=e74c3c]{-diff:.2f} ({percent:+.1f}%)[/color]\n")
         
-        # 添加图表路径标记
-        chart_filename = f"stock_analysis_{code.replace('.', '_')}.png"
-        chart_path = os.path.join(self.get_app_path(), chart_filename)
-        result.append(f"\nchart_path:{chart_path}\n")
-        
         return ''.join(result)
     
     def get_app_path(self):
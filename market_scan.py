@@ -0,0 +1,210 @@
+"""
+全市场支撑/压力位扫描
+遍历A股全部股票，经本地行情存储获取数据，在进程池中计算每只股票的聚类中心，
+结果写入一个 Parquet 列式文件；中断后重新运行会跳过已完成的股票
+（扫描完成后分片合并为最终文件，之后再运行即为新的一次全量扫描）
+
+用法:
+    python market_scan.py                           # 全市场，写入 levels.parquet
+    python market_scan.py --codes-file codes.txt    # 指定股票列表（每行一个代码）
+    python market_scan.py --output scan.parquet --workers 8
+
+输出字段: symbol, as_of（最后一根K线日期）, bars, source, last_close,
+level_1..level_N（升序）, nearest_level, nearest_index, distance_pct（当前价相对最近位置的百分比）
+"""
+
+import argparse
+import glob
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from stock_data import fetch_stock_data, normalize_code
+from cluster_levels import find_levels, locate_levels
+
+N_LEVELS = 5
+# 每完成多少只股票写一个分片（中断时最多丢失一个分片的进度）
+CHUNK_SIZE = 200
+
+
+def load_universe():
+    """A股全部股票代码（akshare stock_info_a_code_name）"""
+    import akshare as ak
+    df = ak.stock_info_a_code_name()
+    return [normalize_code(str(code).zfill(6)) for code in df['code']]
+
+
+def load_codes_file(path):
+    with open(path, encoding='utf-8') as f:
+        codes = [line.split('#')[0].strip() for line in f]
+    return [normalize_code(code) for code in codes if code]
+
+
+def _init_worker(verbose):
+    """工作进程初始化：Ctrl+C 只由主进程处理；默认屏蔽逐只股票的获取日志"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if not verbose:
+        sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+
+
+def scan_symbol(code, start_date, end_date, n_levels=N_LEVELS):
+    """扫描单只股票（在工作进程中执行），失败时返回带 error 的记录"""
+    try:
+        df = fetch_stock_data(code, start_date, end_date)
+    except Exception as e:
+        return {'symbol': code, 'error': str(e)}
+    if df is None or df.empty:
+        return {'symbol': code, 'error': '无法获取股票数据'}
+
+    closes = df['close'].values
+    centers = find_levels(closes, n_levels)
+    last_close = float(closes[-1])
+    located = locate_levels(last_close, centers)
+    row = {
+        'symbol': code,
+        'as_of': df.index[-1].strftime('%Y-%m-%d'),
+        'bars': int(len(df)),
+        'source': df.attrs.get('source', ''),
+        'last_close': last_close,
+    }
+    for i in range(n_levels):
+        # 去重后价格种类少于 n_levels 时，多出的位置为空
+        row[f'level_{i + 1}'] = centers[i] if i < len(centers) else np.nan
+    row['nearest_level'] = float(located['nearest_level'][0])
+    row['nearest_index'] = int(located['nearest'][0]) + 1
+    row['distance_pct'] = float(located['nearest_pct'][0])
+    return row
+
+
+class ScanWriter:
+    """把结果按分片写入 <输出文件>.parts/ 目录，结束时合并为一个文件"""
+
+    def __init__(self, output):
+        self.output = output
+        self.parts_dir = output + '.parts'
+        os.makedirs(self.parts_dir, exist_ok=True)
+        self.buffer = []
+
+    def part_files(self):
+        return sorted(glob.glob(os.path.join(self.parts_dir, 'part-*.parquet')))
+
+    def completed_symbols(self):
+        """之前运行已完成的股票"""
+        done = set()
+        for path in self.part_files():
+            done.update(pd.read_parquet(path, columns=['symbol'])['symbol'])
+        return done
+
+    def add(self, row):
+        self.buffer.append(row)
+        if len(self.buffer) >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        path = os.path.join(self.parts_dir, f"part-{len(self.part_files()):05d}.parquet")
+        tmp_path = path + '.tmp'
+        pd.DataFrame(self.buffer).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        self.buffer = []
+
+    def finish(self):
+        """合并全部分片为最终文件，成功后删除分片目录"""
+        self.flush()
+        parts = [pd.read_parquet(path) for path in self.part_files()]
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+        if not df.empty:
+            df = df.drop_duplicates('symbol', keep='last').sort_values('symbol').reset_index(drop=True)
+        tmp_path = self.output + '.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.output)
+        for path in self.part_files():
+            os.remove(path)
+        os.rmdir(self.parts_dir)
+        return df
+
+
+def run_scan(codes, output, workers=None, start_date='20250101', end_date=None,
+             n_levels=N_LEVELS, verbose=False):
+    """扫描 codes 并写入 output，返回 (结果DataFrame, 失败列表)"""
+    end_date = end_date or datetime.now().strftime('%Y%m%d')
+    writer = ScanWriter(output)
+    done = writer.completed_symbols()
+    todo = [code for code in dict.fromkeys(codes) if code not in done]
+    print(f"共 {len(codes)} 只股票，已完成 {len(done)}，本次扫描 {len(todo)} 只")
+
+    failures = []
+    started = time.perf_counter()
+    last_report = started
+    completed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(verbose,)) as pool:
+        futures = [pool.submit(scan_symbol, code, start_date, end_date, n_levels) for code in todo]
+        try:
+            for future in as_completed(futures):
+                row = future.result()
+                completed += 1
+                if 'error' in row:
+                    failures.append((row['symbol'], row['error']))
+                else:
+                    writer.add(row)
+
+                now = time.perf_counter()
+                if now - last_report >= 5 or completed == len(todo):
+                    rate = completed / (now - started)
+                    eta = (len(todo) - completed) / rate if rate > 0 else 0
+                    print(f"进度 {completed}/{len(todo)}  {rate:.1f} 只/秒  "
+                          f"失败 {len(failures)}  预计剩余 {eta:.0f} 秒")
+                    last_report = now
+        except KeyboardInterrupt:
+            # 保存已完成的部分，下次运行从这里继续
+            for future in futures:
+                future.cancel()
+            writer.flush()
+            print(f"\n已中断，已完成的 {completed} 只股票已保存，重新运行即可继续")
+            raise
+
+    df = writer.finish()
+    elapsed = time.perf_counter() - started
+    print(f"扫描完成: {len(df)} 只股票写入 {output}，用时 {elapsed:.1f} 秒"
+          f"（{len(todo) / elapsed if elapsed > 0 else 0:.1f} 只/秒）")
+    if failures:
+        print(f"失败 {len(failures)} 只:")
+        for code, error in failures[:20]:
+            print(f"  {code}: {error}")
+    return df, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全市场支撑/压力位扫描')
+    parser.add_argument('--output', default='levels.parquet', help='结果文件（Parquet）')
+    parser.add_argument('--codes-file', help='股票列表文件，默认扫描全部A股')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认CPU核数')
+    parser.add_argument('--start', default='20250101', help='数据起始日期')
+    parser.add_argument('--end', default=None, help='数据截止日期，默认今天')
+    parser.add_argument('--levels', type=int, default=N_LEVELS, help='每只股票的价位数')
+    parser.add_argument('--verbose', action='store_true', help='显示每只股票的获取日志')
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        parser.error('写入 Parquet 需要 pyarrow: pip install pyarrow')
+
+    codes = load_codes_file(args.codes_file) if args.codes_file else load_universe()
+    try:
+        run_scan(codes, args.output, workers=args.workers, start_date=args.start,
+                 end_date=args.end, n_levels=args.levels, verbose=args.verbose)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
+if __name__ == '__main__':
+    main()
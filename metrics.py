@@ -0,0 +1,184 @@
+"""
+运行指标
+进程内的计数器和直方图，按 Prometheus 文本格式输出（Web 端 /metrics），
+移动端和 Streamlit 端可用 format_summary() 查看各阶段耗时
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时直方图的桶上限（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+INF_LABEL = 'le="+Inf"'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """单调递增计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Counter):
+    """耗时直方图（每组标签记录各桶计数、总和与次数）"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def stats(self):
+        """{标签元组: (次数, 总和)}"""
+        with self._lock:
+            return {key: (entry[2], entry[1]) for key, entry in self._values.items()}
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*entry[0]], entry[1], entry[2]))
+                           for key, entry in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, INF_LABEL)} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+
+REGISTRY = MetricsRegistry()
+
+# 各阶段耗时: stage 为 normalize_code / fetch / store_load / normalize / cluster / render /
+# encode / serialize / request / queue（hedged 模式提交后台请求到开始执行的等待）；
+# fetch、store_load 和 queue 的 source 为数据源名称；
+# outcome 为 ok / empty / error / cancelled（移动端分析被新的分析取代）/ saturated（后台线程占满，未发起请求）
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'stock_stage_seconds', 'Time spent in each analysis stage',
+    ('frontend', 'stage', 'source', 'outcome')))
+# 数据源请求结果计数
+SOURCE_RESULTS = REGISTRY.register(Counter(
+    'stock_source_results_total', 'Upstream source attempts by outcome',
+    ('frontend', 'source', 'outcome')))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 当前进程所属的前端: web / asgi / kivy / streamlit
+FRONTEND = 'unknown'
+
+
+def set_frontend(name):
+    global FRONTEND
+    FRONTEND = name
+
+
+class _Timer:
+    __slots__ = ('outcome',)
+
+    def __init__(self):
+        self.outcome = 'ok'
+
+
+@contextmanager
+def timed(stage, source=''):
+    """
+    记录一个阶段的耗时；异常时 outcome 记为 error，
+    也可在代码块中设置 timer.outcome（如 'empty'）
+    """
+    timer = _Timer()
+    started = time.perf_counter()
+    try:
+        yield timer
+    except BaseException:
+        timer.outcome = 'error'
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, frontend=FRONTEND,
+                              stage=stage, source=source, outcome=timer.outcome)
+        if stage == 'fetch':
+            SOURCE_RESULTS.inc(frontend=FRONTEND, source=source, outcome=timer.outcome)
+
+
+def render():
+    return REGISTRY.render()
+
+
+def format_summary():
+    """各阶段的次数和平均耗时（文本表格），供没有 /metrics 接口的前端查看"""
+    rows = []
+    for (frontend, stage, source, outcome), (count, total) in sorted(STAGE_SECONDS.stats().items()):
+        name = f"{stage}[{source}]" if source else stage
+        rows.append(f"{name:<22} {outcome:<9} {count:>6} {total / count * 1000:>10.1f}ms")
+    return '\n'.join(rows)
@@ -0,0 +1,70 @@
+"""
+分析模块的后台预加载
+pandas、akshare（依赖众多）、matplotlib 的导入要花几秒，入口程序先显示界面，再在后台线程中导入这些模块；
+后台导入进行中时主线程用到同一模块，会由 Python 的导入锁等待其完成，不会重复导入
+
+预加载时机由环境变量 STOCK_PRELOAD 控制:
+    idle   首帧显示后立即开始（默认）
+    input  用户开始输入股票代码时开始
+    off    不预加载，第一次分析时才导入
+"""
+
+import importlib
+import os
+import threading
+import time
+
+PRELOAD_MODE = os.environ.get('STOCK_PRELOAD', 'idle')
+
+_lock = threading.Lock()
+_thread = None
+_done = threading.Event()
+# 模块名 -> 导入耗时（秒），只记录由预加载线程实际导入的模块
+timings = {}
+
+
+def _run(modules):
+    try:
+        for name in modules:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                # 缺少可选依赖等问题留到真正使用时再报告
+                print(f"预加载 {name} 失败: {e}")
+                continue
+            timings[name] = time.perf_counter() - started
+    finally:
+        _done.set()
+
+
+def start(modules):
+    """在后台线程中依次导入 modules，整个进程只启动一次；返回是否由本次调用启动"""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return False
+        _thread = threading.Thread(target=_run, args=(tuple(modules),), name='preload', daemon=True)
+        _thread.start()
+    return True
+
+
+def start_for(trigger, modules):
+    """按 PRELOAD_MODE 决定是否在 trigger（'idle' 或 'input'）时启动预加载"""
+    if PRELOAD_MODE == 'off':
+        return False
+    if trigger == 'idle' and PRELOAD_MODE != 'idle':
+        return False
+    return start(modules)
+
+
+def is_loaded():
+    """预加载是否已完成（未启动时为 False）"""
+    return _done.is_set()
+
+
+def wait(timeout=None):
+    """等待预加载完成；未启动时立即返回 False"""
+    if _thread is None:
+        return False
+    return _done.wait(timeout)
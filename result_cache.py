@@ -0,0 +1,118 @@
+"""
+分析结果缓存（移动端离线优先）
+按股票代码保存最近一次分析用到的日线和算出的支撑/压力位，打开同一股票时先从本地显示，
+再在后台联网刷新；网络不可用时仍可查看上次的结果
+"""
+
+import io
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    symbol TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    levels TEXT NOT NULL,
+    bars BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+'''
+
+# 保存的行情字段（按 float64 数组压缩存储）
+_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def _pack_bars(df):
+    """日线 -> npz 字节（日期为距1970-01-01的天数）"""
+    arrays = {'date': df.index.values.astype('datetime64[D]').astype(np.int64)}
+    for col in _COLUMNS:
+        if col in df.columns:
+            arrays[col] = df[col].to_numpy(dtype=np.float64)
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _unpack_bars(blob):
+    with np.load(io.BytesIO(blob)) as data:
+        index = pd.DatetimeIndex(data['date'].astype('datetime64[D]'), name='date')
+        return pd.DataFrame({col: data[col] for col in _COLUMNS if col in data.files},
+                            index=index)
+
+
+class CachedResult:
+    """一条缓存的分析结果: bars 日线, levels 升序价位, source 数据源, updated_at 保存时间（时间戳）"""
+
+    def __init__(self, symbol, bars, levels, source, updated_at):
+        self.symbol = symbol
+        self.bars = bars
+        self.levels = levels
+        self.source = source
+        self.updated_at = updated_at
+
+    @property
+    def age(self):
+        """距保存时已过去的秒数"""
+        return max(0.0, time.time() - self.updated_at)
+
+    def select(self, n_levels):
+        """
+        按所选价位数给出价位（格式同 select_levels 的结果）：价位数与缓存的一致时直接使用缓存的价位，
+        否则（包括自动选择）用缓存的日线重新聚类
+        """
+        if n_levels != 'auto' and int(n_levels) == len(self.levels):
+            return {'centers': list(self.levels), 'k': len(self.levels), 'score': None, 'scores': {}}
+        from cluster_levels import select_levels
+        return select_levels(self.bars['close'].to_numpy(dtype=float), n_levels)
+
+
+class ResultCache:
+    """基于SQLite的分析结果缓存，每只股票只保留最近一次（每次操作单独连接，可在后台线程中使用）"""
+
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def load(self, symbol):
+        """读取缓存的结果，不存在或已损坏时返回None"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT source, levels, bars, updated_at FROM results WHERE symbol=?',
+                               (symbol,)).fetchone()
+        if row is None:
+            return None
+        try:
+            bars = _unpack_bars(row[2])
+            levels = [float(v) for v in json.loads(row[1])]
+        except Exception as e:
+            print(f"缓存的结果无法读取 ({symbol}): {e}")
+            return None
+        return CachedResult(symbol, bars, levels, row[0], row[3])
+
+    def save(self, symbol, bars, levels, source=''):
+        """保存（覆盖）一只股票的分析结果"""
+        if bars is None or bars.empty:
+            return
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                         (symbol, source or '', json.dumps([float(v) for v in levels]),
+                          _pack_bars(bars), time.time()))
+
+    def clear(self, symbol=None):
+        """清除指定股票（或全部）的缓存"""
+        with self._connect() as conn:
+            if symbol is None:
+                conn.execute('DELETE FROM results')
+            else:
+                conn.execute('DELETE FROM results WHERE symbol=?', (symbol,))
@@ -0,0 +1,174 @@
+"""
+支撑/压力位选股
+把 market_scan.py 输出的全市场价位加载为 NumPy 数组，预先计算每只股票到下方支撑、上方压力、
+最近价位的距离并排好序，筛选时用 searchsorted 直接定位区间，全市场查询在毫秒级完成
+
+用法:
+    python screener.py levels.parquet --side support --max-pct 2
+    python screener.py levels.parquet --side resistance --max-pct 1 --sort last_close --desc
+"""
+
+import argparse
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cluster_levels import locate_levels
+
+# 筛选方向:
+#   support    当前价在下方最近支撑位之上 x%（x >= 0）
+#   resistance 当前价在上方最近压力位之下 x%（x >= 0）
+#   nearest    当前价相对最近价位的涨跌幅（可正可负）
+SIDES = ('support', 'resistance', 'nearest')
+SORT_KEYS = ('distance', 'symbol', 'last_close', 'level')
+MAX_PAGE_SIZE = 500
+
+_LEVEL_COLUMN = re.compile(r'^level_(\d+)$')
+
+
+class LevelTable:
+    """全市场价位表（只读，可在多线程间共享）"""
+
+    def __init__(self, symbols, last_close, levels, as_of=None):
+        self.symbols = np.asarray(symbols, dtype=object)
+        self.last_close = np.asarray(last_close, dtype=float)
+        self.levels = np.sort(np.asarray(levels, dtype=float), axis=1)   # NaN 排在末尾
+        self.as_of = None if as_of is None else np.asarray(as_of, dtype=object)
+
+        located = locate_levels(self.last_close, self.levels)
+        self.level_index = {
+            'support': located['lower'],
+            'resistance': located['upper'],
+            'nearest': located['nearest'],
+        }
+        self.level_price = {
+            'support': located['lower_level'],
+            'resistance': located['upper_level'],
+            'nearest': located['nearest_level'],
+        }
+        self.distance = {
+            'support': located['lower_pct'],
+            'resistance': -located['upper_pct'],
+            'nearest': located['nearest_pct'],
+        }
+        # 每个方向按距离排好序的下标和距离，查询时二分定位
+        self._order = {}
+        self._sorted = {}
+        for side, distance in self.distance.items():
+            rows = np.flatnonzero(np.isfinite(distance))
+            order = rows[np.argsort(distance[rows], kind='stable')]
+            self._order[side] = order
+            self._sorted[side] = distance[order]
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @classmethod
+    def from_frame(cls, df):
+        """由 market_scan 结果（symbol, last_close, level_1..level_N[, as_of]）构造"""
+        level_columns = sorted((c for c in df.columns if _LEVEL_COLUMN.match(c)),
+                               key=lambda c: int(_LEVEL_COLUMN.match(c).group(1)))
+        return cls(df['symbol'].values, df['last_close'].values,
+                   df[level_columns].values if level_columns else np.empty((len(df), 0)),
+                   df['as_of'].values if 'as_of' in df.columns else None)
+
+    @classmethod
+    def from_parquet(cls, path):
+        return cls.from_frame(pd.read_parquet(path))
+
+    def query(self, side='support', min_pct=None, max_pct=None, sort='distance',
+              descending=False, offset=0, limit=50):
+        """
+        筛选距离在 [min_pct, max_pct] 之间的股票，返回 (符合条件的总数, 当前页的记录列表)
+        """
+        if side not in SIDES:
+            raise ValueError(f"未知的筛选方向: {side}")
+        if sort not in SORT_KEYS:
+            raise ValueError(f"未知的排序字段: {sort}")
+        values = self._sorted[side]
+        lo = 0 if min_pct is None else np.searchsorted(values, min_pct, side='left')
+        hi = len(values) if max_pct is None else np.searchsorted(values, max_pct, side='right')
+        rows = self._order[side][lo:max(lo, hi)]
+
+        # 结果已按距离升序，其他排序只对命中的行排序
+        if sort == 'symbol':
+            rows = rows[np.argsort(self.symbols[rows], kind='stable')]
+        elif sort == 'last_close':
+            rows = rows[np.argsort(self.last_close[rows], kind='stable')]
+        elif sort == 'level':
+            rows = rows[np.argsort(self.level_price[side][rows], kind='stable')]
+        if descending:
+            rows = rows[::-1]
+
+        offset = max(0, int(offset))
+        page = rows[offset:offset + max(0, int(limit))]
+        return len(rows), [self._record(side, i) for i in page]
+
+    def _record(self, side, i):
+        levels = self.levels[i]
+        record = {
+            'symbol': self.symbols[i],
+            'last_close': float(self.last_close[i]),
+            'level': float(self.level_price[side][i]),
+            'level_index': int(self.level_index[side][i]) + 1,
+            'distance_pct': round(float(self.distance[side][i]), 4),
+            'levels': [float(v) for v in levels[np.isfinite(levels)]],
+        }
+        if self.as_of is not None:
+            record['as_of'] = str(self.as_of[i])
+        return record
+
+
+def default_levels_path():
+    """默认价位文件，可通过环境变量 STOCK_LEVELS_FILE 覆盖"""
+    return os.environ.get('STOCK_LEVELS_FILE', 'levels.parquet')
+
+
+_table = None
+_table_key = None
+_table_lock = threading.Lock()
+
+
+def get_level_table(path=None):
+    """加载价位表；文件更新（如夜间扫描完成）后自动重新加载，文件不存在时返回 None"""
+    global _table, _table_key
+    path = path or default_levels_path()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _table_lock:
+        if key != _table_key:
+            _table = LevelTable.from_parquet(path)
+            _table_key = key
+        return _table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='支撑/压力位选股')
+    parser.add_argument('levels', nargs='?', default=None, help='market_scan.py 输出的价位文件')
+    parser.add_argument('--side', default='support', choices=SIDES)
+    parser.add_argument('--min-pct', type=float, default=0.0)
+    parser.add_argument('--max-pct', type=float, default=2.0)
+    parser.add_argument('--sort', default='distance', choices=SORT_KEYS)
+    parser.add_argument('--desc', action='store_true', help='降序')
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    table = get_level_table(args.levels)
+    if table is None:
+        parser.error(f"价位文件不存在: {args.levels or default_levels_path()}（先运行 market_scan.py）")
+    total, rows = table.query(args.side, args.min_pct, args.max_pct, args.sort,
+                              args.desc, limit=args.limit)
+    print(f"共 {total} 只股票符合条件（{len(table)} 只中），显示前 {len(rows)} 只")
+    for row in rows:
+        print(f"{row['symbol']:<10} 现价 {row['last_close']:>8.2f}  "
+              f"Level {row['level_index']} {row['level']:>8.2f}  距离 {row['distance_pct']:+.2f}%")
+
+
+if __name__ == '__main__':
+    main()
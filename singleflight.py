@@ -0,0 +1,156 @@
+"""
+请求合并（single-flight）
+同一个键的计算正在进行时，后到的调用不再重复执行，而是等待并共享这次计算的结果（或异常）。
+用于热门股票被大量用户同时分析时，避免重复下载行情和重复聚类
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+
+class _FlightStats:
+    """按键统计：执行次数、共享次数（命中）、当前等待数、累计等待时间、失败次数"""
+
+    def __init__(self, max_keys=1000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._stats = OrderedDict()
+
+    def _entry(self, key):
+        """调用方需持有 self._lock"""
+        entry = self._stats.get(key)
+        if entry is None:
+            entry = self._stats[key] = {
+                'executions': 0, 'shared': 0, 'waiting': 0, 'wait_seconds': 0.0, 'errors': 0,
+            }
+            # 只保留最近使用的键，避免统计无限增长
+            while len(self._stats) > self.max_keys:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(key)
+        return entry
+
+    def _begin(self, key, leader):
+        with self._lock:
+            entry = self._entry(key)
+            if leader:
+                entry['executions'] += 1
+            else:
+                entry['shared'] += 1
+                entry['waiting'] += 1
+
+    def _end_wait(self, key, started):
+        with self._lock:
+            entry = self._entry(key)
+            entry['waiting'] -= 1
+            entry['wait_seconds'] += time.perf_counter() - started
+
+    def _error(self, key):
+        with self._lock:
+            self._entry(key)['errors'] += 1
+
+    def snapshot(self):
+        """各键的统计信息，键转为字符串以便序列化为JSON"""
+        with self._lock:
+            keys = {}
+            for key, entry in self._stats.items():
+                item = dict(entry)
+                item['wait_seconds'] = round(item['wait_seconds'], 3)
+                keys['|'.join(str(k) for k in key) if isinstance(key, tuple) else str(key)] = item
+        return {
+            'executions': sum(e['executions'] for e in keys.values()),
+            'shared': sum(e['shared'] for e in keys.values()),
+            'in_flight': self.in_flight(),
+            'keys': keys,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(_FlightStats):
+    """线程版本：do(key, fn, ...) 同一键同时只执行一次 fn"""
+
+    def __init__(self, max_keys=1000):
+        super().__init__(max_keys)
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        self._begin(key, leader)
+
+        if not leader:
+            started = time.perf_counter()
+            call.done.wait()
+            self._end_wait(key, started)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            self._error(key)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        return len(self._calls)
+
+
+class AsyncSingleFlight(_FlightStats):
+    """
+    协程版本：await do(key, fn, ...)，fn 为协程函数
+    共享的计算在独立的任务中运行，某个调用方被取消（如客户端断开）不会取消其他调用方在等的计算
+    """
+
+    def __init__(self, max_keys=1000):
+        super().__init__(max_keys)
+        self._tasks = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._tasks.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        self._begin(key, leader)
+
+        if leader:
+            return await asyncio.shield(task)
+        started = time.perf_counter()
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._end_wait(key, started)
+
+    def _finish(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            self._error(key)
+
+    def in_flight(self):
+        return len(self._tasks)
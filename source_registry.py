@@ -0,0 +1,210 @@
+"""
+数据源注册表
+按数据源统计最近的成功率和 p50/p95 延迟，按预期取得数据的时间对数据源排序，
+并为连续失败的数据源提供熔断（冷却期内跳过）
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+# 未有统计时假设的成功延迟（秒）
+DEFAULT_LATENCY = 1.0
+# 半开试探请求的最长等待时间（秒），超时未返回结果则允许再次试探
+HALF_OPEN_TIMEOUT = 60.0
+
+
+class ProbeInProgress(Exception):
+    """半开状态的数据源已有试探请求在进行，本次不发起请求"""
+
+
+def _percentile(values, q):
+    """简单分位数（values 已排序）"""
+    if not values:
+        return None
+    pos = (len(values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+class SourceStats:
+    """单个数据源的滚动统计与熔断状态"""
+
+    def __init__(self, name, window):
+        self.name = name
+        self.samples = deque(maxlen=window)   # (时间, 结果, 耗时)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trips = 0
+        self.half_open_since = 0.0
+        self.last_error = None
+        self.skipped = 0
+        self.last_skip_reason = None
+
+    def success_rate(self):
+        """Laplace平滑后的成功率（空数据不计入）"""
+        ok = sum(1 for _, outcome, _ in self.samples if outcome == 'ok')
+        fail = sum(1 for _, outcome, _ in self.samples if outcome == 'fail')
+        return (ok + 1) / (ok + fail + 2)
+
+    def latencies(self):
+        return sorted(latency for _, outcome, latency in self.samples if outcome == 'ok')
+
+    def expected_time(self):
+        """预期取得数据的时间：成功延迟中位数 / 成功率"""
+        p50 = _percentile(self.latencies(), 0.5)
+        if p50 is None:
+            p50 = DEFAULT_LATENCY
+        return p50 / self.success_rate()
+
+
+class SourceRegistry:
+    """
+    数据源注册表
+    failure_threshold: 连续失败多少次后熔断；cooldown: 首次熔断的冷却时间（秒），
+    半开试探再次失败时冷却时间加倍，最长 max_cooldown
+    """
+
+    def __init__(self, window=50, failure_threshold=3, cooldown=120.0, max_cooldown=1800.0):
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = SourceStats(name, self.window)
+        return stats
+
+    def record(self, name, outcome, latency, error=None):
+        """记录一次请求结果，outcome 为 'ok' / 'fail' / 'empty'"""
+        now = time.time()
+        with self._lock:
+            stats = self._get(name)
+            stats.samples.append((now, outcome, latency))
+            stats.half_open_since = 0.0
+            if outcome == 'fail':
+                stats.consecutive_failures += 1
+                stats.last_error = str(error) if error is not None else None
+                if stats.consecutive_failures >= self.failure_threshold:
+                    # 连续熔断时冷却时间指数增长
+                    cooldown = min(self.cooldown * 2 ** stats.trips, self.max_cooldown)
+                    stats.open_until = now + cooldown
+                    stats.trips += 1
+            elif outcome == 'ok':
+                stats.consecutive_failures = 0
+                stats.open_until = 0.0
+                stats.trips = 0
+
+    def _claim_probe(self, name):
+        """
+        真正发起请求前调用：半开状态的数据源只放行一个试探请求，
+        已有试探在进行（未超过 HALF_OPEN_TIMEOUT）时返回 False
+        """
+        now = time.time()
+        with self._lock:
+            stats = self._get(name)
+            if stats.consecutive_failures < self.failure_threshold or stats.open_until > now:
+                # 闭合，或全部熔断时按顺序强制尝试
+                return True
+            if now - stats.half_open_since < HALF_OPEN_TIMEOUT:
+                return False
+            stats.half_open_since = now
+            return True
+
+    def track(self, name, fetch):
+        """包装获取函数，自动记录耗时与结果；半开试探已被占用时抛出 ProbeInProgress"""
+        def wrapper(*args, **kwargs):
+            if not self._claim_probe(name):
+                raise ProbeInProgress(f"{name} 半开试探进行中")
+            started = time.perf_counter()
+            try:
+                df = fetch(*args, **kwargs)
+            except Exception as e:
+                self.record(name, 'fail', time.perf_counter() - started, e)
+                raise
+            outcome = 'ok' if df is not None and not df.empty else 'empty'
+            self.record(name, outcome, time.perf_counter() - started)
+            return df
+        return wrapper
+
+    def order(self, sources):
+        """
+        按预期取得数据的时间排序，返回 (可尝试的数据源, 被跳过的数据源)
+        被跳过的数据源为 [(名称, 原因), ...]；全部熔断时仍按顺序全部尝试
+        """
+        now = time.time()
+        ranked = []
+        skipped = []
+        with self._lock:
+            for position, (name, fetch) in enumerate(sources):
+                stats = self._get(name)
+                if stats.open_until > now:
+                    reason = (f"熔断中: 连续失败 {stats.consecutive_failures} 次，"
+                              f"剩余 {stats.open_until - now:.0f} 秒")
+                    stats.skipped += 1
+                    stats.last_skip_reason = reason
+                    skipped.append(((name, fetch), reason))
+                    continue
+                if (stats.consecutive_failures >= self.failure_threshold
+                        and now - stats.half_open_since < HALF_OPEN_TIMEOUT):
+                    # 冷却结束：半开状态，只放行一次试探；试探名额在真正发起请求时才占用（见 track）
+                    reason = "半开试探进行中"
+                    stats.skipped += 1
+                    stats.last_skip_reason = reason
+                    skipped.append(((name, fetch), reason))
+                    continue
+                ranked.append((stats.expected_time(), position, (name, fetch)))
+
+        if not ranked:
+            return list(sources), []
+        ranked.sort(key=lambda item: (item[0], item[1]))
+        return [item[2] for item in ranked], [(s[0], reason) for s, reason in skipped]
+
+    def state(self, stats, now=None):
+        now = now or time.time()
+        if stats.open_until > now:
+            return 'open'
+        if stats.consecutive_failures >= self.failure_threshold:
+            return 'half_open'
+        return 'closed'
+
+    def snapshot(self):
+        """各数据源的统计信息，用于排查数据源为何被跳过"""
+        now = time.time()
+        result = {}
+        with self._lock:
+            for name, stats in self._stats.items():
+                latencies = stats.latencies()
+                p50 = _percentile(latencies, 0.5)
+                p95 = _percentile(latencies, 0.95)
+                result[name] = {
+                    'state': self.state(stats, now),
+                    'samples': len(stats.samples),
+                    'success_rate': round(stats.success_rate(), 4),
+                    'p50_ms': None if p50 is None else round(p50 * 1000, 1),
+                    'p95_ms': None if p95 is None else round(p95 * 1000, 1),
+                    'expected_time_ms': round(stats.expected_time() * 1000, 1),
+                    'consecutive_failures': stats.consecutive_failures,
+                    'open_remaining_s': round(max(0.0, stats.open_until - now), 1),
+                    'last_error': stats.last_error,
+                    'skipped': stats.skipped,
+                    'last_skip_reason': stats.last_skip_reason,
+                }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# 进程内共享的默认注册表
+REGISTRY = SourceRegistry(
+    failure_threshold=int(os.environ.get('STOCK_BREAKER_FAILURES', '3')),
+    cooldown=float(os.environ.get('STOCK_BREAKER_COOLDOWN', '120')),
+)
@@ -0,0 +1,412 @@
+"""
+股票数据获取模块
+统一封装腾讯/新浪/东方财富三个数据源，供移动端、Web端和Streamlit版本共用
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import pandas as pd
+
+from history_store import BAR_COLUMNS, get_default_store
+from source_registry import REGISTRY, ProbeInProgress
+import metrics
+from metrics import timed
+
+# 本地存储在该时间（秒）内检查过上游时直接使用缓存，不再发起网络请求
+STORE_FRESH_SECONDS = float(os.environ.get('STOCK_STORE_FRESH_SECONDS', '300'))
+
+# 获取模式: sequential 依次尝试各数据源; hedged 并发竞速，取最先返回的有效数据
+FETCH_MODE = os.environ.get('STOCK_FETCH_MODE', 'sequential')
+# hedged 模式下相邻数据源的启动间隔（秒），0 表示同时发起全部请求
+HEDGE_DELAY = float(os.environ.get('STOCK_HEDGE_DELAY', '0'))
+# hedged 模式使用的后台线程数，也是同时进行的后台请求上限（含落败后仍未结束的请求）
+HEDGE_WORKERS = int(os.environ.get('STOCK_HEDGE_WORKERS', '8'))
+# 是否按数据源注册表的统计动态调整尝试顺序（0 为固定顺序）
+ADAPTIVE_ORDER = os.environ.get('STOCK_ADAPTIVE_SOURCES', '1') != '0'
+
+SOURCE_LABELS = {
+    'tencent': '腾讯证券',
+    'sina': '新浪财经',
+    'eastmoney': '东方财富',
+}
+
+
+def normalize_code(code):
+    """统一股票代码格式为 000001.SZ / 600000.SH"""
+    code = code.strip().upper()
+    if not code.endswith('.SZ') and not code.endswith('.SH'):
+        if code.startswith('6'):
+            code = code + '.SH'
+        else:
+            code = code + '.SZ'
+    return code
+
+
+def to_market_symbol(code):
+    """转换为带市场前缀的代码，如 sz000001（腾讯、新浪接口使用）"""
+    code = normalize_code(code)
+    if code.endswith('.SH'):
+        return "sh" + code.replace('.SH', '')
+    return "sz" + code.replace('.SZ', '')
+
+
+def to_plain_code(code):
+    """去掉市场后缀的纯数字代码（东方财富接口使用）"""
+    return normalize_code(code).replace('.SZ', '').replace('.SH', '')
+
+
+def normalize_bars(df):
+    """统一为日期索引、标准字段、按日期升序的行情数据"""
+    with timed('normalize'):
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date'])
+            df = df.set_index('date')
+        elif not isinstance(df.index, pd.DatetimeIndex):
+            df.index = pd.to_datetime(df.index)
+        df = df[[c for c in BAR_COLUMNS if c in df.columns]].astype(float)
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        df.index.name = 'date'
+    return df
+
+
+def fetch_tencent(code, start_date, end_date, adjust='qfq'):
+    """腾讯证券: stock_zh_a_hist_tx"""
+    import akshare as ak      # 依赖众多、导入较慢，首次获取行情时才导入
+    df = ak.stock_zh_a_hist_tx(symbol=to_market_symbol(code), start_date=start_date,
+                               end_date=end_date, adjust=adjust, timeout=10)
+    if df is None or df.empty:
+        return None
+    df = df.copy()
+    if 'amount' in df.columns:
+        df['volume'] = df['amount'] * 100
+    return normalize_bars(df)
+
+
+def fetch_sina(code, start_date, end_date, adjust='qfq'):
+    """新浪财经: stock_zh_a_daily"""
+    import akshare as ak
+    df = ak.stock_zh_a_daily(symbol=to_market_symbol(code),
+                             start_date=start_date, end_date=end_date, adjust=adjust)
+    if df is None or df.empty:
+        return None
+    return normalize_bars(df.copy())
+
+
+def fetch_eastmoney(code, start_date, end_date, adjust='qfq'):
+    """东方财富: stock_zh_a_hist"""
+    import akshare as ak
+    df = ak.stock_zh_a_hist(symbol=to_plain_code(code), period="daily",
+                            start_date=start_date, end_date=end_date, adjust=adjust)
+    if df is None or df.empty:
+        return None
+    df = df.rename(columns={
+        '日期': 'date',
+        '开盘': 'open',
+        '最高': 'high',
+        '最低': 'low',
+        '收盘': 'close',
+        '成交量': 'volume',
+        '成交额': 'amount'
+    })
+    return normalize_bars(df)
+
+
+# 默认尝试顺序
+SOURCES = [
+    ('tencent', fetch_tencent),
+    ('sina', fetch_sina),
+    ('eastmoney', fetch_eastmoney),
+]
+
+
+def _ymd(value):
+    return pd.Timestamp(value).strftime('%Y%m%d')
+
+
+def fetch_with_store(store, code, source, fetch, start_date, end_date, adjust='qfq'):
+    """
+    通过本地存储增量获取单个数据源的行情
+    已有数据时只下载缺少的部分：请求起点早于已存范围时补下载前面一段，
+    已存数据不够新时只下载最后一段（从倒数第二个已存交易日开始），
+    新下载的K线都和一根已存K线重叠，用它校验复权价格，
+    复权因子变化（如除权除息）时把已存范围和请求范围整段重新下载
+    """
+    symbol = normalize_code(code)
+    req_start = pd.Timestamp(start_date)
+    req_end = pd.Timestamp(end_date)
+    meta = store.get_meta(symbol, source, adjust)
+
+    if meta is None:
+        df = fetch(code, start_date, end_date, adjust)
+        if df is not None and not df.empty:
+            store.save(symbol, source, adjust, df, first_date=start_date,
+                       checked_end=end_date, replace=True)
+        return df
+
+    def refetch():
+        # 复权价格变化：已存的整段都已失效，按两者的并集重新下载
+        print(f"{symbol} 复权价格已变化，重新下载完整数据...")
+        full_start = min(req_start, pd.Timestamp(meta['first_date']))
+        full_end = max(req_end, pd.Timestamp(meta['last_date']))
+        df = fetch(code, _ymd(full_start), _ymd(full_end), adjust)
+        if df is None or df.empty:
+            return df
+        store.save(symbol, source, adjust, df, first_date=full_start,
+                   checked_end=full_end, replace=True)
+        return df[(df.index >= req_start) & (df.index <= req_end)]
+
+    if pd.Timestamp(meta['first_date']) > req_start:
+        cached = store.load(symbol, source, adjust)
+        if cached.empty:
+            return refetch()
+        anchor = cached.index[0]
+        head = fetch(code, start_date, _ymd(anchor), adjust)
+        if not _same_close(head, cached, anchor):
+            return refetch()
+        print(f"补充下载 {symbol} ({source}): {(head.index < anchor).sum()} 条更早的数据")
+        store.save(symbol, source, adjust, head, first_date=start_date)
+        meta = store.get_meta(symbol, source, adjust)
+
+    fresh = (time.time() - meta['checked_at'] < STORE_FRESH_SECONDS and
+             pd.Timestamp(meta['checked_end']) >= req_end)
+    if pd.Timestamp(meta['last_date']) >= req_end or fresh:
+        print(f"使用本地缓存: {symbol} ({source})")
+        with timed('store_load', source=source):
+            return store.load(symbol, source, adjust, start_date, end_date)
+
+    cached = store.load(symbol, source, adjust)
+    anchor = cached.index[-2] if len(cached) >= 2 else cached.index[-1]
+    delta = fetch(code, _ymd(anchor), end_date, adjust)
+    if delta is None or delta.empty:
+        store.touch(symbol, source, adjust, checked_end=end_date)
+        return store.load(symbol, source, adjust, start_date, end_date)
+
+    if not _same_close(delta, cached, anchor):
+        return refetch()
+
+    new_bars = delta[delta.index >= anchor]
+    print(f"增量更新 {symbol} ({source}): {(new_bars.index > cached.index[-1]).sum()} 条新数据")
+    store.save(symbol, source, adjust, new_bars, checked_end=end_date)
+    return store.load(symbol, source, adjust, start_date, end_date)
+
+
+def _same_close(fresh, cached, anchor):
+    """新下载的数据在重叠的K线 anchor 上收盘价与已存的一致（复权因子未变）"""
+    if fresh is None or anchor not in fresh.index:
+        return False
+    anchor_close = cached.loc[anchor, 'close']
+    return abs(fresh.loc[anchor, 'close'] - anchor_close) <= 1e-6 * abs(anchor_close)
+
+
+def configure(fetch_mode=None, hedge_delay=None):
+    """修改本进程的默认获取模式（也可通过环境变量 STOCK_FETCH_MODE / STOCK_HEDGE_DELAY 配置）"""
+    global FETCH_MODE, HEDGE_DELAY
+    if fetch_mode is not None:
+        if fetch_mode not in ('sequential', 'hedged'):
+            raise ValueError(f"未知的获取模式: {fetch_mode}")
+        FETCH_MODE = fetch_mode
+    if hedge_delay is not None:
+        HEDGE_DELAY = float(hedge_delay)
+
+
+_executor = None
+_executor_slots = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    hedged 模式共用的线程池（不随单次请求关闭，落败的请求在后台自然结束）
+    和它的空闲线程计数：提交前先占用一个名额，保证提交的请求不会排在落败请求后面
+    """
+    global _executor, _executor_slots
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS,
+                                           thread_name_prefix='stock-fetch')
+            _executor_slots = threading.BoundedSemaphore(HEDGE_WORKERS)
+        return _executor, _executor_slots
+
+
+def _submit_attempt(name, *args):
+    """
+    在后台线程中获取一个数据源；线程全部被占用时返回 None（不排队）
+    从提交到开始执行的等待时间记为 queue 阶段，线程已满记为 outcome='saturated'
+    """
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        metrics.STAGE_SECONDS.observe(0.0, frontend=metrics.FRONTEND, stage='queue',
+                                      source=name, outcome='saturated')
+        return None
+    submitted = time.perf_counter()
+
+    def run():
+        try:
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - submitted, frontend=metrics.FRONTEND,
+                                          stage='queue', source=name, outcome='ok')
+            return _fetch_source(*args)
+        finally:
+            slots.release()
+    try:
+        return executor.submit(run)
+    except BaseException:
+        slots.release()
+        raise
+
+
+def _run_inline(func, *args):
+    """在当前线程中执行，结果包装为已完成的 Future"""
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _timed_fetch(name, fetch):
+    """
+    包装上游获取函数，记录 fetch 阶段耗时和数据源结果计数；
+    只统计真正发起的网络请求，本地存储命中记在 store_load 阶段
+    """
+    def wrapper(code, start_date, end_date, adjust):
+        with timed('fetch', source=name) as timer:
+            df = fetch(code, start_date, end_date, adjust)
+            if df is None or df.empty:
+                timer.outcome = 'empty'
+            return df
+    return wrapper
+
+
+def _fetch_source(store, code, name, fetch, start_date, end_date, adjust):
+    try:
+        if store:
+            return fetch_with_store(store, code, name, fetch, start_date, end_date, adjust)
+        return fetch(code, start_date, end_date, adjust)
+    except ProbeInProgress as e:
+        # 其他请求正在试探这个半开的数据源，本次跳过
+        print(f"跳过{SOURCE_LABELS.get(name, name)}: {e}")
+        return None
+
+
+def _fetch_sequential(code, start_date, end_date, adjust, store, sources):
+    """依次尝试各数据源"""
+    for i, (name, fetch) in enumerate(sources, 1):
+        label = SOURCE_LABELS.get(name, name)
+        try:
+            print(f"尝试方法{i}: {label}...")
+            df = _fetch_source(store, code, name, fetch, start_date, end_date, adjust)
+            if df is not None and not df.empty:
+                print(f"方法{i}成功: 获取 {len(df)} 条数据")
+                df.attrs['source'] = name
+                return df
+            print(f"方法{i}: 返回数据为空")
+        except Exception as e:
+            print(f"方法{i}失败: {e}")
+    return None
+
+
+def _fetch_hedged(code, start_date, end_date, adjust, store, sources, delay):
+    """
+    并发竞速获取：按顺序每隔 delay 秒发起下一个数据源（delay=0 时同时发起），
+    某个数据源失败时立即发起下一个；返回最先得到的有效数据，其余请求的结果被忽略。
+    后台线程被（多为落败后仍在进行的）请求占满时不再发起对冲请求，只等待已发起的请求；
+    没有已发起的请求时在当前线程中直接获取，不排在其他请求后面
+    """
+    queue = list(enumerate(sources, 1))
+    pending = {}
+    next_launch = time.monotonic()
+
+    while queue or pending:
+        if queue and (not pending or (next_launch is not None and time.monotonic() >= next_launch)):
+            i, (name, fetch) = queue[0]
+            args = (store, code, name, fetch, start_date, end_date, adjust)
+            future = _submit_attempt(name, *args)
+            if future is None and pending:
+                next_launch = None      # 等已发起的请求失败后再试
+            else:
+                queue.pop(0)
+                print(f"并发发起方法{i}: {SOURCE_LABELS.get(name, name)}...")
+                if future is None:
+                    future = _run_inline(_fetch_source, *args)
+                pending[future] = (i, name)
+                next_launch = time.monotonic() + delay
+                continue
+
+        timeout = None
+        if queue and next_launch is not None:
+            timeout = max(0.0, next_launch - time.monotonic())
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            i, name = pending.pop(future)
+            try:
+                df = future.result()
+            except Exception as e:
+                print(f"方法{i}失败: {e}")
+                next_launch = time.monotonic()
+                continue
+            if df is not None and not df.empty:
+                print(f"方法{i}成功: 获取 {len(df)} 条数据（忽略其余 {len(pending)} 个请求）")
+                for other in pending:
+                    other.cancel()
+                df.attrs['source'] = name
+                return df
+            print(f"方法{i}: 返回数据为空")
+            next_launch = time.monotonic()
+    return None
+
+
+def fetch_stock_data(code, start_date='20250101', end_date='20261231', adjust='qfq',
+                     store=None, sources=None, mode=None, hedge_delay=None, registry=None):
+    """
+    多数据源获取股票数据
+    store 为 None 时使用默认本地存储，为 False 时不使用存储；
+    sources 为 [(名称, 获取函数), ...]，默认 SOURCES，可传入本地桩函数做测试；
+    mode / hedge_delay 默认取模块配置；
+    registry 为 None 时使用默认数据源注册表排序和熔断，为 False 时按 sources 固定顺序；
+    全部数据源失败时返回本地已存数据（attrs['offline'] 为 True），没有则返回 None
+    返回的 DataFrame 在 attrs['source'] 中记录实际使用的数据源
+    """
+    with timed('normalize_code'):
+        code = normalize_code(code)
+    if store is None:
+        try:
+            store = get_default_store()
+        except Exception as e:
+            print(f"本地存储不可用: {e}")
+            store = False
+    all_sources = sources or SOURCES
+    mode = mode or FETCH_MODE
+    if registry is None:
+        registry = REGISTRY if ADAPTIVE_ORDER else False
+    print(f"正在获取股票 {code} 的数据...")
+
+    sources = all_sources
+    if registry:
+        ordered, skipped = registry.order(all_sources)
+        for name, reason in skipped:
+            print(f"跳过{SOURCE_LABELS.get(name, name)}: {reason}")
+        sources = [(name, registry.track(name, _timed_fetch(name, fetch))) for name, fetch in ordered]
+    else:
+        sources = [(name, _timed_fetch(name, fetch)) for name, fetch in sources]
+
+    if mode == 'hedged':
+        delay = HEDGE_DELAY if hedge_delay is None else hedge_delay
+        df = _fetch_hedged(code, start_date, end_date, adjust, store, sources, delay)
+    else:
+        df = _fetch_sequential(code, start_date, end_date, adjust, store, sources)
+    if df is not None:
+        return df
+
+    if store:
+        for name, _ in all_sources:
+            df = store.load(code, name, adjust, start_date, end_date)
+            if not df.empty:
+                print(f"所有数据源均失败，使用本地已存数据 ({name})")
+                df.attrs['source'] = name
+                df.attrs['offline'] = True
+                return df
+    return None
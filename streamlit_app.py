@@ -1,15 +1,28 @@
 """
 股票聚类分析 - Streamlit版本
 适用于部署到Streamlit Cloud
+
+Streamlit 每次控件交互都会重新运行整个脚本，各层结果都经过缓存:
+  - 行情: st.cache_data，按代码缓存 STOCK_STREAMLIT_TTL 秒（默认300）；
+          过期后由本地行情存储（STOCK_HISTORY_DB）增量更新，容器重启后也只需下载新增的日线
+  - 聚类: st.cache_data(persist='disk')，按代码、价位数和收盘价序列缓存，结果与时间无关，无需 TTL
+  - 图表: 整个进程共用一张模板图（st.cache_resource），PNG 按相同的键缓存到磁盘
+
+自选股列表模式同时分析多只股票：行情在下载线程池中并发获取，聚类在计算线程池中进行，
+每只股票完成后立即加入结果表格，不等待最慢的一只
 """
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
-import akshare as ak
+from stock_data import fetch_stock_data, normalize_code
+from cluster_levels import select_levels, locate_levels
+from chart_render import LevelChartRenderer
+import metrics
+from metrics import timed
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -19,50 +32,29 @@ st.set_page_config(
     page_icon="📈",
     layout="wide"
 )
+metrics.set_frontend('streamlit')
+
+# 行情缓存时间（秒）
+DATA_TTL = int(os.environ.get('STOCK_STREAMLIT_TTL', '300'))
+# 自选股列表: 并发下载数、聚类线程数、最多股票数
+WATCHLIST_FETCH_WORKERS = int(os.environ.get('STOCK_WATCHLIST_FETCH_WORKERS', '8'))
+WATCHLIST_CPU_WORKERS = int(os.environ.get('STOCK_WATCHLIST_CPU_WORKERS', '2'))
+WATCHLIST_MAX = 300
+
+@st.cache_data(ttl=DATA_TTL, max_entries=500, show_spinner=False)
+def load_stock_data(code):
+    """获取股票数据（本地存储增量更新）；获取失败时抛出异常，不缓存失败结果"""
+    df = fetch_stock_data(code, start_date='20250101', end_date='20500101')
+    if df is None or df.empty:
+        raise LookupError(f"无法获取 {code} 的数据")
+    return df
 
 def get_stock_data(code):
-    """获取股票数据"""
-    start_date = '20250101'
-    
-    # 方法1: 腾讯
+    """获取股票数据，全部数据源失败时退回模拟数据"""
     try:
-        symbol = "sz" + code.replace('.SZ', '') if code.endswith('.SZ') else "sh" + code.replace('.SH', '')
-        if not code.endswith('.SZ') and not code.endswith('.SH'):
-            symbol = "sz" + code if not code.startswith('6') else "sh" + code
-        df = ak.stock_zh_a_hist_tx(symbol=symbol, start_date=start_date, adjust="qfq", timeout=10)
-        if df is not None and not df.empty:
-            if 'amount' in df.columns: df['volume'] = df['amount'] * 100
-            if 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                df.set_index('date', inplace=True)
-            return df
-    except: pass
-    
-    # 方法2: 新浪
-    try:
-        symbol = "sz" + code.replace('.SZ', '') if code.endswith('.SZ') else "sh" + code.replace('.SH', '')
-        if not code.endswith('.SZ') and not code.endswith('.SH'):
-            symbol = "sh" + code if code.startswith('6') else "sz" + code
-        df = ak.stock_zh_a_daily(symbol=symbol, start_date=start_date, adjust="qfq")
-        if df is not None and not df.empty:
-            if isinstance(df.index, pd.RangeIndex) and 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                df.set_index('date', inplace=True)
-            return df
-    except: pass
-    
-    # 方法3: 东方财富
-    try:
-        clean = code.replace('.SZ', '').replace('.SH', '')
-        df = ak.stock_zh_a_hist(symbol=clean, period="daily", start_date=start_date, adjust="qfq")
-        if df is not None and not df.empty:
-            df.rename(columns={'日期':'date','开盘':'open','最高':'high','最低':'low','收盘':'close','成交量':'volume','成交额':'amount'}, inplace=True)
-            df['date'] = pd.to_datetime(df['date'])
-            df.set_index('date', inplace=True)
-            return df
-    except: pass
-    
-    return generate_sample(code)
+        return load_stock_data(code)
+    except LookupError:
+        return generate_sample(code)
 
 def generate_sample(code, days=180):
     """生成模拟数据"""
@@ -81,52 +73,172 @@ def generate_sample(code, days=180):
     df['low'] = df[['low', 'open', 'close']].min(axis=1)
     return df
 
-def analyze(df, code):
-    """聚类分析"""
-    prices = df['close'].values.reshape(-1, 1)
-    kmeans = KMeans(n_clusters=5, random_state=42)
-    kmeans.fit(prices)
-    centers = sorted(kmeans.cluster_centers_.flatten())
+@st.cache_data(persist='disk', max_entries=1000, show_spinner=False)
+def compute_levels(code, closes, n_levels):
+    """聚类分析（n_levels='auto' 时自动选择价位数）；code 只参与缓存键"""
+    return select_levels(closes, n_levels)
+
+@st.cache_resource
+def chart_renderer():
+    """进程内共用的模板图和保护它的锁，跨重新运行、跨会话复用"""
+    return LevelChartRenderer('streamlit'), threading.Lock()
+
+@st.cache_data(persist='disk', max_entries=200, show_spinner=False)
+def render_chart(code, dates, closes, centers):
+    """绘制图表为PNG（缓存键为代码、日期、收盘价和价位）"""
+    renderer, lock = chart_renderer()
+    with lock:
+        return renderer.render_png(dates, closes, centers, f"股价聚类分析 - {code}")
+
+def analyze(df, code, n_levels=5):
+    """聚类分析并绘图，返回 (选择结果, PNG)"""
+    closes = df['close'].to_numpy(dtype=float)
+    selection = compute_levels(code, closes, n_levels)
+    png = render_chart(code, df.index.values, closes, tuple(selection['centers']))
+    return selection, png
+
+@st.cache_resource
+def watchlist_pools():
+    """进程内共用的线程池（下载, 聚类），所有会话合计的并发数有上限"""
+    return (ThreadPoolExecutor(max_workers=WATCHLIST_FETCH_WORKERS, thread_name_prefix='watch-fetch'),
+            ThreadPoolExecutor(max_workers=WATCHLIST_CPU_WORKERS, thread_name_prefix='watch-compute'))
+
+def parse_codes(text):
+    """按空白、逗号、分号拆分股票代码，去重并保持顺序"""
+    codes = []
+    for token in re.split(r'[\s,，;；]+', text):
+        if token:
+            code = normalize_code(token)
+            if code not in codes:
+                codes.append(code)
+    return codes
+
+def watchlist_row(code, df, selection):
+    """
+    表格中的一行: 代码、最新价、最近价位、距离%（(最新价 - 价位) / 价位）、数据
+    数据源全部失败时用的是本地存储的旧数据，“数据”列标为离线
+    """
+    current = float(df['close'].iloc[-1])
+    located = locate_levels(current, selection['centers'])
+    return {
+        '代码': code,
+        '最新价': current,
+        '最近价位': float(located['nearest_level'][0]),
+        '距离%': float(located['nearest_pct'][0]),
+        '数据': f"离线（截至 {df.index[-1]:%Y-%m-%d}）" if df.attrs.get('offline') else '最新',
+    }
+
+def run_watchlist(codes, n_levels, table, progress):
+    """
+    并发分析多只股票：下载完成的股票提交到计算线程池，聚类完成后立即刷新表格。
+    每个会话同时最多提交 WATCHLIST_FETCH_WORKERS 个下载，其余代码在本函数中等待，
+    不会一次把整个列表压进共用的线程池；页面重新运行或会话结束（脚本被中断）时取消尚未开始的任务。
+    自选股列表中不使用模拟数据，获取失败的股票单独列出
+    """
+    fetch_pool, compute_pool = watchlist_pools()
+    waiting = list(codes)
+    # future -> 代码（下载中）或 (代码, 行情)（聚类中）
+    pending = {}
+    rows, failed = [], []
+    try:
+        while waiting or pending:
+            fetching = sum(1 for item in pending.values() if isinstance(item, str))
+            while waiting and fetching < WATCHLIST_FETCH_WORKERS:
+                code = waiting.pop(0)
+                pending[fetch_pool.submit(load_stock_data, code)] = code
+                fetching += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                if isinstance(item, str):
+                    try:
+                        df = future.result()
+                    except Exception as e:
+                        failed.append(f"{item}: {e}")
+                        continue
+                    closes = df['close'].to_numpy(dtype=float)
+                    pending[compute_pool.submit(compute_levels, item, closes, n_levels)] = (item, df)
+                else:
+                    code, df = item
+                    try:
+                        rows.append(watchlist_row(code, df, future.result()))
+                    except Exception as e:
+                        failed.append(f"{code}: {e}")
+            finished = len(rows) + len(failed)
+            progress.progress(finished / len(codes), text=f"已完成 {finished}/{len(codes)}")
+            if rows:
+                # 默认按距离最近价位的远近排序，点击表头可按其他列排序
+                frame = pd.DataFrame(rows)
+                frame = frame.sort_values('距离%', key=abs)
+                table.dataframe(frame, hide_index=True, width='stretch',
+                                column_config={'最新价': st.column_config.NumberColumn(format="%.2f"),
+                                               '最近价位': st.column_config.NumberColumn(format="%.2f"),
+                                               '距离%': st.column_config.NumberColumn(format="%+.2f%%")})
+    finally:
+        # 正常结束时 pending 为空；脚本被中断（StopException / RerunException）时取消排队中的任务
+        for future in pending:
+            future.cancel()
+    return rows, failed
+
+def watchlist_page(n_levels):
+    text = st.text_area("自选股代码", height=150,
+                        placeholder="每行一个或用逗号分隔，如:\n000001\n600000.SH")
+    codes = parse_codes(text)
+    if len(codes) > WATCHLIST_MAX:
+        st.warning(f"最多分析 {WATCHLIST_MAX} 只股票，已截取前 {WATCHLIST_MAX} 只")
+        codes = codes[:WATCHLIST_MAX]
+    if codes and st.button(f"🔍 分析 {len(codes)} 只股票", type="primary"):
+        st.session_state['watchlist'] = codes
     
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.plot(df.index, df['close'], label="收盘价", color="#00d4ff", linewidth=1.5)
-    colors = ['#ff4444', '#44ff44', '#ffaa00', '#aa44ff', '#ff44aa']
-    for i, c in enumerate(centers):
-        ax.axhline(c, color=colors[i], linestyle="--", alpha=0.7, label=f'Level {i+1}: {c:.2f}')
-    ax.set_title(f"股价聚类分析 - {code}", fontsize=14)
-    ax.set_xlabel("日期")
-    ax.set_ylabel("价格")
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    return centers, fig
+    if codes and st.session_state.get('watchlist') == codes:
+        progress = st.progress(0.0, text=f"已完成 0/{len(codes)}")
+        table = st.empty()
+        with timed('request'):
+            rows, failed = run_watchlist(codes, n_levels, table, progress)
+        progress.empty()
+        if failed:
+            st.warning("以下股票无法获取数据:\n\n" + "\n\n".join(failed))
 
 # 主界面
 st.title("📈 股票聚类分析")
 st.markdown("通过K均值算法识别股价支撑位和压力位")
 
-code = st.text_input("输入股票代码", placeholder="如: 000001.SZ 或 600000.SH")
+mode = st.radio("模式", ["单只股票", "自选股列表"], horizontal=True)
+n_levels = st.selectbox("价位数", ['auto', 3, 4, 5, 6, 7, 8], index=3,
+                        format_func=lambda k: "自动（BIC）" if k == 'auto' else f"{k}个")
+if mode == "自选股列表":
+    watchlist_page(n_levels)
+    code = None
+else:
+    code = st.text_input("输入股票代码", placeholder="如: 000001.SZ 或 600000.SH")
 
 if code:
     code = code.strip()
     if not code.endswith('.SZ') and not code.endswith('.SH'):
         code = code + ('.SH' if code.startswith('6') else '.SZ')
     
+    # 点击后记住分析的代码，之后调整其他控件重新运行时继续显示（结果来自缓存）
     if st.button("🔍 分析", type="primary"):
-        with st.spinner("获取数据..."):
+        st.session_state['analyzed'] = code
+    
+    if st.session_state.get('analyzed') == code:
+        with st.spinner("获取数据..."), timed('request'):
             df = get_stock_data(code)
             if df is not None and not df.empty:
-                centers, fig = analyze(df, code)
-                st.pyplot(fig)
+                selection, png = analyze(df, code, n_levels)
+                centers = selection['centers']
+                st.image(png, width='stretch')
                 
                 current = df['close'].iloc[-1]
-                col1, col2 = st.columns(2)
+                col1, col2, col3 = st.columns(3)
                 col1.metric("数据条数", len(df))
                 col2.metric("当前价格", f"{current:.2f}")
+                col3.metric("价位数", selection['k'])
+                if selection['score'] is not None:
+                    col3.caption(f"自动选择，BIC {selection['score']:.1f}")
                 
                 st.subheader("🎯 支撑/压力位")
-                nearest = min(range(len(centers)), key=lambda i: abs(centers[i] - current))
+                nearest = int(locate_levels(current, centers)['nearest'][0])
                 
                 for i, c in enumerate(centers, 1):
                     diff = current - c
@@ -138,5 +250,8 @@ if code:
             else:
                 st.error("无法获取数据")
 
+with st.expander("⏱ 各阶段耗时"):
+    st.code(metrics.format_summary() or "暂无数据")
+
 st.markdown("---")
 st.caption("支持沪深A股 | 数据: 腾讯/新浪/东方财富")
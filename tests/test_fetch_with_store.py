@@ -0,0 +1,83 @@
+"""本地行情存储的增量获取：请求范围前移、后移时只下载缺少的部分"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_store import HistoryStore  # noqa: E402
+from stock_data import fetch_with_store, normalize_code  # noqa: E402
+
+
+class FakeSource:
+    """按日期范围返回固定行情的数据源，记录每次请求的范围"""
+
+    def __init__(self, first='2023-01-02', last='2026-06-30'):
+        dates = pd.bdate_range(first, last)
+        close = 10 + np.arange(len(dates)) * 0.01
+        self.bars = pd.DataFrame({'open': close, 'high': close, 'low': close,
+                                  'close': close, 'volume': 1.0, 'amount': 1.0},
+                                 index=pd.DatetimeIndex(dates, name='date'))
+        self.calls = []
+
+    def __call__(self, code, start_date, end_date, adjust):
+        self.calls.append((pd.Timestamp(start_date), pd.Timestamp(end_date)))
+        df = self.bars[(self.bars.index >= pd.Timestamp(start_date)) &
+                       (self.bars.index <= pd.Timestamp(end_date))]
+        return df.copy() if not df.empty else None
+
+
+def _expected(source, start, end):
+    return source.bars[(source.bars.index >= pd.Timestamp(start)) &
+                       (source.bars.index <= pd.Timestamp(end))]
+
+
+def test_earlier_window_merges_instead_of_replacing(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+    source = FakeSource()
+
+    wide = fetch_with_store(store, '600519', 'fake', source, '20250101', '20260630')
+    assert len(wide) == len(_expected(source, '20250101', '20260630'))
+
+    narrow = fetch_with_store(store, '600519', 'fake', source, '20240101', '20241231')
+    assert len(narrow) == len(_expected(source, '20240101', '20241231'))
+    # 只补下载了前面缺少的一段
+    assert source.calls[-1][0] == pd.Timestamp('2024-01-01')
+    assert source.calls[-1][1] <= pd.Timestamp('2025-01-02')
+
+    calls = len(source.calls)
+    again = fetch_with_store(store, '600519', 'fake', source, '20250101', '20260630')
+    assert again is not None
+    assert len(again) == len(wide)
+    assert np.allclose(again['close'].values, wide['close'].values)
+    assert len(source.calls) == calls
+
+
+def test_fresh_check_does_not_hide_later_bars(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+    source = FakeSource()
+
+    fetch_with_store(store, '600519', 'fake', source, '20240101', '20241231')
+    # 刚查询过，但上次只查询到2024年底，不能直接返回本地数据
+    df = fetch_with_store(store, '600519', 'fake', source, '20240101', '20260630')
+    assert df.index[-1] == source.bars.index[-1]
+    assert len(df) == len(_expected(source, '20240101', '20260630'))
+
+    calls = len(source.calls)
+    fetch_with_store(store, '600519', 'fake', source, '20240101', '20260630')
+    assert len(source.calls) == calls
+
+
+def test_adjust_change_redownloads_whole_range(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+    source = FakeSource()
+    fetch_with_store(store, '600519', 'fake', source, '20250101', '20260630')
+
+    source.bars['close'] *= 0.9
+    df = fetch_with_store(store, '600519', 'fake', source, '20240101', '20241231')
+    assert np.allclose(df['close'].values, _expected(source, '20240101', '20241231')['close'].values)
+    stored = store.load(normalize_code('600519'), 'fake', 'qfq', '20250101', '20260630')
+    assert np.allclose(stored['close'].values, _expected(source, '20250101', '20260630')['close'].values)
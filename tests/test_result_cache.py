@@ -0,0 +1,40 @@
+"""移动端分析结果缓存：切换价位数后缓存命中时按新的价位数给出价位"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cluster_levels import select_levels  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+
+
+def _bars():
+    rng = np.random.default_rng(7)
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, 300))), 2)
+    index = pd.bdate_range('2025-01-01', periods=len(close), name='date')
+    return pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close,
+                         'volume': 1.0}, index=index)
+
+
+def test_switching_level_count_on_cached_symbol(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite3'))
+    bars = _bars()
+    levels = select_levels(bars['close'].values, 5)['centers']
+    cache.save('600519.SH', bars, levels, 'tencent')
+    cached = cache.load('600519.SH')
+
+    same = cached.select(5)
+    assert same['centers'] == levels
+
+    three = cached.select(3)
+    assert three['k'] == 3
+    assert np.allclose(three['centers'], select_levels(bars['close'].values, 3)['centers'])
+
+    auto = cached.select('auto')
+    expected = select_levels(bars['close'].values, 'auto')
+    assert auto['k'] == expected['k']
+    assert auto['score'] is not None
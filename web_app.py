@@ -3,23 +3,39 @@
 适用于HarmonyOS Next系统（通过浏览器访问）
 """
 
-from flask import Flask, render_template_string, request, jsonify, send_file
+from flask import Flask, render_template_string, request, jsonify, Response, abort
 import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
-import akshare as ak
+from stock_data import fetch_stock_data, normalize_code
+from cluster_levels import select_levels, K_MAX
+from downsample import lttb
+from chart_cache import ChartCache, make_key as make_chart_key, is_valid_key as is_valid_chart_key
+from source_registry import REGISTRY
+from singleflight import SingleFlight
+from intraday import intraday_levels, PERIODS as MINUTE_PERIODS
+from screener import get_level_table, MAX_PAGE_SIZE as SCREENER_MAX_PAGE_SIZE
+import metrics
+import preload
+from metrics import timed
 import warnings
 warnings.filterwarnings('ignore')
 
-import io
 import base64
+import multiprocessing
 import os
-from datetime import datetime
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
 app = Flask(__name__)
+metrics.set_frontend('web')
+
+# akshare 和 matplotlib 在首次使用时才导入；服务启动后由 preload 在后台提前导入
+PRELOAD_MODULES = ('akshare', 'chart_render')
+
+
+def start_preload():
+    """服务开始监听后在后台导入行情和绘图模块（STOCK_PRELOAD=off 时不预加载）"""
+    preload.start_for('idle', PRELOAD_MODULES)
 
 # HTML模板
 HTML_TEMPLATE = '''
@@ -93,6 +109,11 @@ HTML_TEMPLATE = '''
             border-color: #667eea;
         }
         
+        .period-select {
+            flex: none;
+            background: white;
+        }
+        
         .analyze-btn {
             padding: 15px 30px;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -160,6 +181,14 @@ HTML_TEMPLATE = '''
             border-radius: 10px;
         }
         
+        .chart-container canvas {
+            display: none;
+            width: 100%;
+            height: 320px;
+            background: white;
+            border-radius: 10px;
+        }
+        
         .info-card {
             background: #f8f9fa;
             border-radius: 15px;
@@ -273,6 +302,23 @@ HTML_TEMPLATE = '''
             <div class="input-section">
                 <input type="text" class="stock-input" id="stockCode" 
                        placeholder="输入股票代码 (如: 000001 或 600000)" maxlength="10">
+                <select class="stock-input period-select" id="period">
+                    <option value="daily">日线</option>
+                    <option value="60">60分钟</option>
+                    <option value="30">30分钟</option>
+                    <option value="15">15分钟</option>
+                    <option value="5">5分钟</option>
+                    <option value="1">1分钟</option>
+                </select>
+                <select class="stock-input period-select" id="levels">
+                    <option value="auto">自动价位数</option>
+                    <option value="3">3个价位</option>
+                    <option value="4">4个价位</option>
+                    <option value="5" selected>5个价位</option>
+                    <option value="6">6个价位</option>
+                    <option value="7">7个价位</option>
+                    <option value="8">8个价位</option>
+                </select>
                 <button class="analyze-btn" id="analyzeBtn" onclick="analyzeStock()">开始分析</button>
             </div>
             
@@ -284,6 +330,7 @@ HTML_TEMPLATE = '''
             <div class="results" id="results">
                 <div class="chart-container">
                     <img id="chartImage" src="" alt="股票分析图表">
+                    <canvas id="chartCanvas"></canvas>
                 </div>
                 
                 <div class="current-price" id="currentPrice">
@@ -305,6 +352,14 @@ HTML_TEMPLATE = '''
                         <span class="info-label">数据条数</span>
                         <span class="info-value" id="dataCount">--</span>
                     </div>
+                    <div class="info-row">
+                        <span class="info-label">价位数</span>
+                        <span class="info-value" id="levelCount">--</span>
+                    </div>
+                    <div class="info-row">
+                        <span class="info-label">数据状态</span>
+                        <span class="info-value" id="dataStatus">--</span>
+                    </div>
                 </div>
                 
                 <div class="info-card">
@@ -345,7 +400,13 @@ HTML_TEMPLATE = '''
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    body: JSON.stringify({ code: code })
+                    body: JSON.stringify({
+                        code: code,
+                        chart_mode: 'client',
+                        period: document.getElementById('period').value,
+                        k: document.getElementById('levels').value,
+                        points: chartPoints()
+                    })
                 });
                 
                 const data = await response.json();
@@ -363,17 +424,38 @@ HTML_TEMPLATE = '''
             }
         }
         
+        const DATA_STATUS_LABELS = {
+            fresh: '最新数据',
+            offline: '本地存储（数据源不可用）',
+            synthetic: '模拟数据（仅供演示，不是真实行情）',
+        };
+        
         function displayResults(data) {
             // 显示结果区域
             document.getElementById('results').classList.add('active');
             
             // 显示图表
-            document.getElementById('chartImage').src = 'data:image/png;base64,' + data.chart;
+            const chartImage = document.getElementById('chartImage');
+            const chartCanvas = document.getElementById('chartCanvas');
+            if (data.series) {
+                chartImage.style.display = 'none';
+                chartCanvas.style.display = 'block';
+                drawChart(chartCanvas, data);
+            } else {
+                chartCanvas.style.display = 'none';
+                chartImage.style.display = 'block';
+                chartImage.src = data.chart_url;
+            }
             
             // 显示基本信息
             document.getElementById('stockCodeResult').textContent = data.code;
             document.getElementById('dateRange').textContent = data.date_range;
             document.getElementById('dataCount').textContent = data.data_count;
+            document.getElementById('levelCount').textContent = data.k_score === undefined
+                ? data.k : `${data.k}（自动选择，BIC ${data.k_score === null ? '--' : data.k_score.toFixed(1)}）`;
+            const dataStatus = document.getElementById('dataStatus');
+            dataStatus.textContent = DATA_STATUS_LABELS[data.data_status] || data.data_status;
+            dataStatus.style.color = data.data_status === 'fresh' ? '' : '#e74c3c';
             
             // 显示当前价格
             document.getElementById('priceValue').textContent = '¥' + data.current_price.toFixed(2);
@@ -408,6 +490,89 @@ HTML_TEMPLATE = '''
             document.getElementById('results').scrollIntoView({ behavior: 'smooth' });
         }
         
+        // 图表目标点数：画布的物理像素宽度
+        function chartPoints() {
+            const canvas = document.getElementById('chartCanvas');
+            const width = canvas.parentElement.clientWidth || 760;
+            return Math.round(width * (window.devicePixelRatio || 1));
+        }
+        
+        function decodeArray(b64, ArrayType) {
+            const bytes = Uint8Array.from(atob(b64), c => c.charCodeAt(0));
+            return new ArrayType(bytes.buffer);
+        }
+        
+        function formatTime(t, unit) {
+            if (unit === 'minute') {
+                return new Date(t * 60000).toISOString().slice(0, 16).replace('T', ' ');
+            }
+            return new Date(t * 86400000).toISOString().slice(0, 10);
+        }
+        
+        // 在浏览器端绘制收盘价和支撑/压力位
+        function drawChart(canvas, data) {
+            const days = decodeArray(data.series.t, Int32Array);
+            const closes = decodeArray(data.series.y, Float32Array);
+            const ratio = window.devicePixelRatio || 1;
+            const width = canvas.clientWidth, height = canvas.clientHeight;
+            canvas.width = width * ratio;
+            canvas.height = height * ratio;
+            const ctx = canvas.getContext('2d');
+            ctx.scale(ratio, ratio);
+            ctx.clearRect(0, 0, width, height);
+            
+            const pad = { left: 50, right: 10, top: 10, bottom: 24 };
+            let lo = Math.min(...closes, ...data.centers);
+            let hi = Math.max(...closes, ...data.centers);
+            const margin = (hi - lo) * 0.05 || 1;
+            lo -= margin;
+            hi += margin;
+            const t0 = days[0], t1 = days[days.length - 1];
+            const px = t => pad.left + (t - t0) / Math.max(t1 - t0, 1) * (width - pad.left - pad.right);
+            const py = v => pad.top + (hi - v) / (hi - lo) * (height - pad.top - pad.bottom);
+            
+            // 网格与坐标
+            ctx.font = '11px sans-serif';
+            ctx.fillStyle = '#666';
+            ctx.strokeStyle = '#eee';
+            ctx.lineWidth = 1;
+            for (let i = 0; i <= 4; i++) {
+                const v = lo + (hi - lo) * i / 4;
+                ctx.beginPath();
+                ctx.moveTo(pad.left, py(v));
+                ctx.lineTo(width - pad.right, py(v));
+                ctx.stroke();
+                ctx.fillText(v.toFixed(2), 4, py(v) + 4);
+            }
+            ctx.fillText(formatTime(t0, data.series.unit), pad.left, height - 6);
+            const endLabel = formatTime(t1, data.series.unit);
+            ctx.fillText(endLabel, width - pad.right - ctx.measureText(endLabel).width, height - 6);
+            
+            // 支撑/压力位
+            const colors = ['red', 'green', 'orange', 'purple', 'brown'];
+            ctx.setLineDash([6, 4]);
+            data.centers.forEach((c, i) => {
+                ctx.strokeStyle = colors[i % colors.length];
+                ctx.globalAlpha = 0.7;
+                ctx.beginPath();
+                ctx.moveTo(pad.left, py(c));
+                ctx.lineTo(width - pad.right, py(c));
+                ctx.stroke();
+            });
+            ctx.setLineDash([]);
+            ctx.globalAlpha = 1;
+            
+            // 收盘价
+            ctx.strokeStyle = 'blue';
+            ctx.lineWidth = 1.5;
+            ctx.beginPath();
+            for (let i = 0; i < closes.length; i++) {
+                if (i === 0) ctx.moveTo(px(days[i]), py(closes[i]));
+                else ctx.lineTo(px(days[i]), py(closes[i]));
+            }
+            ctx.stroke();
+        }
+        
         // 回车键触发分析
         document.getElementById('stockCode').addEventListener('keypress', function(e) {
             if (e.key === 'Enter') {
@@ -420,89 +585,38 @@ HTML_TEMPLATE = '''
 '''
 
 
-def get_stock_data_multi_source(code, start_date='20250101', end_date='20261231'):
-    """多数据源获取股票数据"""
-    print(f"正在获取股票 {code} 的数据...")
-    
-    # 方法1: 尝试 stock_zh_a_hist_tx (腾讯证券)
-    try:
-        print("尝试方法1: stock_zh_a_hist_tx (腾讯证券)...")
-        if code.endswith('.SZ'):
-            symbol_tx = "sz" + code.replace('.SZ', '')
-        elif code.endswith('.SH'):
-            symbol_tx = "sh" + code.replace('.SH', '')
-        else:
-            if code.startswith('6'):
-                symbol_tx = "sh" + code
-            else:
-                symbol_tx = "sz" + code
-        
-        df = ak.stock_zh_a_hist_tx(symbol=symbol_tx, start_date=start_date, 
-                                  end_date=end_date, adjust="qfq", timeout=10)
-        
-        if df is not None and not df.empty:
-            print(f"方法1成功: 获取 {len(df)} 条数据")
-            if 'amount' in df.columns:
-                df['volume'] = df['amount'] * 100
-            if 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                df.set_index('date', inplace=True)
-            return df
-    except Exception as e:
-        print(f"方法1失败: {e}")
-    
-    # 方法2: 尝试 stock_zh_a_daily (新浪财经)
-    try:
-        print("尝试方法2: stock_zh_a_daily (新浪财经)...")
-        if code.endswith('.SZ'):
-            symbol_sina = "sz" + code.replace('.SZ', '')
-        elif code.endswith('.SH'):
-            symbol_sina = "sh" + code.replace('.SH', '')
-        else:
-            if code.startswith('6'):
-                symbol_sina = "sh" + code
-            else:
-                symbol_sina = "sz" + code
-        
-        df = ak.stock_zh_a_daily(symbol=symbol_sina, 
-                                start_date=start_date, end_date=end_date, adjust="qfq")
-        if df is not None and not df.empty:
-            print(f"方法2成功: 获取 {len(df)} 条数据")
-            if isinstance(df.index, pd.RangeIndex) and 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                df.set_index('date', inplace=True)
-            return df
-    except Exception as e:
-        print(f"方法2失败: {e}")
-    
-    # 方法3: 尝试 stock_zh_a_hist (东方财富)
-    try:
-        print("尝试方法3: stock_zh_a_hist (东方财富)...")
-        clean_code = code.replace('.SZ', '').replace('.SH', '')
-        
-        df = ak.stock_zh_a_hist(symbol=clean_code, period="daily", 
-                               start_date=start_date, end_date=end_date, 
-                               adjust="qfq")
-        if df is not None and not df.empty:
-            print(f"方法3成功: 获取 {len(df)} 条数据")
-            df.rename(columns={
-                '日期': 'date',
-                '开盘': 'open',
-                '最高': 'high', 
-                '最低': 'low',
-                '收盘': 'close',
-                '成交量': 'volume',
-                '成交额': 'amount'
-            }, inplace=True)
-            df['date'] = pd.to_datetime(df['date'])
-            df.set_index('date', inplace=True)
-            return df
-    except Exception as e:
-        print(f"方法3失败: {e}")
+# 默认分析的数据区间
+DEFAULT_START_DATE = '20250101'
+DEFAULT_END_DATE = '20261231'
+
+# 所有数据源均失败且没有本地数据时，单只分析是否退回模拟数据（结果中 synthetic 为 true）；
+# 批量分析从不使用模拟数据
+SYNTHETIC_FALLBACK = os.environ.get('STOCK_SYNTHETIC_FALLBACK', '1') != '0'
+
+# 同一股票、同一区间的并发下载只执行一次
+fetch_flight = SingleFlight()
+# 同一股票、同一参数的并发分析只执行一次
+analysis_flight = SingleFlight()
+
+
+def get_stock_data_multi_source(code, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE):
+    """多数据源获取股票数据（本地存储增量更新；并发请求同一股票时合并为一次下载）"""
+    return fetch_flight.do((code, start_date, end_date),
+                           _get_stock_data, code, start_date, end_date)
+
+
+def _get_stock_data(code, start_date, end_date):
+    df = fetch_stock_data(code, start_date, end_date)
+    if df is not None and not df.empty:
+        return df
+    if not SYNTHETIC_FALLBACK:
+        return None
     
-    # 方法4: 生成模拟数据
+    # 所有数据源均失败: 生成模拟数据
     print("所有数据源均失败，使用模拟数据...")
-    return generate_sample_data(code)
+    df = generate_sample_data(code)
+    df.attrs['source'] = 'synthetic'
+    return df
 
 
 def generate_sample_data(code, days=180):
@@ -538,38 +652,288 @@ def generate_sample_data(code, days=180):
     return df
 
 
-def analyze_clusters(df, code):
-    """执行聚类分析"""
-    prices = df['close'].values.reshape(-1, 1)
+# 默认价位数；'auto' 为在 2..K_MAX 中按 BIC 自动选择
+N_LEVELS = 5
+
+
+def parse_n_levels(value):
+    """解析请求中的价位数参数 k：整数 1..K_MAX 或 'auto'，缺省为 N_LEVELS；不合法时抛出 ValueError"""
+    if value is None or value == '':
+        return N_LEVELS
+    if str(value).lower() == 'auto':
+        return 'auto'
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        k = 0
+    if not 1 <= k <= K_MAX:
+        raise ValueError(f"价位数应为 1~{K_MAX} 或 auto: {value}")
+    return k
+
+
+def compute_level_selection(df, n_levels=N_LEVELS):
+    """对收盘价聚类，返回 select_levels 的结果（含自动选择的价位数和 BIC）"""
+    return select_levels(df['close'].values, n_levels)
+
+
+# 图表样式（参与缓存键计算）
+CHART_STYLE = 'web'
+
+chart_cache = ChartCache()
+
+
+def render_chart(df, code, centers):
+    """绘制股价与支撑/压力位图表，返回PNG字节"""
+    from chart_render import render_levels_png      # matplotlib 只在服务端绘图时导入
+    return render_levels_png(df.index, df['close'].values, centers,
+                             f"股价聚类分析 - {code}", style=CHART_STYLE)
+
+
+def get_chart_key(df, code, centers):
+    """渲染图表（已缓存则直接复用），返回缓存键"""
+    from chart_render import STYLES as CHART_STYLES
+    key = make_chart_key(df.index.values, df['close'].values, centers,
+                         code=code, style=sorted(CHART_STYLES[CHART_STYLE].items()))
+    chart_cache.get_or_render(key, lambda: render_chart(df, code, centers))
+    return key
+
+
+def compute_positions(current_price, centers):
+    """计算当前价格相对于各支撑/压力位的位置"""
+    positions = []
     
-    kmeans = KMeans(n_clusters=5, random_state=42)
-    kmeans.fit(prices)
-    centers = sorted(kmeans.cluster_centers_.flatten())
+    for i, center in enumerate(centers, 1):
+        diff = current_price - center
+        percent = (diff / center) * 100
+        
+        if diff > 0:
+            position = f"上方 {diff:.2f} (+{percent:.1f}%)"
+        else:
+            position = f"下方 {-diff:.2f} ({percent:+.1f}%)"
+        
+        positions.append({
+            'level': i,
+            'price': center,
+            'position': position
+        })
+    return positions
+
+
+CHART_MODES = ('server', 'client', 'none')
+# 浏览器端绘图时默认返回的点数及允许范围
+DEFAULT_CHART_POINTS = 800
+MAX_CHART_POINTS = 5000
+
+
+def encode_series(df, points=DEFAULT_CHART_POINTS, unit='day'):
+    """
+    用LTTB把收盘价降采样到 points 个点，编码为紧凑的类型化数组：
+    t 为距1970-01-01的天数（unit='minute' 时为分钟数）(Int32, 小端), y 为收盘价 (Float32, 小端)，均为base64
+    """
+    with timed('encode'):
+        points = max(3, min(int(points), MAX_CHART_POINTS))
+        times = df.index.values.astype('datetime64[D]' if unit == 'day' else 'datetime64[m]')
+        times = times.astype(np.int64)
+        closes = df['close'].values
+        keep = lttb(times, closes, points)
+        return {
+            't': base64.b64encode(times[keep].astype('<i4').tobytes()).decode(),
+            'y': base64.b64encode(closes[keep].astype('<f4').tobytes()).decode(),
+            'unit': unit,
+            'n': int(len(keep)),
+            'total': int(len(closes))
+        }
+
+
+# 分析周期: 日线或分钟线
+ANALYSIS_PERIODS = ('daily',) + MINUTE_PERIODS
+
+
+def analyze_code(code, chart_mode='server', points=DEFAULT_CHART_POINTS,
+                 start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE, period='daily',
+                 n_levels=N_LEVELS):
+    """
+    完整分析一只股票：获取数据、聚类、计算位置
+    chart_mode: server 服务端渲染并返回 chart_url; client 返回降采样序列由浏览器绘制; none 不返回图表
+    period: daily 日线；'1' / '5' / '15' / '30' / '60' 分钟线（使用最近一段时间，忽略起止日期）
+    n_levels: 价位数，'auto' 时自动选择并在结果中返回 k 和 k_score（BIC）
+    同一股票、区间和参数的并发调用共享一次计算的结果
+    """
+    key = analysis_key(code, chart_mode, points, start_date, end_date, period, n_levels)
+    return analysis_flight.do(key, _analyze_code, code, chart_mode, points,
+                              start_date, end_date, period, n_levels)
+
+
+def analysis_key(code, chart_mode, points, start_date, end_date, period='daily', n_levels=N_LEVELS):
+    """请求合并的键（code 需已规范化）"""
+    return (code, period, n_levels, start_date, end_date, chart_mode,
+            points if chart_mode == 'client' else None)
+
+
+def _analyze_code(code, chart_mode, points, start_date, end_date, period, n_levels):
+    df = get_analysis_data(code, start_date, end_date, period, n_levels)
+    return build_analysis(code, df, chart_mode, points, n_levels)
+
+
+def get_intraday_data(code, period, n_levels=N_LEVELS):
+    """
+    分钟线：分块下载并流式聚类，返回最近一段K线（绘图用），
+    价位、参与聚类的K线总数记录在 attrs 中
+    """
+    result = intraday_levels(code, period, n_levels=n_levels)
+    if result is None:
+        return None
+    df = result.bars
+    df.attrs.update(period=period, levels=result.selection, total_bars=result.count)
+    return df
+
+
+def get_analysis_data(code, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE, period='daily',
+                      n_levels=N_LEVELS):
+    """按周期获取分析所需的行情（涉及网络请求）"""
+    if period == 'daily':
+        return get_stock_data_multi_source(code, start_date, end_date)
+    return get_intraday_data(code, period, n_levels)
+
+
+def data_status(df):
+    """行情的数据状态: fresh 刚从数据源获取; offline 数据源不可用时的本地存储; synthetic 模拟数据"""
+    if df.attrs.get('source') == 'synthetic':
+        return 'synthetic'
+    if df.attrs.get('offline'):
+        return 'offline'
+    return 'fresh'
+
+
+def build_analysis(code, df, chart_mode='server', points=DEFAULT_CHART_POINTS, n_levels=N_LEVELS):
+    """
+    由已获取的行情计算分析结果（聚类、位置、图表），不涉及网络请求
+    结果中 data_status 为数据状态，synthetic 为 true 时价位由模拟数据算出，不代表真实行情
+    """
+    if df is None or df.empty:
+        return {'success': False, 'code': code, 'error': '无法获取股票数据'}
     
-    # 创建图形
-    plt.figure(figsize=(12, 6))
-    plt.plot(df.index, df['close'], label="收盘价", color="blue", linewidth=1.5)
+    # 分钟线的价位已在流式下载时算好
+    period = df.attrs.get('period', 'daily')
+    selection = df.attrs.get('levels') or compute_level_selection(df, n_levels)
+    centers = selection['centers']
+    current_price = float(df['close'].iloc[-1])
+    time_format = '%Y-%m-%d' if period == 'daily' else '%Y-%m-%d %H:%M'
     
-    colors = ['red', 'green', 'orange', 'purple', 'brown']
-    for i, c in enumerate(centers):
-        plt.axhline(c, color=colors[i % len(colors)], linestyle="--", alpha=0.7, 
-                   label=f'Level {i+1}: {c:.2f}')
+    result = {
+        'success': True,
+        'code': code,
+        'period': period,
+        'date_range': f"{df.index[0].strftime(time_format)} 至 {df.index[-1].strftime(time_format)}",
+        'data_count': int(df.attrs.get('total_bars', len(df))),
+        'current_price': current_price,
+        'centers': centers,
+        'k': selection['k'],
+        'positions': compute_positions(current_price, centers),
+        'data_status': data_status(df),
+        'synthetic': data_status(df) == 'synthetic',
+    }
+    if n_levels == 'auto':
+        # 只有一种价格等完全拟合的情况 BIC 为无穷大，JSON 中记为 null
+        score = selection['score']
+        result['k_score'] = score if np.isfinite(score) else None
+        result['k_scores'] = [{'k': k, 'score': v if np.isfinite(v) else None}
+                              for k, v in selection['scores'].items()]
+    if chart_mode == 'server':
+        result['chart_url'] = f"/chart/{get_chart_key(df, code, centers)}.png"
+    elif chart_mode == 'client':
+        result['series'] = encode_series(df, points, unit='day' if period == 'daily' else 'minute')
+    return result
+
+
+def _analyze_batch_item(code, chart_mode):
+    """批量分析的单个任务（在工作进程中执行），异常和模拟数据转为该股票的错误信息"""
+    try:
+        result = analyze_code(code, chart_mode=chart_mode)
+    except Exception as e:
+        return {'success': False, 'code': code, 'error': str(e)}
+    if result.get('synthetic'):
+        return {'success': False, 'code': code, 'error': '无法获取股票数据'}
+    return result
+
+
+# 批量分析的工作进程池
+BATCH_WORKERS = int(os.environ.get('STOCK_BATCH_WORKERS', str(os.cpu_count() or 2)))
+BATCH_MAX_CODES = int(os.environ.get('STOCK_BATCH_MAX_CODES', '500'))
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+
+def get_batch_pool():
+    """
+    延迟创建的批量分析进程池
+    工作进程用 spawn 方式启动：服务已有多个线程（请求线程、预加载、数据源请求线程池），
+    fork 只复制当前线程，子进程可能继承被其他线程持有的锁而卡死
+    """
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS,
+                                              mp_context=multiprocessing.get_context('spawn'))
+        return _batch_pool
+
+
+def parse_batch_request(data):
+    """解析批量分析请求，返回 (股票代码列表, 图表模式, 错误信息)"""
+    codes = data.get('codes') or []
+    chart_mode = data.get('chart', False)
+    if not isinstance(chart_mode, str):
+        chart_mode = 'server' if chart_mode else 'none'
+    if chart_mode not in CHART_MODES:
+        return None, None, f'未知的图表模式: {chart_mode}'
     
-    plt.title(f"股价聚类分析 - {code}", fontsize=14)
-    plt.xlabel("日期", fontsize=12)
-    plt.ylabel("价格", fontsize=12)
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
+    if isinstance(codes, str):
+        codes = codes.replace('，', ',').split(',')
+    codes = [normalize_code(str(c).strip()) for c in codes if str(c).strip()]
+    if not codes:
+        return None, None, '请输入股票代码列表'
+    if len(codes) > BATCH_MAX_CODES:
+        return None, None, f'单次最多分析 {BATCH_MAX_CODES} 只股票'
+    return codes, chart_mode, None
+
+
+def batch_response(results):
+    return {
+        'success': True,
+        'count': len(results),
+        'failed': sum(1 for r in results if not r['success']),
+        'results': results
+    }
+
+
+def screener_response(args):
+    """
+    执行选股查询，args 为查询参数:
+    side (support/resistance/nearest), min_pct, max_pct, sort, order (asc/desc), page, page_size
+    """
+    table = get_level_table()
+    if table is None:
+        return {'success': False, 'error': '价位文件不存在，请先运行 market_scan.py'}
     
-    # 保存到内存
-    img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-    img_buffer.seek(0)
-    img_base64 = base64.b64encode(img_buffer.read()).decode()
-    plt.close()
+    def number(name):
+        value = args.get(name)
+        return None if value in (None, '') else float(value)
     
-    return centers, img_base64
+    page = max(1, int(args.get('page', 1)))
+    page_size = max(1, min(int(args.get('page_size', 50)), SCREENER_MAX_PAGE_SIZE))
+    total, rows = table.query(side=args.get('side', 'support'),
+                              min_pct=number('min_pct'), max_pct=number('max_pct'),
+                              sort=args.get('sort', 'distance'),
+                              descending=args.get('order', 'asc') == 'desc',
+                              offset=(page - 1) * page_size, limit=page_size)
+    return {
+        'success': True,
+        'universe': len(table),
+        'total': total,
+        'page': page,
+        'page_size': page_size,
+        'results': rows
+    }
 
 
 @app.route('/')
@@ -588,63 +952,106 @@ def analyze():
         if not code:
             return jsonify({'success': False, 'error': '请输入股票代码'})
         
-        # 确保代码格式正确
-        if not code.endswith('.SZ') and not code.endswith('.SH'):
-            if code.startswith('6'):
-                code = code + '.SH'
-            else:
-                code = code + '.SZ'
-        
-        # 获取数据
-        df = get_stock_data_multi_source(code)
+        chart_mode = data.get('chart_mode', 'server')
+        if chart_mode not in CHART_MODES:
+            return jsonify({'success': False, 'error': f'未知的图表模式: {chart_mode}'})
+        period = str(data.get('period', 'daily'))
+        if period not in ANALYSIS_PERIODS:
+            return jsonify({'success': False, 'error': f'不支持的周期: {period}'})
+        try:
+            n_levels = parse_n_levels(data.get('k'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
         
-        if df is None or df.empty:
-            return jsonify({'success': False, 'error': '无法获取股票数据'})
+        with timed('request'):
+            result = analyze_code(normalize_code(code), chart_mode=chart_mode,
+                                  points=data.get('points', DEFAULT_CHART_POINTS), period=period,
+                                  n_levels=n_levels)
+            with timed('serialize'):
+                return jsonify(result)
         
-        # 执行聚类分析
-        centers, chart_base64 = analyze_clusters(df, code)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
+@app.route('/analyze_batch', methods=['POST'])
+def analyze_batch():
+    """
+    批量分析股票
+    请求: {"codes": ["000001", "600000", ...], "chart": false}
+    chart 可为布尔值（true 等同 "server"）或图表模式 "server" / "client" / "none"
+    返回每只股票的聚类中心和相对位置，单只股票失败不影响其他股票
+    """
+    try:
+        codes, chart_mode, error = parse_batch_request(request.get_json() or {})
+        if error:
+            return jsonify({'success': False, 'error': error})
         
-        # 计算当前价格相对于支撑/压力位的位置
-        current_price = df['close'].iloc[-1]
-        positions = []
+        pool = get_batch_pool()
+        futures = [pool.submit(_analyze_batch_item, code, chart_mode) for code in codes]
+        results = []
+        for code, future in zip(codes, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({'success': False, 'code': code, 'error': str(e)})
         
-        for i, center in enumerate(centers, 1):
-            diff = current_price - center
-            percent = (diff / center) * 100
-            
-            if diff > 0:
-                position = f"上方 {diff:.2f} (+{percent:.1f}%)"
-            else:
-                position = f"下方 {-diff:.2f} ({percent:+.1f}%)"
-            
-            positions.append({
-                'level': i,
-                'price': center,
-                'position': position
-            })
-        
-        # 准备返回数据
-        result = {
-            'success': True,
-            'code': code,
-            'date_range': f"{df.index[0].strftime('%Y-%m-%d')} 至 {df.index[-1].strftime('%Y-%m-%d')}",
-            'data_count': len(df),
-            'current_price': current_price,
-            'centers': centers,
-            'positions': positions,
-            'chart': chart_base64
-        }
-        
-        return jsonify(result)
+        return jsonify(batch_response(results))
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 
+@app.route('/screener')
+def screener():
+    """
+    按全市场扫描结果选股，例如当前价在最近支撑位上方2%以内:
+    /screener?side=support&min_pct=0&max_pct=2&sort=distance&page=1&page_size=50
+    """
+    try:
+        return jsonify(screener_response(request.args))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
+@app.route('/chart/<key>.png')
+def chart(key):
+    """按内容哈希返回缓存的图表，支持 ETag / If-None-Match"""
+    if not is_valid_chart_key(key):
+        abort(404)
+    # 图表内容由键唯一确定，同一个键的图片永不变化
+    headers = {'ETag': f'"{key}"', 'Cache-Control': 'public, max-age=31536000, immutable'}
+    if key in request.if_none_match:
+        return Response(status=304, headers=headers)
+    png = chart_cache.get(key)
+    if png is None:
+        abort(404)
+    return Response(png, mimetype='image/png', headers=headers)
+
+
+@app.route('/stats/sources')
+def source_stats():
+    """数据源统计（成功率、延迟、熔断状态及跳过原因）"""
+    return jsonify(REGISTRY.snapshot())
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 格式的各阶段耗时与数据源结果统计（批量分析在工作进程中执行，不计入）"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/stats/singleflight')
+def singleflight_stats():
+    """请求合并统计（每个键的执行次数、共享次数、当前等待数）"""
+    return jsonify({'fetch': fetch_flight.snapshot(), 'analyze': analysis_flight.snapshot()})
+
+
 if __name__ == '__main__':
     print("="*60)
     print("股票价格聚类分析Web服务器")
     print("="*60)
     print("访问地址: http://localhost:5000")
     print("="*60)
+    start_preload()
     app.run(host='0.0.0.0', port=5000, debug=True)